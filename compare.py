@@ -0,0 +1,91 @@
+"""Runs one workload against every scheduling policy side by side"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+import math
+import random
+import re
+import time
+
+from runner import run_simulator
+
+METRICS = ["Response", "Turnaround", "Wait"]
+STATISTICS = ["mean", "p50", "p95", "p99", "max"]
+
+_percentile_line = re.compile(r"^\s+(\w+)\s+-- mean (\S+)  p50 (\S+)  p95 (\S+)  p99 (\S+)  max (\S+)$", re.MULTILINE)
+
+class PolicyStats(NamedTuple):
+	"""Per-policy result of a comparison: metric -> statistic -> value, plus wall time of the run"""
+	policy: str
+	metrics: dict[str, dict[str, float]]
+	seconds: float
+
+def workload_runtimes(jlist:str, jobs:int, maxlen:int, seed:int) -> list[int]:
+	"""Run times of the workload, either the given basic.py JLIST (runtime[:arrival],...) or generated the way basic.py does
+
+	Raises ValueError on a JLIST that is not in basic.py's format. Arrival times
+	are dropped, as every policy is compared on the jobs all arriving at once.
+	"""
+	if jlist.strip():
+		runtimes = []
+		for entry in jlist.split(","):
+			fields = entry.split(":")
+			try:
+				runtime = float(fields[0])
+			except ValueError:
+				runtime = math.nan
+			# a run time of at least 1, then at most an arrival; MLFQ's x,y,z:... lists fail here on their zero fields
+			if len(fields) > 2 or not 1 <= runtime < math.inf:
+				raise ValueError(f"bad JLIST entry {entry.strip()!r}: jobs are runtime or runtime:arrival, "
+								 f"e.g. 10,20:5,30")
+			runtimes.append(int(runtime))
+		return runtimes
+
+	rng = random.Random()
+	rng.seed(seed, version=1)
+	return [int(maxlen * rng.random()) + 1 for _ in range(jobs)]
+
+def policy_runs(runtimes:list[int], quantum:int, seed:int) -> dict[str, tuple[str, dict[str,str]]]:
+	"""Simulator path and parameters for each policy, all describing the same jobs arriving at time 0"""
+	basic = {"JLIST": ",".join(str(r) for r in runtimes), "QUANTUM": str(quantum), "PERCENTILES": "True"}
+	return {"FIFO":		("ostep/basic.py", {**basic, "POLICY": "FIFO"}),
+			"SJF":		("ostep/basic.py", {**basic, "POLICY": "SJF"}),
+			"RR":		("ostep/basic.py", {**basic, "POLICY": "RR"}),
+			"Lottery":	("ostep/lottery.py", {"SEED": str(seed),
+											  "JLIST": ",".join(f"{r}:100" for r in runtimes),
+											  "QUANTUM": str(quantum),
+											  "PERCENTILES": "True"}),
+			"MLFQ":		("ostep/mlfq.py", {"SEED": str(seed),
+										   "JLIST": ":".join(f"0,{r},0" for r in runtimes),
+										   "PERCENTILES": "True"}),
+			}
+
+def parse_percentiles(output:str) -> dict[str, dict[str, float]]:
+	"""Reads the Percentiles block printed by a simulator run with --percentiles"""
+	metrics = {}
+	for match in _percentile_line.finditer(output.partition("Percentiles:\n")[2]):
+		metrics[match.group(1)] = dict(zip(STATISTICS, (float(v) for v in match.groups()[1:])))
+	return metrics
+
+def _run_policy(run:Callable[[str, dict[str,str]], str], policy:str, path:str, parameters:dict[str,str]) -> PolicyStats:
+	start = time.perf_counter()
+	output = run(path, parameters)
+	return PolicyStats(policy, parse_percentiles(output), time.perf_counter() - start)
+
+def compare_policies(runtimes:list[int], quantum:int = 1, seed:int = 0,
+					 run:Callable[[str, dict[str,str]], str] = run_simulator) -> list[PolicyStats]:
+	"""Simulates the workload under every policy, each in its own simulator process, all at once"""
+	runs = policy_runs(runtimes, quantum, seed)
+	with ThreadPoolExecutor(max_workers=len(runs)) as executor:
+		futures = [executor.submit(_run_policy, run, policy, path, parameters)
+					for policy, (path, parameters) in runs.items()]
+		return [future.result() for future in futures]
+
+def format_table(results:list[PolicyStats]) -> str:
+	"""Plain-text table of the comparison, one row per policy"""
+	columns = [f"{metric[:4]} {stat}" for metric in METRICS for stat in STATISTICS]
+	lines = ["%-8s" % "Policy" + "".join("%11s" % c for c in columns) + "%9s" % "secs"]
+	for result in results:
+		values = [result.metrics.get(metric, {}).get(stat, float("nan")) for metric in METRICS for stat in STATISTICS]
+		lines.append("%-8s" % result.policy + "".join("%11.2f" % v for v in values) + "%9.3f" % result.seconds)
+	return "\n".join(lines)
@@ -0,0 +1,195 @@
+"""Single-flight coalescing of identical simulator runs
+
+When callers ask for the same run (same script, same arguments) while one is
+already going, say a whole class solving the same seed at once or two sweeps
+whose grids overlap, they attach to that run instead of starting their own,
+and all get its output when it finishes. A caller that cancels only detaches;
+the run itself is cancelled once nobody is left waiting for it.
+"""
+
+from typing import Callable, Hashable, NamedTuple, Protocol
+import threading
+import time
+
+from runner import Progress, SimulationCancelled
+
+class Run(Protocol):
+	"""What SimulatorRun and PoolRun have in common"""
+	resumed_at: int | None
+
+	def wait(self) -> str:
+		...
+
+	def cancel(self):
+		...
+
+# starts the run for a flight, with the callback that passes its progress on to every caller
+Start = Callable[[Callable[[Progress], None] | None], Run]
+
+class FlightStats(NamedTuple):
+	"""How much work coalescing saved"""
+	calls: int				# runs asked for
+	runs: int				# runs started
+	joined: int				# calls answered by a run another caller started
+	cancelled: int			# runs cancelled because every caller had detached
+	saved_seconds: float	# run time the joined calls would have spent on runs of their own
+
+	def __str__(self) -> str:
+		return (f"{self.calls} runs asked for, {self.runs} started, {self.joined} joined one in flight "
+				f"({self.saved_seconds:.2f}s of simulation saved), {self.cancelled} cancelled")
+
+class _Flight:
+	def __init__(self, key:Hashable) -> None:
+		self.key = key
+		self.run: Run | None = None
+		self.listeners: list[Callable[[Progress], None]] = []
+		self.waiting = 0
+		self.finished = False
+		self.output = ""
+		self.error: BaseException | None = None
+		self.claimed = False
+		self.started = 0.0
+		self.seconds = 0.0
+
+class SharedRun:
+	"""One caller's handle on a flight; same interface as runner.SimulatorRun"""
+	def __init__(self, flights:"SingleFlight", flight:_Flight, on_progress:Callable[[Progress], None] | None,
+				 joined:bool) -> None:
+		self._flights = flights
+		self._flight = flight
+		self._on_progress = on_progress
+		self._cancelled = False
+		self.joined = joined
+
+	@property
+	def resumed_at(self) -> int | None:
+		run = self._flight.run
+		return run.resumed_at if run is not None else None
+
+	def wait(self) -> str:
+		"""Waits for the flight and returns its output; raises what the run raised, or SimulationCancelled if cancelled"""
+		return self._flights._wait(self)
+
+	def cancel(self):
+		"""Detaches this caller; the run is cancelled when it was the last one waiting"""
+		self._flights._detach(self)
+
+	def claim(self) -> bool:
+		"""True for the first caller to claim the flight's output, so one of those that got it (not always the starter) stores it"""
+		return self._flights._claim(self)
+
+class SingleFlight:
+	"""Runs identical requests once at a time; safe to share between models and threads"""
+	def __init__(self) -> None:
+		self._lock = threading.Lock()
+		self._changed = threading.Condition(self._lock)
+		self._flights: dict[Hashable, _Flight] = {}
+		self._calls = 0
+		self._runs = 0
+		self._joined = 0
+		self._cancelled = 0
+		self._saved = 0.0
+
+	@property
+	def stats(self) -> FlightStats:
+		with self._lock:
+			return FlightStats(self._calls, self._runs, self._joined, self._cancelled, self._saved)
+
+	def submit(self, key:Hashable, start:Start, on_progress:Callable[[Progress], None] | None = None) -> SharedRun:
+		"""Attaches to the run in flight for key, or starts one with start"""
+		with self._lock:
+			self._calls += 1
+			flight = self._flights.get(key)
+			joined = flight is not None
+			if flight is None:
+				flight = self._flights[key] = _Flight(key)
+				self._runs += 1
+			flight.waiting += 1
+			if on_progress is not None:
+				flight.listeners.append(on_progress)
+			shared = SharedRun(self, flight, on_progress, joined)
+		if joined:
+			return shared
+
+		# progress is only asked of the run when its first caller wants it, as asking costs the run a little
+		forward = self._forward(flight) if on_progress is not None else None
+		try:
+			flight.run = start(forward)
+		except BaseException as error:
+			self._finish(flight, "", error)
+			raise
+		with self._lock:
+			# timed from here; a pool run may still wait for a free worker, time a joined caller would have waited too
+			flight.started = time.perf_counter()
+			abandoned = flight.waiting == 0
+		if abandoned:
+			# every caller detached while the run was being started
+			flight.run.cancel()
+		threading.Thread(target=self._drive, args=(flight,), daemon=True).start()
+		return shared
+
+	def _forward(self, flight:_Flight) -> Callable[[Progress], None]:
+		def forward(progress:Progress):
+			with self._lock:
+				listeners = list(flight.listeners)
+			for listener in listeners:
+				listener(progress)
+		return forward
+
+	def _drive(self, flight:_Flight):
+		try:
+			output = flight.run.wait()
+		except BaseException as error:
+			self._finish(flight, "", error)
+			return
+		self._finish(flight, output, None)
+
+	def _finish(self, flight:_Flight, output:str, error:BaseException | None):
+		with self._lock:
+			flight.finished = True
+			flight.output = output
+			flight.error = error
+			flight.seconds = time.perf_counter() - flight.started
+			if self._flights.get(flight.key) is flight:
+				del self._flights[flight.key]
+			self._changed.notify_all()
+
+	def _wait(self, shared:SharedRun) -> str:
+		flight = shared._flight
+		with self._lock:
+			while not flight.finished and not shared._cancelled:
+				self._changed.wait()
+			if shared._cancelled:
+				raise SimulationCancelled()
+			if shared.joined and flight.error is None:
+				self._joined += 1
+				self._saved += flight.seconds
+		if flight.error is not None:
+			raise flight.error
+		return flight.output
+
+	def _claim(self, shared:SharedRun) -> bool:
+		flight = shared._flight
+		with self._lock:
+			first = not flight.claimed
+			flight.claimed = True
+			return first
+
+	def _detach(self, shared:SharedRun):
+		flight = shared._flight
+		with self._lock:
+			if shared._cancelled or flight.finished:
+				return
+			shared._cancelled = True
+			flight.waiting -= 1
+			if shared._on_progress is not None and shared._on_progress in flight.listeners:
+				flight.listeners.remove(shared._on_progress)
+			last = flight.waiting == 0
+			if last:
+				# nobody is left to want this run; a new request for it starts afresh
+				self._cancelled += 1
+				if self._flights.get(flight.key) is flight:
+					del self._flights[flight.key]
+			self._changed.notify_all()
+		if last and flight.run is not None:
+			flight.run.cancel()
@@ -0,0 +1,335 @@
+"""Differential fuzzing of the simulators against the original OSTEP scripts
+
+Every fast path added to the simulators (the scripts as they are now, the
+Multi-CPU vector engine, running on a pool worker, MLFQ resuming from
+checkpoints) has to print exactly what the original scripts print, down to the
+order random numbers are drawn in. This draws random option sets for each
+script, runs the original script (taken from the repository's first commit, or
+any revision given with --reference) and every fast path on them, compares the
+outputs byte for byte and records how much faster each path was. A case that
+differs is shrunk, one option or list entry at a time, to the smallest set of
+options that still differs, and printed as a command line.
+
+	python fuzz.py --cases 200 --seed 1 --out fuzz.jsonl
+"""
+
+from optparse import OptionParser
+from typing import Callable, NamedTuple
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from runner import ROOT
+from pool import SimulatorPool
+
+try:
+	import numpy
+except ImportError:		# the vector engine needs it; its path is skipped without
+	numpy = None
+
+# an option set: flag -> value, None for switches; always solved (-c), as the app runs them
+Case = dict[str, str | None]
+
+class Outcome(NamedTuple):
+	"""One fast path run on one case"""
+	script: str
+	path: str
+	case: Case
+	same: bool
+	reference_seconds: float
+	seconds: float
+
+	@property
+	def speedup(self) -> float:
+		return self.reference_seconds / self.seconds if self.seconds else float("inf")
+
+def _maybe(rng:random.Random, probability:float = 0.5) -> bool:
+	return rng.random() < probability
+
+def _basic_case(rng:random.Random) -> Case:
+	case: Case = {"-s": str(rng.randrange(1000)), "-p": rng.choice(["SJF", "FIFO", "RR"])}
+	if _maybe(rng, 0.3):
+		case["-l"] = ",".join(str(rng.randint(1, 50)) for _ in range(rng.randint(1, 8)))
+	else:
+		case["-j"] = str(rng.randint(1, 12))
+		case["-m"] = str(rng.randint(1, 100))
+	if _maybe(rng):
+		case["-q"] = str(rng.randint(1, 10))
+	return case
+
+def _lottery_case(rng:random.Random) -> Case:
+	case: Case = {"-s": str(rng.randrange(1000))}
+	if _maybe(rng, 0.3):
+		case["-l"] = ",".join(f"{rng.randint(1, 30)}:{rng.randint(1, 200)}" for _ in range(rng.randint(1, 6)))
+	else:
+		case["-j"] = str(rng.randint(1, 10))
+		case["-m"] = str(rng.randint(1, 60))
+		case["-T"] = str(rng.randint(1, 300))
+	if _maybe(rng):
+		case["-q"] = str(rng.randint(1, 5))
+	return case
+
+def _mlfq_case(rng:random.Random) -> Case:
+	case: Case = {"-s": str(rng.randrange(1000))}
+	queues = rng.randint(1, 5)
+	if _maybe(rng, 0.3):
+		case["-Q"] = ",".join(str(rng.randint(1, 20)) for _ in range(queues))
+	else:
+		case["-n"] = str(queues)
+		case["-q"] = str(rng.randint(1, 20))
+	if _maybe(rng, 0.3):
+		case["-A"] = ",".join(str(rng.randint(1, 4)) for _ in range(queues))
+	elif _maybe(rng):
+		case["-a"] = str(rng.randint(1, 4))
+	if _maybe(rng, 0.3):
+		case["-l"] = ":".join(f"{rng.randint(0, 50)},{rng.randint(1, 150)},{rng.randint(0, 12)}"
+							  for _ in range(rng.randint(1, 6)))
+	else:
+		case["-j"] = str(rng.randint(1, 10))
+		case["-m"] = str(rng.randint(1, 200))
+		case["-M"] = str(rng.randint(0, 15))
+	if _maybe(rng):
+		case["-B"] = str(rng.choice([0, rng.randint(5, 100)]))
+	if _maybe(rng):
+		case["-i"] = str(rng.randint(1, 10))
+	if _maybe(rng, 0.3):
+		case["-S"] = None
+	if _maybe(rng, 0.3):
+		case["-I"] = None
+	return case
+
+def _multi_case(rng:random.Random) -> Case:
+	case: Case = {"-s": str(rng.randrange(1000))}
+	cpus = rng.choice([1, 2, 3, 4, 8, 16, 64])
+	case["-n"] = str(cpus)
+	if _maybe(rng, 0.3):
+		names = [chr(ord("a") + i) for i in range(rng.randint(1, 8))]
+		case["-L"] = ",".join(f"{name}:{rng.randint(1, 200)}:{rng.randint(1, 300)}" for name in names)
+		if _maybe(rng, 0.3):
+			case["-A"] = ",".join(f"{name}:" + ".".join(str(c) for c in sorted(rng.sample(range(cpus), rng.randint(1, cpus))))
+								  for name in rng.sample(names, rng.randint(1, len(names))))
+	else:
+		case["-j"] = str(rng.randint(1, 4 * cpus))
+		case["-R"] = str(rng.randint(1, 300))
+		case["-W"] = str(rng.randint(1, 300))
+	for flag, low, high in (("-q", 1, 20), ("-P", 0, 50), ("-w", 0, 20), ("-r", 1, 4), ("-M", 1, 400)):
+		if _maybe(rng):
+			case[flag] = str(rng.randint(low, high))
+	for flag in ("-p", "-o", "-t", "-T", "-C", "-S"):
+		if _maybe(rng, 0.3):
+			case[flag] = None
+	return case
+
+_generators: dict[str, Callable[[random.Random], Case]] = {
+	"basic": _basic_case,
+	"lottery": _lottery_case,
+	"mlfq": _mlfq_case,
+	"multi": _multi_case,
+}
+
+# fast paths that apply to each script; "script" is the script as it is now, run the way the reference is
+_paths = {
+	"basic": ["script", "pool"],
+	"lottery": ["script", "pool"],
+	"mlfq": ["script", "pool", "checkpoints"],
+	"multi": ["script", "vector", "pool"],
+}
+
+def _argv(case:Case) -> list[str]:
+	argv = ["-c"]
+	for flag, value in case.items():
+		argv.append(flag)
+		if value is not None:
+			argv.append(value)
+	return argv
+
+def command_line(script:str, case:Case) -> str:
+	"""The case as a shell command, for reproducing it by hand"""
+	return " ".join(["python", f"ostep/{script}.py"] + _argv(case))
+
+def extract_reference(revision:str, directory:str) -> str:
+	"""Writes the simulator scripts as they were at revision into directory, returning it"""
+	for script in _generators:
+		source = subprocess.run(["git", "show", f"{revision}:ostep/{script}.py"], cwd=ROOT,
+								capture_output=True, text=True, check=True).stdout
+		with open(os.path.join(directory, f"{script}.py"), "w") as f:
+			f.write(source)
+	return directory
+
+def first_commit() -> str:
+	"""The repository's first commit, holding the original OSTEP scripts"""
+	return subprocess.run(["git", "rev-list", "--max-parents=0", "HEAD"], cwd=ROOT,
+						  capture_output=True, text=True, check=True).stdout.split()[-1]
+
+class Fuzzer:
+	"""Runs cases against the reference scripts and the fast paths, shrinking any that differ"""
+	def __init__(self, reference:str, pool:SimulatorPool | None, scratch:str) -> None:
+		self._reference = reference
+		self._pool = pool
+		self._scratch = scratch
+		self._checkpoint_runs = 0
+
+	def _timed(self, cmd:list[str]) -> tuple[str | None, float]:
+		start = time.perf_counter()
+		result = subprocess.run(cmd, capture_output=True, text=True)
+		seconds = time.perf_counter() - start
+		# a non-zero exit is a bad option set, not a mismatch: only stdout of good runs is compared
+		return (result.stdout if result.returncode == 0 else None), seconds
+
+	def reference(self, script:str, case:Case) -> tuple[str | None, float]:
+		"""Output of the original script, None if it rejects the options"""
+		return self._timed([sys.executable, os.path.join(self._reference, f"{script}.py")] + _argv(case))
+
+	def fast(self, script:str, path:str, case:Case, prior:Case) -> tuple[str | None, float]:
+		"""Output of one fast path on the case; checkpoints runs prior first so the case resumes from it"""
+		program = os.path.join(ROOT, "ostep", f"{script}.py")
+		if path == "script":
+			return self._timed([sys.executable, program] + _argv(case))
+		if path == "vector":
+			return self._timed([sys.executable, program] + _argv(case) + ["--engine", "vector"])
+		if path == "pool":
+			start = time.perf_counter()
+			output = self._pool.run(f"ostep/{script}.py", {}, _argv(case)[1:])
+			return output, time.perf_counter() - start
+		if path == "checkpoints":
+			self._checkpoint_runs += 1
+			extra = ["--checkpoints", os.path.join(self._scratch, f"checkpoints{self._checkpoint_runs}")]
+			subprocess.run([sys.executable, program] + _argv(prior) + extra, capture_output=True)
+			return self._timed([sys.executable, program] + _argv(case) + extra)
+		raise ValueError(f"unknown fast path {path}")
+
+	def differs(self, script:str, path:str, case:Case, prior:Case) -> bool:
+		"""Whether the fast path prints something else than the reference; False for option sets the reference rejects"""
+		expected, _ = self.reference(script, case)
+		if expected is None:
+			return False
+		output, _ = self.fast(script, path, case, prior)
+		return output != expected
+
+	def check(self, script:str, path:str, case:Case, prior:Case) -> Outcome | None:
+		"""Runs the case on the reference and one fast path, None if the reference rejects the options"""
+		expected, reference_seconds = self.reference(script, case)
+		if expected is None:
+			return None
+		output, seconds = self.fast(script, path, case, prior)
+		return Outcome(script, path, case, output == expected, reference_seconds, seconds)
+
+	def shrink(self, script:str, path:str, case:Case, prior:Case, budget:int = 200) -> Case:
+		"""Smallest case found that still differs: options dropped, numbers lowered, list entries removed"""
+		shrunk = True
+		while shrunk and budget > 0:
+			shrunk = False
+			for candidate in _smaller(script, case):
+				budget -= 1
+				if self.differs(script, path, candidate, prior):
+					case, shrunk = candidate, True
+					break
+				if budget <= 0:
+					break
+		return case
+
+def _smaller(script:str, case:Case):
+	"""Cases one step smaller than case, the biggest steps first"""
+	for flag in case:
+		if flag != "-s":
+			yield {k: v for k, v in case.items() if k != flag}
+	for flag, value in case.items():
+		if value is None:
+			continue
+		if value.isdigit():
+			for smaller in (0, 1, int(value) // 2, int(value) - 1):
+				if 0 <= smaller < int(value):
+					yield {**case, flag: str(smaller)}
+			continue
+		separator = ":" if script == "mlfq" and flag == "-l" else ","
+		entries = value.split(separator)
+		if len(entries) > 1:
+			for i in range(len(entries)):
+				yield {**case, flag: separator.join(entries[:i] + entries[i + 1:])}
+
+def _prior(script:str, case:Case, rng:random.Random) -> Case:
+	"""Case with one option redrawn, the run the checkpoints path resumes from"""
+	other = _generators[script](rng)
+	flag = rng.choice(list(other))
+	return {**case, flag: other[flag]}
+
+def fuzz(cases:int, seed:int, scripts:list[str], paths:list[str], reference:str,
+		 report:Callable[[Outcome], None]) -> list[tuple[Outcome, Case]]:
+	"""Runs cases random option sets per script, returning each mismatch with its shrunk case"""
+	rng = random.Random(seed)
+	failures = []
+	pool = SimulatorPool(size=1) if "pool" in paths else None
+	try:
+		with tempfile.TemporaryDirectory() as scratch:
+			fuzzer = Fuzzer(reference, pool, scratch)
+			for _ in range(cases):
+				for script in scripts:
+					case = _generators[script](rng)
+					prior = _prior(script, case, rng)
+					for path in _paths[script]:
+						if path not in paths or (path == "vector" and numpy is None):
+							continue
+						outcome = fuzzer.check(script, path, case, prior)
+						if outcome is None:
+							continue
+						report(outcome)
+						if not outcome.same:
+							failures.append((outcome, fuzzer.shrink(script, path, case, prior)))
+	finally:
+		if pool is not None:
+			pool.close()
+	return failures
+
+def main():
+	parser = OptionParser(usage="usage: %prog [options]")
+	parser.add_option("-n", "--cases", default=50, help="option sets to draw per script", action="store", type="int", dest="cases")
+	parser.add_option("-s", "--seed", default=0, help="seed for drawing option sets", action="store", type="int", dest="seed")
+	parser.add_option("--scripts", default=",".join(_generators), help="comma-separated scripts to fuzz", action="store", type="string", dest="scripts")
+	parser.add_option("--paths", default="script,vector,pool,checkpoints", help="comma-separated fast paths to check", action="store", type="string", dest="paths")
+	parser.add_option("--reference", default="", help="git revision holding the reference scripts (default: the first commit)", action="store", type="string", dest="reference")
+	parser.add_option("--out", default="", help="write one JSON line per case run, with its timings, to this file", action="store", type="string", dest="out")
+	(options, _) = parser.parse_args()
+
+	scripts = options.scripts.split(",")
+	paths = options.paths.split(",")
+	out = open(options.out, "w") if options.out else None
+	speedups: dict[tuple[str, str], list[float]] = {}
+
+	def report(outcome:Outcome):
+		speedups.setdefault((outcome.script, outcome.path), []).append(outcome.speedup)
+		if out is not None:
+			out.write(json.dumps({"script": outcome.script, "path": outcome.path, "case": outcome.case,
+								  "same": outcome.same, "reference_seconds": outcome.reference_seconds,
+								  "seconds": outcome.seconds, "speedup": outcome.speedup}) + "\n")
+		if not outcome.same:
+			print(f"MISMATCH {outcome.path}: {command_line(outcome.script, outcome.case)}", flush=True)
+
+	with tempfile.TemporaryDirectory() as directory:
+		reference = extract_reference(options.reference or first_commit(), directory)
+		try:
+			failures = fuzz(options.cases, options.seed, scripts, paths, reference, report)
+		finally:
+			if out is not None:
+				out.close()
+
+	print("%-8s %-12s %6s %10s" % ("script", "path", "cases", "speedup"))
+	for (script, path), values in sorted(speedups.items()):
+		# geometric mean, as speedups multiply
+		mean = 1.0
+		for value in values:
+			mean *= value ** (1.0 / len(values))
+		print("%-8s %-12s %6d %9.2fx" % (script, path, len(values), mean))
+
+	if failures:
+		print(f"\n{len(failures)} mismatches, shrunk to:")
+		for outcome, case in failures:
+			print(f"  [{outcome.path}] {command_line(outcome.script, case)}")
+		sys.exit(1)
+	print("\nno mismatches")
+
+if __name__ == "__main__":
+	main()
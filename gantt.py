@@ -0,0 +1,160 @@
+"""Gantt-chart timelines built from the simulators' run segments
+
+A simulator run with --segments FILE writes one "lane start end job" line per
+stretch of running. GanttData keeps those segments per lane in compact arrays,
+plus a stack of coarser copies (each twice as coarse as the one below it), so
+that drawing any window at any zoom only touches about two segments per pixel:
+a view downsamples the coarsest copy that is still finer than a pixel, and
+merges what lands in each pixel into at most one shape per pixel per lane.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, NamedTuple
+import math
+
+class Segment(NamedTuple):
+	"""Job ran on lane (a CPU or an MLFQ level) from start to end"""
+	lane: int
+	start: float
+	end: float
+	job: str
+
+class Shape(NamedTuple):
+	"""One drawn bar: pixels x0 to x1 of a lane, coloured for the job with this id"""
+	x0: int
+	x1: int
+	job: int
+
+def read_segments(path:str) -> Iterator[Segment]:
+	"""Reads a segment file written by a simulator"""
+	with open(path) as f:
+		for line in f:
+			lane, start, end, job = line.split()
+			yield Segment(int(lane), float(start), float(end), job)
+
+def merge_segments(segments:Iterable[Segment]) -> Iterator[Segment]:
+	"""Joins back-to-back segments of the same job on the same lane (segments of a lane must come in time order)"""
+	pending: dict[int, Segment] = {}
+	for segment in segments:
+		last = pending.get(segment.lane)
+		if last is not None and last.job == segment.job and last.end == segment.start:
+			pending[segment.lane] = last._replace(end=segment.end)
+			continue
+		if last is not None:
+			yield last
+		pending[segment.lane] = segment
+	yield from pending.values()
+
+def downsample(starts:array, ends:array, jobs:array, t0:float, t1:float, width:int) -> list[Shape]:
+	"""Turns the segments overlapping [t0, t1) into at most width shapes, each pixel going to the job covering most of it"""
+	pixel = (t1 - t0) / width
+	winner = [-1] * width
+	best = [0.0] * width
+
+	first = bisect_right(ends, t0)
+	last = bisect_left(starts, t1)
+	for i in range(first, last):
+		x0 = (max(starts[i], t0) - t0) / pixel
+		x1 = (min(ends[i], t1) - t0) / pixel
+		job = jobs[i]
+
+		# pixels the segment covers completely
+		full0 = math.ceil(x0)
+		full1 = min(int(x1), width)
+		if full1 > full0:
+			winner[full0:full1] = [job] * (full1 - full0)
+			best[full0:full1] = [1.0] * (full1 - full0)
+
+		# the partly covered pixels at either end
+		for p in {int(x0), int(x1)}:
+			if p >= width or full0 <= p < full1:
+				continue
+			covered = min(x1, p + 1) - max(x0, p)
+			if covered > best[p]:
+				best[p] = covered
+				winner[p] = job
+
+	shapes = []
+	x = 0
+	while x < width:
+		job = winner[x]
+		end = x + 1
+		while end < width and winner[end] == job:
+			end += 1
+		if job != -1:
+			shapes.append(Shape(x, end, job))
+		x = end
+	return shapes
+
+class _Level:
+	"""Segments of one lane at one resolution, in time order"""
+	def __init__(self, bucket:float) -> None:
+		self.bucket = bucket
+		self.starts = array("d")
+		self.ends = array("d")
+		self.jobs = array("l")
+
+	def append(self, start:float, end:float, job:int):
+		self.starts.append(start)
+		self.ends.append(end)
+		self.jobs.append(job)
+
+class GanttData:
+	"""Run segments of a whole simulation, ready to be drawn at any zoom"""
+	def __init__(self, segments:Iterable[Segment], width:int = 1000) -> None:
+		self._width = width
+		self._job_ids: dict[str, int] = {}
+		self.jobs: list[str] = []
+		self.start = math.inf
+		self.end = -math.inf
+
+		raw: dict[int, _Level] = {}
+		for segment in merge_segments(segments):
+			job = self._job_ids.get(segment.job)
+			if job is None:
+				job = self._job_ids[segment.job] = len(self.jobs)
+				self.jobs.append(segment.job)
+			level = raw.get(segment.lane)
+			if level is None:
+				level = raw[segment.lane] = _Level(0.0)
+			level.append(segment.start, segment.end, job)
+			self.start = min(self.start, segment.start)
+			self.end = max(self.end, segment.end)
+
+		self.lanes = sorted(raw)
+		self._levels = {lane: self._build_levels(raw[lane]) for lane in self.lanes}
+
+	def _build_levels(self, raw:_Level) -> list[_Level]:
+		"""Raw segments followed by coarser and coarser copies, until one fits in width shapes"""
+		levels = [raw]
+		span = self.end - self.start
+		if span <= 0:
+			return levels
+
+		# finest coarse copy: about as many buckets as there are raw segments
+		pixels = self._width
+		while pixels * 2 < len(raw.starts):
+			pixels *= 2
+
+		while pixels >= self._width and len(levels[-1].starts) > self._width:
+			finer = levels[-1]
+			level = _Level(span / pixels)
+			for shape in downsample(finer.starts, finer.ends, finer.jobs, self.start, self.end, pixels):
+				level.append(self.start + shape.x0 * level.bucket, self.start + shape.x1 * level.bucket, shape.job)
+			levels.append(level)
+			pixels //= 2
+		return levels
+
+	def view(self, t0:float, t1:float, width:int) -> dict[int, list[Shape]]:
+		"""Shapes to draw for each lane when [t0, t1) is shown across width pixels"""
+		pixel = (t1 - t0) / width
+		shapes = {}
+		for lane in self.lanes:
+			level = self._levels[lane][0]
+			for coarser in self._levels[lane][1:]:
+				if coarser.bucket > pixel:
+					break
+				level = coarser
+			shapes[lane] = downsample(level.starts, level.ends, level.jobs, t0, t1, width)
+		return shapes
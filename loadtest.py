@@ -0,0 +1,163 @@
+"""Load test of the served app: throughput and latency of solves at N concurrent sessions
+
+Each session stands in for one student: it has its own SchedulerModel, as a
+browser session of main.py --web does, and all of them share one worker pool
+and one result store. A session picks a simulator, then solves one after
+another with a pause between, much as a student works through a homework
+question; a share of the solves repeat a parameter set the whole class is
+given, so the shared store answers them (or, while the first such run is still
+going, it is joined), and the rest use a seed of their own.
+The simulations run for real on the pool; only the browser is left out.
+
+	python loadtest.py --sessions 1,10,50,200 --solves 5 --workers 4
+"""
+
+from optparse import OptionParser
+from typing import NamedTuple
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from flight import SingleFlight
+from model import SchedulerModel
+from pool import SimulatorPool
+from store import ResultStore
+
+# what the sessions solve: the parameter sets handed out to the whole class, per simulator
+ASSIGNMENTS = {"Basic":		[{"SEED": "1", "JOBS": "3", "POLICY": "SJF"},
+							 {"SEED": "2", "JOBS": "5", "POLICY": "RR", "QUANTUM": "2"}],
+			   "Lottery":	[{"SEED": "1", "JOBS": "3"},
+							 {"SEED": "3", "JLIST": "10:100,10:10", "QUANTUM": "1"}],
+			   "Stride":	[{"SEED": "1", "JOBS": "3"}],
+			   "MLFQ":		[{"SEED": "1", "JOBS": "3", "NUMQUEUES": "3"},
+							 {"SEED": "2", "JOBS": "4", "QUANTUMLIST": "10,20,40", "BOOST": "50"}],
+			   "Multi-CPU":	[{"SEED": "1", "JOBS": "4", "CPUS": "2", "TRACE": "True"},
+							 {"SEED": "2", "JOBS": "6", "CPUS": "4", "PERCPU": "True"}],
+			   }
+
+class _CountingStore(ResultStore):
+	"""Result store that counts how many lookups it answered"""
+	def __init__(self, path:str) -> None:
+		super().__init__(path)
+		self._lock = threading.Lock()
+		self.hits = 0
+
+	def get(self, key:str) -> str | None:
+		output = super().get(key)
+		if output is not None:
+			with self._lock:
+				self.hits += 1
+		return output
+
+class LoadResult(NamedTuple):
+	"""Every solve's latency at one number of sessions, and how long they took altogether"""
+	sessions: int
+	latencies: list[float]
+	errors: int
+	hits: int
+	joined: int
+	saved_seconds: float
+	seconds: float
+
+	@property
+	def throughput(self) -> float:
+		return len(self.latencies) / self.seconds if self.seconds else 0.0
+
+def _percentile(values:list[float], fraction:float) -> float:
+	# nearest rank
+	ordered = sorted(values)
+	return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def _session(number:int, seed:int, solves:int, repeat:float, think:float, pool:SimulatorPool,
+			 store:ResultStore | None, flight:SingleFlight, checkpoints:str, start:threading.Barrier,
+			 latencies:list[float], errors:list[int], lock:threading.Lock):
+	rng = random.Random(seed * 100003 + number)
+	model = SchedulerModel(store=store, pool=pool, checkpoints=os.path.join(checkpoints, str(number)), flight=flight)
+	simulator = rng.choice(list(ASSIGNMENTS))
+	model.change_scheduler(simulator)
+	start.wait()
+	for _ in range(solves):
+		parameters = dict(rng.choice(ASSIGNMENTS[simulator]))
+		if rng.random() >= repeat:
+			parameters["SEED"] = str(rng.randrange(1000000))
+		began = time.perf_counter()
+		try:
+			model.solve(parameters)
+		except Exception:
+			with lock:
+				errors[0] += 1
+			continue
+		with lock:
+			latencies.append(time.perf_counter() - began)
+		if think > 0:
+			time.sleep(rng.uniform(0, 2 * think))
+
+def load(sessions:int, solves:int, pool:SimulatorPool, repeat:float = 0.5, think:float = 0.0,
+		 seed:int = 0, store:bool = True) -> LoadResult:
+	"""Runs sessions concurrent sessions of solves solves each against a shared pool and a fresh shared store"""
+	directory = tempfile.mkdtemp(prefix="ostep-load-")
+	try:
+		shared = _CountingStore(os.path.join(directory, "results.sqlite3")) if store else None
+		flight = SingleFlight()
+		latencies: list[float] = []
+		errors = [0]
+		lock = threading.Lock()
+		# every session is set up before the clock starts, so the timing is of solves alone
+		start = threading.Barrier(sessions + 1)
+		threads = [threading.Thread(target=_session, daemon=True,
+									args=(number, seed, solves, repeat, think, pool, shared, flight,
+										  os.path.join(directory, "checkpoints"), start, latencies, errors, lock))
+				   for number in range(sessions)]
+		for thread in threads:
+			thread.start()
+		start.wait()
+		began = time.perf_counter()
+		for thread in threads:
+			thread.join()
+		seconds = time.perf_counter() - began
+		stats = flight.stats
+		return LoadResult(sessions, latencies, errors[0], shared.hits if shared is not None else 0,
+						  stats.joined, stats.saved_seconds, seconds)
+	finally:
+		shutil.rmtree(directory, ignore_errors=True)
+
+HEADER = "%8s %7s %7s %10s %8s %8s %8s %8s %8s %6s %7s %8s" % \
+		 ("sessions", "solves", "errors", "solves/s", "mean", "p50", "p95", "p99", "max", "hits", "joined", "saved s")
+
+def format_result(result:LoadResult) -> str:
+	"""One row of the table under HEADER; latencies in milliseconds"""
+	if not result.latencies:
+		return "%8d %7d %7d" % (result.sessions, 0, result.errors)
+	ms = [1000 * latency for latency in result.latencies]
+	return "%8d %7d %7d %10.1f %8.1f %8.1f %8.1f %8.1f %8.1f %5.0f%% %7d %8.2f" % \
+		   (result.sessions, len(ms), result.errors, result.throughput, sum(ms) / len(ms),
+			_percentile(ms, 0.50), _percentile(ms, 0.95), _percentile(ms, 0.99), max(ms),
+			100.0 * result.hits / len(ms), result.joined, result.saved_seconds)
+
+def main():
+	parser = OptionParser(usage="usage: %prog [options]")
+	parser.add_option("-n", "--sessions", default="1,10,50", help="comma-separated numbers of concurrent sessions to try", action="store", type="string", dest="sessions")
+	parser.add_option("--solves", default=5, help="solves per session", action="store", type="int", dest="solves")
+	parser.add_option("--workers", default=0, help="size of the shared worker pool (default: one per CPU, up to 8)", action="store", type="int", dest="workers")
+	parser.add_option("--repeat", default=0.5, help="share of solves that repeat a parameter set the whole class is given", action="store", type="float", dest="repeat")
+	parser.add_option("--think", default=0.0, help="mean seconds a session pauses between solves", action="store", type="float", dest="think")
+	parser.add_option("--no-store", default=True, help="run without the shared result store", action="store_false", dest="store")
+	parser.add_option("-s", "--seed", default=0, help="seed for what the sessions solve", action="store", type="int", dest="seed")
+	(options, _) = parser.parse_args()
+
+	pool = SimulatorPool(options.workers or None)
+	try:
+		print(HEADER, flush=True)
+		for sessions in (int(n) for n in options.sessions.split(",")):
+			result = load(sessions, options.solves, pool, options.repeat, options.think, options.seed, options.store)
+			print(format_result(result), flush=True)
+	finally:
+		pool.close()
+	print(f"\n{pool.size} workers, {options.solves} solves per session, {options.repeat:.0%} repeated")
+
+if __name__ == "__main__":
+	main()
@@ -12,16 +12,46 @@
 """
 
 import flet as ft
+import os
+import shutil
+import threading
+from optparse import OptionParser
 from model import *
+from compare import METRICS, STATISTICS
+from rundiff import format_diff
+from tuner import format_tuning
+from store import default_cache_dir
 from typing import Protocol
 
 DEBUG_MODE = True
 
+GANTT_WIDTH = 750
+GANTT_COLORS = ["blue", "orange", "green", "red", "purple", "brown", "pink", "teal", "amber", "indigo"]
+
+# seconds without edits after which the live preview re-solves
+PREVIEW_DELAY = 0.4
+
 class SchedulerRunner(Protocol):
     def change_scheduler(self, new_scheduler: str):
         ...
     def solve(self, parameters: dict[str,str]) -> list[str]:
         ...
+    def compare(self, parameters: dict[str,str]) -> list[PolicyStats]:
+        ...
+    def diff(self, parameters: dict[str,str]) -> RunDiff | None:
+        ...
+    def tune(self, parameters: dict[str,str], objective: str) -> Tuning:
+        ...
+    def preview(self, parameters: dict[str,str]) -> str:
+        ...
+    def cancel_preview(self):
+        ...
+    def cancel(self):
+        ...
+    def timeline(self, parameters: dict[str,str]) -> GanttData:
+        ...
+    def lane_label(self, lane: int) -> str:
+        ...
 
 class SchedulerView:
     """Flet based view of Scheduler simulators"""
@@ -40,10 +70,58 @@ class SchedulerView:
 
         self._submit_button = ft.ElevatedButton(text="Solve", on_click=self._solve, icon="forest")     
 
+        self._progress_bar = ft.ProgressBar(width=750, value=0)
+
+        self._progress_text = ft.Text()
+
+        self._cancel_button = ft.ElevatedButton(text="Cancel", on_click=self._cancel, icon="cancel")
+
+        self._progress = ft.Column(spacing=2, visible=False,
+                                   controls=[self._progress_bar, ft.Row([self._progress_text, self._cancel_button])])
+
+        self._preview_switch = ft.Switch(label="Live preview", value=False, on_change=self._toggle_preview)
+
+        self._preview_text = ft.Text(font_family="Consolas")
+
+        self._preview_timer: threading.Timer | None = None
+
+        self._preview_generation = 0
+
         self._results_button = ft.ElevatedButton(text="Show results", on_click=self._show_results, icon="forest")     
 
+        self._compare_button = ft.ElevatedButton(text="Compare policies", on_click=self._compare, icon="compare_arrows")
+
+        self._comparison = ft.Column(spacing=2)
+
+        self._diff_button = ft.ElevatedButton(text="Diff with last solve", on_click=self._diff, icon="difference")
+
+        self._diff_text = ft.Text(font_family="Consolas")
+
+        self._objective = ft.TextField(label="Objective", value="mean response", width=750,
+                                       hint_text="mean response, p99 turnaround, or a mix like 0.7*mean response + 0.3*p99 turnaround")
+
+        self._tune_button = ft.ElevatedButton(text="Tune MLFQ", on_click=self._tune, icon="tune")
+
+        self._tuning_text = ft.Text(font_family="Consolas")
+
+        self._gantt_button = ft.ElevatedButton(text="Show timeline", on_click=self._show_timeline, icon="view_timeline")
+
+        self._gantt_zoom = ft.Slider(min=0, max=16, divisions=16, value=0, label="zoom x2^{value}",
+                                     width=GANTT_WIDTH, on_change=self._draw_gantt)
+
+        self._gantt_pan = ft.Slider(min=0, max=1, value=0, width=GANTT_WIDTH, on_change=self._draw_gantt)
+
+        self._gantt_lanes = ft.Column(spacing=2)
+
+        self._gantt = ft.Column(spacing=2, visible=False,
+                                controls=[self._gantt_lanes, ft.Text("Zoom"), self._gantt_zoom, ft.Text("Pan"), self._gantt_pan])
+
+        self._gantt_data: GanttData | None = None
+
         self._debug_text = ft.Text()     
 
+        self._profile_text = ft.Text(font_family="Consolas")
+
         self._saved_results: str
 
         self._scheduler_changer: SchedulerRunner
@@ -59,6 +137,8 @@ class SchedulerView:
         """Clears Given and Results text"""
         self._given.controls = []
         self._results.controls = []
+        self.stop_preview()
+        self._preview_text.value = ""
         self._refresh_page()
 
     def _change_scheduler(self, _: ft.ControlEvent):
@@ -70,13 +150,13 @@ class SchedulerView:
         self._scheduler_changer.change_scheduler(new_scheduler)
 
         self._clear_page()
+        if self._preview_switch.value:
+            self._schedule_preview(0)
 
         self._scheduler_choice.focus()
 
-    def _solve(self, _: ft.ControlEvent):
-        """Solve Scheduling setup given parameters indicated"""
-        if self._scheduler_choice.value is None:
-            return
+    def _collect_parameters(self) -> dict[str,str]:
+        """Parameter values entered by the user, skipping empty fields"""
         parameters = {}
 
         for param in self._parameters:
@@ -84,13 +164,84 @@ class SchedulerView:
                 continue
             parameters[param.label] = param.value
 
-        given, results = self._scheduler_changer.solve(parameters)
+        return parameters
+
+    def _solve(self, _: ft.ControlEvent):
+        """Solve Scheduling setup given parameters indicated"""
+        if self._scheduler_choice.value is None:
+            return
+        parameters = self._collect_parameters()
+
+        self._submit_button.disabled = True
+        self._progress_bar.value = None
+        self._progress_text.value = "Solving..."
+        self._progress.visible = True
+        self._refresh_page()
+        try:
+            given, results = self._scheduler_changer.solve(parameters)
+        except SimulationCancelled:
+            self._given.controls = [ft.Text(value="Solve cancelled")]
+            return
+        finally:
+            self._submit_button.disabled = False
+            self._progress.visible = False
+            self._refresh_page()
 
         self._saved_results = results
 
         self._given.controls = [ft.Text(value=given)]
         self._refresh_page()
 
+    def _edited(self, _: ft.ControlEvent):
+        """Re-solves the live preview once the parameters have not changed for PREVIEW_DELAY seconds"""
+        if self._preview_switch.value:
+            self._schedule_preview()
+
+    def _toggle_preview(self, _: ft.ControlEvent):
+        """Turns the live preview on (showing the entered parameters at once) or off"""
+        if self._preview_switch.value:
+            self._schedule_preview(0)
+            return
+        self.stop_preview()
+        self._preview_text.value = ""
+        self._refresh_page()
+
+    def _schedule_preview(self, delay: float = PREVIEW_DELAY):
+        """Starts the preview timer afresh; every edit restarts it, so only the last of a burst of edits is solved"""
+        self.stop_preview()
+        timer = threading.Timer(delay, self._preview, args=(self._preview_generation,))
+        timer.daemon = True
+        self._preview_timer = timer
+        timer.start()
+
+    def _preview(self, generation: int):
+        """Solves the entered parameters for their statistics only and shows them, unless newer edits came in meanwhile"""
+        if self._scheduler_choice.value is None:
+            return
+        try:
+            summary = self._scheduler_changer.preview(self._collect_parameters())
+        except SimulationCancelled:
+            return
+        except Exception as error:
+            # this runs on a timer thread, so nothing above it would report a failed solve (a pool worker dying, say)
+            summary = f"Preview failed: {error}"
+        if generation != self._preview_generation:
+            return
+        self._preview_text.value = summary
+        self._refresh_page()
+
+    def stop_preview(self):
+        """Drops the pending preview and any still solving"""
+        self._preview_generation += 1
+        if self._preview_timer is not None:
+            self._preview_timer.cancel()
+            self._preview_timer = None
+            self._scheduler_changer.cancel_preview()
+
+    def _cancel(self, _: ft.ControlEvent):
+        """Stops the solve in progress"""
+        self._scheduler_changer.cancel()
+
     def _show_results(self, _: ft.ControlEvent):
         """Shows results of given parameters using scheduling algo"""
         if self._scheduler_choice.value is None:
@@ -98,6 +249,86 @@ class SchedulerView:
         self._results.controls = [ft.Text(value=self._saved_results)]
         self._refresh_page()
 
+    def _compare(self, _: ft.ControlEvent):
+        """Runs the entered workload against every policy and shows one table of their statistics"""
+        try:
+            results = self._scheduler_changer.compare(self._collect_parameters())
+        except ValueError as error:
+            self._comparison.controls = [ft.Text(value=str(error))]
+            self._refresh_page()
+            return
+
+        columns = [ft.DataColumn(ft.Text("Policy"))]
+        columns += [ft.DataColumn(ft.Text(f"{metric} {stat}"), numeric=True)
+                    for metric in METRICS for stat in STATISTICS]
+        columns.append(ft.DataColumn(ft.Text("secs"), numeric=True))
+
+        rows = []
+        for result in results:
+            cells = [ft.DataCell(ft.Text(result.policy))]
+            cells += [ft.DataCell(ft.Text("%.2f" % result.metrics.get(metric, {}).get(stat, float("nan"))))
+                      for metric in METRICS for stat in STATISTICS]
+            cells.append(ft.DataCell(ft.Text("%.3f" % result.seconds)))
+            rows.append(ft.DataRow(cells=cells))
+
+        self._comparison.controls = [ft.Row([ft.DataTable(columns=columns, rows=rows)], scroll=ft.ScrollMode.AUTO)]
+        self._refresh_page()
+
+    def _diff(self, _: ft.ControlEvent):
+        """Shows where a run of the entered parameters departs from the last solve, and what it changes"""
+        if self._scheduler_choice.value is None:
+            return
+        diff = self._scheduler_changer.diff(self._collect_parameters())
+        self._diff_text.value = format_diff(diff) if diff is not None else "Solve once first to have a run to diff against"
+        self._refresh_page()
+
+    def _tune(self, _: ft.ControlEvent):
+        """Searches MLFQ settings for the entered workload and shows the best one and the trade-off curve"""
+        if self._scheduler_choice.value is None:
+            return
+        self._tune_button.disabled = True
+        self._tuning_text.value = "Tuning..."
+        self._refresh_page()
+        try:
+            tuning = self._scheduler_changer.tune(self._collect_parameters(), self._objective.value or "")
+            self._tuning_text.value = format_tuning(tuning)
+        except ValueError as error:
+            self._tuning_text.value = str(error)
+        finally:
+            self._tune_button.disabled = False
+            self._refresh_page()
+
+    def _show_timeline(self, _: ft.ControlEvent):
+        """Shows a Gantt chart of which job ran when, one lane per CPU or MLFQ level"""
+        if self._scheduler_choice.value is None:
+            return
+        self._gantt_data = self._scheduler_changer.timeline(self._collect_parameters())
+        self._gantt_zoom.value = 0
+        self._gantt_pan.value = 0
+        self._gantt.visible = True
+        self._draw_gantt(None)
+
+    def _draw_gantt(self, _: ft.ControlEvent | None):
+        """Redraws the visible window of the Gantt chart, at most one shape per pixel per lane"""
+        data = self._gantt_data
+        if data is None or not data.lanes:
+            return
+        span = data.end - data.start
+        visible = span / 2 ** self._gantt_zoom.value
+        t0 = data.start + self._gantt_pan.value * (span - visible)
+        t1 = t0 + visible
+
+        rows = [ft.Text(f"time {t0:.1f} to {t1:.1f}")]
+        for lane, shapes in data.view(t0, t1, GANTT_WIDTH).items():
+            bars = [ft.Container(left=shape.x0, width=shape.x1 - shape.x0, height=18,
+                                 bgcolor=GANTT_COLORS[shape.job % len(GANTT_COLORS)],
+                                 tooltip=f"job {data.jobs[shape.job]}")
+                    for shape in shapes]
+            rows.append(ft.Row([ft.Text(self._scheduler_changer.lane_label(lane), width=60),
+                                ft.Stack(bars, width=GANTT_WIDTH, height=18)]))
+        self._gantt_lanes.controls = rows
+        self._refresh_page()
+
     def register_scheduler_changer(self, callback: SchedulerRunner):
         """Provides path from view back to controller"""
         self._scheduler_changer = callback
@@ -111,11 +342,24 @@ class SchedulerView:
         contents.append(self._parameter_fields)
         contents.append(self._results)
         contents.append(self._submit_button)
+        contents.append(self._progress)
+        contents.append(self._preview_switch)
+        contents.append(self._preview_text)
         if DEBUG_MODE:
             contents.append(self._debug_text)
+            contents.append(self._profile_text)
         contents.append(self._given)
         contents.append(self._results_button)
         contents.append(self._results)
+        contents.append(self._compare_button)
+        contents.append(self._comparison)
+        contents.append(self._diff_button)
+        contents.append(self._diff_text)
+        contents.append(self._objective)
+        contents.append(self._tune_button)
+        contents.append(self._tuning_text)
+        contents.append(self._gantt_button)
+        contents.append(self._gantt)
 
         entries = ft.Column(scroll=ft.ScrollMode.ALWAYS, expand=True, controls = contents)
 
@@ -130,9 +374,21 @@ class SchedulerView:
         self._debug_text.value = f"Scheduler changed to {curr_sched}"
         self._refresh_page()
 
+    def show_profile(self, profile: str):
+        """Shows phase timings of the last solve under the debug text"""
+        self._profile_text.value = profile
+        self._refresh_page()
+
+    def show_progress(self, progress: Progress):
+        """Shows how far the running solve has got"""
+        self._progress_bar.value = progress.done / progress.total if progress.total else None
+        self._progress_text.value = (f"time {progress.time}, {progress.done} of {progress.total} jobs done, "
+                                     f"{progress.rate:.0f} ticks/sec")
+        self._refresh_page()
+
     def show_parameters(self, params: list[str], text_hints: dict[str,str]):
         """Shows parameters for scheduling algorithm chosen"""
-        content = [ft.TextField(label=param, hint_text=text_hints[param], width=750)
+        content = [ft.TextField(label=param, hint_text=text_hints[param], width=750, on_change=self._edited)
                 for param in params]
         self._parameters = content
         self._parameter_fields.controls = content
@@ -145,8 +401,12 @@ class SchedulerController:
         self._view = view
 
     def start(self):
+        ft.app(self.attach)                                         # only Flet specific command in controller
+
+    def attach(self, page: ft.Page):
+        """Shows this controller's view on a page: the desktop window, or one browser session when served"""
         self._view.register_scheduler_changer(self)
-        ft.app(self._view.entrypoint)                               # only Flet specific command in controller
+        self._view.entrypoint(page)
 
     def change_scheduler(self, new_scheduler: str):
         model = self._model
@@ -159,16 +419,91 @@ class SchedulerController:
         view.show_parameters(model.scheduler_parameters, model.param_text_hints)
 
     def solve(self, parameters: dict[str,str]) -> list[str]:
-        return self._model.solve(parameters)
+        results = self._model.solve(parameters, on_progress=self._view.show_progress)
+        if DEBUG_MODE:
+            self._view.show_profile(f"{self._model.last_profile}\nCoalescing: {self._model.coalescing}")
+        return results
+
+    def compare(self, parameters: dict[str,str]) -> list[PolicyStats]:
+        return self._model.compare(parameters)
+
+    def diff(self, parameters: dict[str,str]) -> RunDiff | None:
+        return self._model.diff(parameters)
+
+    def tune(self, parameters: dict[str,str], objective: str) -> Tuning:
+        return self._model.tune(parameters, objective)
+
+    def preview(self, parameters: dict[str,str]) -> str:
+        return self._model.preview(parameters)
+
+    def cancel_preview(self):
+        self._model.cancel_preview()
+
+    def cancel(self):
+        self._model.cancel()
+
+    def timeline(self, parameters: dict[str,str]) -> GanttData:
+        return self._model.timeline(parameters)
+
+    def lane_label(self, lane: int) -> str:
+        return self._model.lane_label(lane)
+
+
+def serve(port: int, workers: int | None):
+    """Serves the app to browsers, with a model, view and controller per session
+
+    The worker pool, which bounds how many simulations run at once across all
+    sessions, and the result store are shared, so a run one student already
+    made is answered from the store for the next; one the same as a run still
+    going waits for that run instead of starting another.
+    """
+    pool = SimulatorPool(workers)
+    store = ResultStore()
+    flight = SingleFlight()
+    sessions = os.path.join(default_cache_dir(), "checkpoints", "sessions")
+
+    def session(page: ft.Page):
+        # checkpoints hold the last run of one user, so each session keeps its own
+        checkpoints = os.path.join(sessions, page.session_id)
+        # profiled runs bypass the store, which the sessions need far more than phase timings
+        model = SchedulerModel(store=store, pool=pool, checkpoints=checkpoints, flight=flight)
+        view = SchedulerView(model.simulators)
+        controller = SchedulerController(model, view)
+
+        def close(_):
+            view.stop_preview()
+            controller.cancel()
+            shutil.rmtree(checkpoints, ignore_errors=True)
+
+        page.on_close = close
+        controller.attach(page)
 
+    try:
+        ft.app(session, view=ft.AppView.WEB_BROWSER, port=port)
+    finally:
+        pool.close()
 
 def main():
-    sched_options = ["Basic", "Lottery", "MLFQ"]
-    model = SchedulerModel()
-    view = SchedulerView(sched_options)
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("--web", default=False, help="serve the app to browsers, one session per visitor", action="store_true", dest="web")
+    parser.add_option("--port", default=8550, help="with --web, the port to serve on", action="store", type="int", dest="port")
+    parser.add_option("--workers", default=0, help="simulations run at once (default: one per CPU, up to 8); with --web, shared by all sessions", action="store", type="int", dest="workers")
+    (options, _) = parser.parse_args()
+
+    if options.web:
+        serve(options.port, options.workers or None)
+        return
+
+    pool = SimulatorPool(options.workers or None)
+    model = SchedulerModel(profiling=DEBUG_MODE, store=ResultStore(), pool=pool,
+                           checkpoints=os.path.join(default_cache_dir(), "checkpoints"))
+    view = SchedulerView(model.simulators)
     controller = SchedulerController(model, view)
 
-    controller.start()
+    try:
+        controller.start()
+    finally:
+        pool.close()
 
 if __name__ == '__main__':
     main()
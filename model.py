@@ -1,164 +1,49 @@
-from typing import Protocol
-import subprocess
-
-
-arguments = {	"SEED" 			: "-s",
-				"JOBS" 			: "-j",
-				"JLIST" 		: "-l",
-				"MAXLEN" 		: "-m",
-				"POLICY" 		: "-p",
-				"QUANTUM"		: "-q",
-				"MAXTICKET"		: "-T",
-				"NUMQUEUES"		: "-n",
-				"ALLOTMENT"		: "-a",
-				"QUANTUMLIST" 	: "-Q",
-				"ALLOTMENTLIST"	: "-A",
-				"MAXIO" 		: "-M",
-				"BOOST" 		: "-B",
-				"IOTIME" 		: "-i",
-				"STAY" 			: "-S",
-				"IOBUMP"		: "-I",
-				}
-
-class Scheduler(Protocol):
-	@property
-	def name(self) -> str:
-		...
-
-	@property
-	def parameters(self) -> list[str]:
-		...
-
-	@property
-	def path(self) -> str:
-		...
-
-class BasicScheduler:
-	"""Basic Scheduler simulator provided in the OS in Three Easy Steps Codebase"""
-
-	def __init__(self) -> None:
-		self._name = "Basic"
-		self._parameters = ["SEED",
-							"JOBS",
-							"JLIST",
-							"MAXLEN",
-							"POLICY",				# SJF, FIFO, RR
-							"QUANTUM",				# length of time slice for RR policy
-							]
-		self._path = "ostep/basic.py"
-
-	@property
-	def name(self) -> str:
-		return self._name
-
-	@property
-	def parameters(self) -> list[str]:
-		return self._parameters
-
-	@property
-	def path(self):
-		return self._path
-	
-class LotteryScheduler:
-	"""Lottery Scheduler simulator provided in the OS in Three Easy Steps Codebase"""
-	def __init__(self) -> None:
-		self._name = "Lottery"
-		self._parameters = ["SEED",
-							"JOBS",
-							"JLIST",
-							"MAXLEN",
-							"MAXTICKET",			
-							"QUANTUM",				# length of time slice
-							]
-		self._path = "ostep/lottery.py"
-
-	@property
-	def name(self) -> str:
-		return self._name
-
-	@property
-	def parameters(self) -> list[str]:
-		return self._parameters
-
-	@property
-	def path(self):
-		return self._path
-
-class MLFQScheduler:
-	"""Multi-level Feedback Queue Scheduler simulator provided in the OS in Three Easy Steps Codebase"""
-	def __init__(self) -> None:
-		self._name = "MLFQ"
-		self._parameters = ["SEED",
-							"NUMQUEUES",
-							"QUANTUM",	
-							"ALLOTMENT",
-							"QUANTUMLIST",
-							"ALLOTMENTLIST",
-							"JOBS",
-							"JLIST",			
-							"MAXLEN",
-							"MAXIO",
-							"BOOST",
-							"IOTIME",
-							"IOBUMP",
-							"STAY",
-							]
-		self._path = "ostep/mlfq.py"
-
-	@property
-	def name(self) -> str:
-		return self._name
-
-	@property
-	def parameters(self) -> list[str]:
-		return self._parameters
-
-	@property
-	def path(self):
-		return self._path
-
-class MultiCPUScheduler:
-	def __init__(self) -> None:
-		self._name = "temp"
-		self._parameters = []
-		self._path = "ostep/multi.py"
-
-	@property
-	def name(self) -> str:
-		return self._name
-
-	@property
-	def parameters(self) -> list[str]:
-		return self._parameters
-
-	@property
-	def path(self):
-		return self._path
+from typing import Callable, Sequence
+import os
+import tempfile
+from runner import Progress, SimulationCancelled, SimulatorRun, build_command
+from store import ResultStore
+from gantt import GanttData, read_segments
+from pool import PoolRun, SimulatorPool
+from compare import PolicyStats, compare_policies, workload_runtimes
+from rundiff import RunDiff, diff_runs
+from tuner import Tuning, parse_objective, tune
+from registry import Simulator
+from flight import FlightStats, SharedRun, SingleFlight
+import registry
+
+
+def _integer(parameters:dict[str,str], name:str, default:int) -> int:
+	"""Whole-number parameter, or default when it is not given; ValueError naming it otherwise"""
+	value = parameters.get(name, "").strip()
+	if not value:
+		return default
+	try:
+		return int(value)
+	except ValueError:
+		raise ValueError(f"{name} must be a whole number, not {value!r}") from None
 
 class SchedulerModel:
 	"""Scheduler model using OSTEP provided simulators"""
-	def __init__(self) -> None:
-		self._current_scheduler: Scheduler
-		self._scheduler_mapping = { "Basic":BasicScheduler(), 
-									"Lottery":LotteryScheduler(), 
-									"MLFQ":MLFQScheduler(), 
-									"Multi-CPU":MultiCPUScheduler()}
-		self._param_text_hints = {	"SEED" 			: "42",
-									"JOBS" 			: "number of jobs in system",
-									"JLIST" 		: "x1,y1,z1:x2,y2,z2:... where x=arrival,y=runtime,z=how often I/O issued",
-									"MAXLEN" 		: "max run-time of a job (if randomly generating)",
-									"POLICY" 		: "SJF, FIFO, RR",
-									"QUANTUM"		: "length of time slice (for RR policy if Basic Scheduler)",
-									"MAXTICKET"		: "maximum ticket value, if randomly assigned",
-									"NUMQUEUES"		: "number of queues (if not using -QUANTUMLIST)",
-									"ALLOTMENT"		: "length of allotment (if not using -ALLOTMENTLIST)",
-									"QUANTUMLIST" 	: "x,y,z,... where x=quantum length for the highest priority queue, y the next highest, and so on",
-									"ALLOTMENTLIST"	: "x,y,z,... where x=# of time slices for the highest priority queue, y the next highest, and so on",
-									"MAXIO" 		: "max I/O frequency of a job (if randomly generating)",
-									"BOOST" 		: "how often to boost the priority of all jobs back tohigh priority",
-									"IOTIME" 		: "how long an I/O should last",
-									"STAY" 			: "True/False: reset and stay at same priority level when issuing I/O",
-									"IOBUMP"		: "True/False:  jobs that finished I/O move immediately to front of current queue",}
+	def __init__(self, profiling: bool = False, store: ResultStore | None = None,
+				 pool: SimulatorPool | None = None, checkpoints: str | None = None,
+				 flight: SingleFlight | None = None) -> None:
+		self._current_scheduler: Simulator
+		self._profiling = profiling
+		self._store = store
+		self._pool = pool
+		self._checkpoints = checkpoints
+		# identical runs asked for at once share one simulation; pass one SingleFlight to share it between models
+		self._flight = flight if flight is not None else SingleFlight()
+		self._running: SharedRun | None = None
+		self._previewing: SharedRun | None = None
+		self._last_profile = ""
+		self._last_solved: dict[str, dict[str,str]] = {}
+
+	@property
+	def simulators(self) -> list[str]:
+		"""Names of every simulator that can be picked, built-in ones first"""
+		return registry.names()
 
 	@property
 	def current_scheduler(self) -> str:
@@ -166,32 +51,154 @@ class SchedulerModel:
 
 	@property
 	def scheduler_parameters(self) -> list[str]:
-		return self._current_scheduler.parameters
+		return [parameter.name for parameter in self._current_scheduler.parameters]
 
 	@property
 	def param_text_hints(self) -> dict[str,str]:
-		return self._param_text_hints
+		return {parameter.name: parameter.hint for parameter in self._current_scheduler.parameters}
 
-	def change_scheduler(self, new_scheduler:str):
-		"""Changes current scheduler and parameter hints associated with the specific scheduler"""
-		self._param_text_hints["QUANTUM"] = "length of time slice (for RR policy)" if new_scheduler == "Basic" \
-											else "length of time slice" if new_scheduler == "Lottery" \
-											else "length of time slice (if not using -QUANTUMLIST)"
-		self._current_scheduler = self._scheduler_mapping[new_scheduler]
+	@property
+	def coalescing(self) -> FlightStats:
+		"""How many runs joined an identical one in flight instead of starting their own"""
+		return self._flight.stats
 
-	def solve(self, parameters:dict[str,str]) -> list[str]:
+	@property
+	def last_profile(self) -> str:
+		"""Phase timings of the last solve, empty if profiling is off or unsupported"""
+		return self._last_profile
+
+	def change_scheduler(self, new_scheduler:str):
+		"""Changes current scheduler, loading its simulator the first time it is picked"""
+		self._current_scheduler = registry.load(new_scheduler)
+
+	def _run(self, path:str, parameters:dict[str,str], extra:Sequence[str] = (),
+			 on_progress:Callable[[Progress], None] | None = None, resumable:bool = False, preview:bool = False) -> str:
+		"""Runs a simulator, answering from the result store when it already has this run, or joining an identical one in flight"""
+		# resumable runs get the current scheduler's checkpoints, which change how a run is made but not what it
+		# prints; the checkpoint directory (one per session when served) is left out of what identifies the run
+		arguments = build_command(path, parameters, extra)[2:]
+		# profiled runs are about timing this run, so a stored answer would be misleading
+		use_store = self._store is not None and "--profile" not in extra
+		if use_store:
+			key = self._store.key(path, arguments)
+			output = self._store.get(key)
+			if output is not None:
+				return output
+
+		full_extra = [*extra, *self._checkpoint_arguments()] if resumable else extra
+		run = self._flight.submit((path, tuple(arguments)),
+								  lambda forward: self._start(path, parameters, full_extra, forward), on_progress)
+		# only the solve started from the view (the one reporting progress) can be cancelled
+		if on_progress is not None:
+			self._running = run
+		# a newer preview makes the one before it stale; it is dropped, and its run cancelled unless someone else waits for it
+		if preview:
+			stale, self._previewing = self._previewing, run
+			if stale is not None:
+				stale.cancel()
+		try:
+			output = run.wait()
+		finally:
+			if on_progress is not None:
+				self._running = None
+			if preview and self._previewing is run:
+				self._previewing = None
+
+		# the first caller to get the output stores it; the one that started the run may have cancelled
+		if use_store and run.claim():
+			self._store.put(key, path, output)
+		return output
+
+	def _start(self, path:str, parameters:dict[str,str], extra:Sequence[str] = (),
+			   on_progress:Callable[[Progress], None] | None = None) -> SimulatorRun | PoolRun:
+		"""Starts a simulator on a pool worker if there is a pool, else in a new process"""
+		if self._pool is not None:
+			return self._pool.submit(path, parameters, extra, on_progress)
+		return SimulatorRun(path, parameters, extra, on_progress)
+
+	def cancel(self):
+		"""Stops the solve in progress, if any; that solve raises SimulationCancelled"""
+		running = self._running
+		if running is not None:
+			running.cancel()
+
+	def cancel_preview(self):
+		"""Drops the preview in progress, if any; that preview raises SimulationCancelled"""
+		previewing = self._previewing
+		if previewing is not None:
+			previewing.cancel()
+
+	def solve(self, parameters:dict[str,str], on_progress:Callable[[Progress], None] | None = None) -> list[str]:
 		"""Solves the current simulation given a set of parameters and returns the given and solution results of the simulator"""
 
-		cmd = ["python", f"Flet-OSTEP-Simulator/{self._current_scheduler.path}", "-c"]
+		extra = []
+		if self._profiling and self._current_scheduler.profiled:
+			extra.append("--profile")
 
-		for _, (k, v) in enumerate(parameters.items()):
-			cmd.append(f"{arguments[k]} {v}")
+		output = self._run(self._current_scheduler.path, parameters, extra, on_progress, resumable=True)
+		self._last_solved[self._current_scheduler.name] = dict(parameters)
+		# print(output)
 
-		result = subprocess.run(cmd, capture_output=True, shell=True, text=True)
-		# print(result.stdout)
+		given, solution = self._current_scheduler.split(output)
 
-		div = "\n\nExecution Trace:\n" if self._current_scheduler.name == "MLFQ" \
-				else "\n\n** Solutions **\n"
-		given, solution = str(result.stdout).split(div)
+		solution, _, profile = solution.partition("\nProfile:\n")
+		self._last_profile = f"Profile:\n{profile}" if profile else ""
 
 		return [given, solution]
+
+	def preview(self, parameters:dict[str,str]) -> str:
+		"""Final statistics of the current simulation for these parameters, without its trace; raises SimulationCancelled if a newer preview replaced it"""
+		# the summary with percentiles is the only output every simulator has (Lottery and Stride print no averages otherwise)
+		output = self._run(self._current_scheduler.path, {**parameters, "PERCENTILES": "True"}, ["--summary"], preview=True)
+		_, solution = self._current_scheduler.split(output)
+		# a run that printed nothing past the given part failed, as on a half-typed value; its error is what to show
+		return solution if solution.strip() else output.strip()
+
+	def _checkpoint_arguments(self) -> list[str]:
+		"""Lets the simulator re-run only what new parameters change since its last run, where it can"""
+		if self._checkpoints is not None and self._current_scheduler.incremental:
+			return ["--checkpoints", os.path.join(self._checkpoints, self._current_scheduler.name.lower())]
+		return []
+
+	def diff(self, parameters:dict[str,str]) -> RunDiff | None:
+		"""Diffs the run of the last solved parameters of the current scheduler against a run of these, None before any solve"""
+		old_parameters = self._last_solved.get(self._current_scheduler.name)
+		if old_parameters is None:
+			return None
+		# both runs are read as they print, a line at a time, so neither trace is ever held whole; that takes
+		# processes of their own rather than pool workers (which hand back all the output at once), and no store
+		path = self._current_scheduler.path
+		extra = self._checkpoint_arguments()
+		old = SimulatorRun(path, old_parameters, extra).lines()
+		new = SimulatorRun(path, parameters, extra).lines()
+		try:
+			return diff_runs(old, new)
+		finally:
+			old.close()
+			new.close()
+
+	def tune(self, parameters:dict[str,str], objective:str, count:int = 64) -> Tuning:
+		"""Searches MLFQ settings for the entered workload that minimise objective (e.g. "p99 turnaround"); ValueError if that can't be done"""
+		if self._current_scheduler.name != "MLFQ":
+			raise ValueError("only the MLFQ simulator can be tuned")
+		return tune(parameters, parse_objective(objective), count, start=self._start)
+
+	def timeline(self, parameters:dict[str,str]) -> GanttData:
+		"""Runs the current simulation recording which job ran when, for the Gantt chart"""
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "segments.txt")
+			self._start(self._current_scheduler.path, parameters, ["--segments", path]).wait()
+			return GanttData(read_segments(path))
+
+	def lane_label(self, lane:int) -> str:
+		"""Name of a Gantt chart lane: a priority level for MLFQ, a CPU otherwise"""
+		return self._current_scheduler.lane_label(lane)
+
+	def compare(self, parameters:dict[str,str]) -> list[PolicyStats]:
+		"""Runs one workload against every policy at once; JLIST/JOBS/MAXLEN/SEED/QUANTUM follow the Basic format, ValueError if they don't"""
+		seed = _integer(parameters, "SEED", 0)
+		runtimes = workload_runtimes(parameters.get("JLIST", ""),
+									_integer(parameters, "JOBS", 3),
+									_integer(parameters, "MAXLEN", 10),
+									seed)
+		return compare_policies(runtimes, _integer(parameters, "QUANTUM", 1), seed, self._run)
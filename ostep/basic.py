@@ -3,28 +3,33 @@
 from __future__ import print_function
 import sys
 from optparse import OptionParser
-import random
-
-# to make Python2 and Python3 act the same -- how dumb
-def random_seed(seed):
-    try:
-        random.seed(seed, version=1)
-    except:
-        random.seed(seed)
-    return
+import heapq
+from quantiles import LatencyStats
+from progress import make_progress
+from tailtrace import start_tail
+from segments import make_segments
+from rng import make_rng
 
 parser = OptionParser()
 parser.add_option("-s", "--seed", default=0, help="the random seed", action="store", type="int", dest="seed")
+parser.add_option("--rng", default="python", help="random number backend: python (the classic sequence) or bulk (numpy, drawn in blocks)", action="store", type="string", dest="rng")
+parser.add_option("--stream", default=0, help="with --rng bulk, which of the seed's independent streams to draw from", action="store", type="int", dest="stream")
 parser.add_option("-j", "--jobs", default=3, help="number of jobs in the system", action="store", type="int", dest="jobs")
-parser.add_option("-l", "--jlist", default="", help="instead of random jobs, provide a comma-separated list of run times", action="store", type="string", dest="jlist")
+parser.add_option("-l", "--jlist", default="", help="instead of random jobs, provide a comma-separated list of run times, each optionally followed by :arrival time (used by STCF)", action="store", type="string", dest="jlist")
 parser.add_option("-m", "--maxlen", default=10, help="max length of job", action="store", type="int", dest="maxlen")
-parser.add_option("-p", "--policy", default="FIFO", help="sched policy to use: SJF, FIFO, RR", action="store", type="string", dest="policy")
+parser.add_option("-p", "--policy", default="FIFO", help="sched policy to use: SJF, FIFO, RR, STCF", action="store", type="string", dest="policy")
 parser.add_option("-q", "--quantum", help="length of time slice for RR policy", default=1, action="store", type="int", dest="quantum")
 parser.add_option("-c", help="compute answers for me", action="store_true", default=False, dest="solve")
+parser.add_option("--percentiles", help="also report p50/p95/p99 of response, turnaround and wait", action="store_true", default=False, dest="percentiles")
+parser.add_option("--tail", help="keep only the last TAIL lines of the execution trace", default=0, action="store", type="int", dest="tail")
+parser.add_option("--sample", help="with --tail, also keep the trace of every SAMPLE-th step", default=0, action="store", type="int", dest="sample")
+parser.add_option("--summary", help="print only the final statistics, not the execution trace", action="store_true", default=False, dest="summary")
+parser.add_option("--segments", help="write the run segments (lane start end job) to this file", default="", action="store", type="string", dest="segments")
+parser.add_option("--progress", help="report simulated time and finished jobs on stderr while running", action="store_true", default=False, dest="progress")
 
 (options, args) = parser.parse_args()
 
-random_seed(options.seed)
+rng = make_rng(options.rng, options.seed, options.stream)
 
 print('ARG policy', options.policy)
 if options.jlist == '':
@@ -42,20 +47,30 @@ import operator
 joblist = []
 if options.jlist == '':
     for jobnum in range(0,options.jobs):
-        runtime = int(options.maxlen * random.random()) + 1
-        joblist.append([jobnum, runtime])
+        runtime = int(options.maxlen * rng.random()) + 1
+        joblist.append([jobnum, runtime, 0.0])
         print('  Job', jobnum, '( length = ' + str(runtime) + ' )')
 else:
     jobnum = 0
-    for runtime in options.jlist.split(','):
-        joblist.append([jobnum, float(runtime)])
+    for entry in options.jlist.split(','):
+        # runtime, or runtime:arrival
+        fields = entry.split(':')
+        arrival = float(fields[1]) if len(fields) > 1 else 0.0
+        joblist.append([jobnum, float(fields[0]), arrival])
         jobnum += 1
+    arrivals = any(job[2] != 0.0 for job in joblist)
     for job in joblist:
-        print('  Job', job[0], '( length = ' + str(job[1]) + ' )')
+        if arrivals:
+            print('  Job', job[0], '( length = ' + str(job[1]) + ', arrival = ' + str(job[2]) + ' )')
+        else:
+            print('  Job', job[0], '( length = ' + str(job[1]) + ' )')
 print('\n')
 
 if options.solve == True:
     print('** Solutions **\n')
+    latency = LatencyStats()
+    progress = make_progress(options.progress, len(joblist))
+    segments = make_segments(options.segments)
     if options.policy == 'SJF':
         joblist = sorted(joblist, key=operator.itemgetter(1))
         options.policy = 'FIFO'
@@ -63,9 +78,15 @@ if options.solve == True:
     if options.policy == 'FIFO':
         thetime = 0
         print('Execution trace:')
-        for job in joblist:
+        tail = start_tail(options.tail, options.sample, options.summary)
+        for (done, job) in enumerate(joblist):
+            progress.update(thetime, done)
+            tail.mark(job[0])
             print('  [ time %3d ] Run job %d for %.2f secs ( DONE at %.2f )' % (thetime, job[0], job[1], thetime + job[1]))
+            segments.run(0, thetime, thetime + job[1], job[0])
             thetime += job[1]
+        progress.finish(thetime, len(joblist))
+        tail.finish()
 
         print('\nFinal statistics:')
         t     = 0.0
@@ -84,9 +105,12 @@ if options.solve == True:
             responseSum   += response
             turnaroundSum += turnaround
             waitSum       += wait
+            latency.add(response, turnaround, wait)
             t += runtime
             count = count + 1
         print('\n  Average -- Response: %3.2f  Turnaround %3.2f  Wait %3.2f\n' % (responseSum/count, turnaroundSum/count, waitSum/count))
+        if options.percentiles:
+            latency.report()
                      
     if options.policy == 'RR':
         print('Execution trace:')
@@ -107,7 +131,12 @@ if options.solve == True:
             runlist.append(e)
 
         thetime  = 0.0
+        tail = start_tail(options.tail, options.sample, options.summary)
+        steps = 0
         while jobcount > 0:
+            progress.update(thetime, len(joblist) - jobcount)
+            tail.mark(steps)
+            steps += 1
             job = runlist.pop(0)
             jobnum  = job[0]
             runtime = float(job[1])
@@ -124,9 +153,13 @@ if options.solve == True:
                 ranfor = runtime;
                 print('  [ time %3d ] Run job %3d for %.2f secs ( DONE at %.2f )' % (thetime, jobnum, ranfor, thetime + ranfor))
                 turnaround[jobnum] = thetime + ranfor
+                latency.add(response[jobnum], turnaround[jobnum], wait[jobnum])
                 jobcount -= 1
+            segments.run(0, thetime, thetime + ranfor, jobnum)
             thetime += ranfor
             lastran[jobnum] = thetime
+        progress.finish(thetime, len(joblist))
+        tail.finish()
 
         print('\nFinal statistics:')
         turnaroundSum = 0.0
@@ -140,8 +173,92 @@ if options.solve == True:
         count = len(joblist)
         
         print('\n  Average -- Response: %3.2f  Turnaround %3.2f  Wait %3.2f\n' % (responseSum/count, turnaroundSum/count, waitSum/count))
+        if options.percentiles:
+            latency.report()
+
+    if options.policy == 'STCF':
+        # event driven: the clock jumps from arrival to arrival (or completion),
+        # unfinished jobs wait in a min-heap on remaining time, so n jobs cost
+        # O(n log n) however long they run
+        print('Execution trace:')
+        arriving = sorted(joblist, key=lambda job: (job[2], job[0]))
+        arrival = {}
+        response = {}
+        turnaround = {}
+        for job in joblist:
+            arrival[job[0]] = job[2]
+
+        ready = []
+        nextarrival = 0
+        thetime = 0.0
+        tail = start_tail(options.tail, options.sample, options.summary)
+        steps = 0
+        while nextarrival < len(arriving) or len(ready) > 0:
+            progress.update(thetime, len(turnaround))
+            tail.mark(steps)
+            steps += 1
+            if len(ready) == 0:
+                thetime = max(thetime, arriving[nextarrival][2])
+            while nextarrival < len(arriving) and arriving[nextarrival][2] <= thetime:
+                job = arriving[nextarrival]
+                heapq.heappush(ready, (float(job[1]), job[0]))
+                nextarrival += 1
+
+            (remaining, jobnum) = heapq.heappop(ready)
+            if jobnum not in response:
+                response[jobnum] = thetime - arrival[jobnum]
+            start = thetime
+            ranfor = 0.0
+
+            # run until done, or until an arrival is shorter than what is left
+            preempted = False
+            while nextarrival < len(arriving) and arriving[nextarrival][2] < thetime + remaining:
+                when = arriving[nextarrival][2]
+                ranfor += when - thetime
+                remaining -= when - thetime
+                thetime = when
+                while nextarrival < len(arriving) and arriving[nextarrival][2] <= thetime:
+                    job = arriving[nextarrival]
+                    heapq.heappush(ready, (float(job[1]), job[0]))
+                    nextarrival += 1
+                if ready[0][0] < remaining:
+                    preempted = True
+                    break
+
+            if preempted:
+                print('  [ time %3d ] Run job %3d for %.2f secs' % (start, jobnum, ranfor))
+                segments.run(0, start, thetime, jobnum)
+                heapq.heappush(ready, (remaining, jobnum))
+            else:
+                ranfor += remaining
+                thetime += remaining
+                print('  [ time %3d ] Run job %3d for %.2f secs ( DONE at %.2f )' % (start, jobnum, ranfor, thetime))
+                segments.run(0, start, thetime, jobnum)
+                turnaround[jobnum] = thetime - arrival[jobnum]
+                latency.add(response[jobnum], turnaround[jobnum], turnaround[jobnum] - joblist[jobnum][1])
+        progress.finish(thetime, len(joblist))
+        tail.finish()
+
+        print('\nFinal statistics:')
+        turnaroundSum = 0.0
+        waitSum       = 0.0
+        responseSum   = 0.0
+        for job in joblist:
+            jobnum = job[0]
+            wait = turnaround[jobnum] - job[1]
+            turnaroundSum += turnaround[jobnum]
+            responseSum += response[jobnum]
+            waitSum += wait
+            print('  Job %3d -- Response: %3.2f  Turnaround %3.2f  Wait %3.2f' % (jobnum, response[jobnum], turnaround[jobnum], wait))
+        count = len(joblist)
+
+        print('\n  Average -- Response: %3.2f  Turnaround %3.2f  Wait %3.2f\n' % (responseSum/count, turnaroundSum/count, waitSum/count))
+        if options.percentiles:
+            latency.report()
+
+    segments.close()
 
-    if options.policy != 'FIFO' and options.policy != 'SJF' and options.policy != 'RR': 
+    if options.policy != 'FIFO' and options.policy != 'SJF' and options.policy != 'RR' and options.policy != 'STCF': 
         print('Error: Policy', options.policy, 'is not available.')
         sys.exit(0)
 else:
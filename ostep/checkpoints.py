@@ -0,0 +1,192 @@
+#
+# checkpoints of the last run, for incremental re-simulation
+#
+# with --checkpoints DIR the engine keeps, in DIR, a snapshot of its state
+# every so often, the execution trace (and how much of it had been printed
+# at each snapshot), and the parameters it ran with. the next run given the
+# same DIR asks the engine for the earliest time at which its parameters can
+# make a difference, resumes from the latest snapshot no later than that,
+# reprints the old trace up to there, and simulates only the rest; the
+# output is the same as that of a run from time 0.
+#
+# snapshots start every 'every' ticks; to keep their number bounded on long
+# runs, the spacing doubles (dropping every other snapshot) whenever there
+# are more than 'limit' of them.
+#
+# the files of a run carry the run's name, and the manifest naming the
+# latest finished run is replaced in one step at the very end, so a run cut
+# short (or two runs at once) never leaves a broken set behind; a run that
+# cannot read the previous one's files simply starts from time 0.
+#
+
+from __future__ import print_function
+import io
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+from snapshot import write_snapshot, load_snapshot
+
+MANIFEST = 'manifest.json'
+
+# seconds after which files of a run that never finished are removed
+STALE = 3600
+
+class NullCheckpoints:
+    def resume(self, divergence, usable=None):
+        return None
+
+    def start(self):
+        return
+
+    def due(self, now):
+        return False
+
+    def save(self, now, state):
+        return
+
+    def stop(self):
+        return
+
+    def finish(self, params):
+        return
+
+class Checkpoints:
+    def __init__(self, directory, engine, every, limit=64):
+        self.directory = directory
+        self.engine = engine
+        self.every = every
+        self.limit = limit
+        self.run = uuid.uuid4().hex[:12]
+        self.taken = []
+        self.prefix = ''
+        self.written = 0
+        self.out = None
+        self.trace = None
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        try:
+            with open(os.path.join(directory, MANIFEST)) as f:
+                self.previous = json.load(f)
+            if self.previous.get('engine') != engine:
+                self.previous = None
+        except (IOError, OSError, ValueError):
+            self.previous = None
+
+    def path(self, run, name):
+        return os.path.join(self.directory, '%s.%s' % (run, name))
+
+    def resume(self, divergence, usable=None):
+        # divergence(old params) is the earliest time the new run can differ from the old one,
+        # and usable(state), if given, can turn down a checkpoint's state; returns the state
+        # to resume from (and keeps the trace to reprint), or None to start at 0
+        previous = self.previous
+        if previous is None:
+            return None
+        until = divergence(previous['params'])
+        for (at, offset) in reversed(previous['checkpoints']):
+            if at > until:
+                continue
+            try:
+                with io.open(self.path(previous['run'], 'trace'), encoding='utf-8', newline='') as f:
+                    prefix = f.read(offset)
+            except (IOError, OSError):
+                return None
+            state = load_snapshot(self.path(previous['run'], '%d.snap' % at), self.engine)
+            if state is None or len(prefix) != offset:
+                return None
+            if usable is not None and not usable(state):
+                continue
+            self.prefix = prefix
+            # the old run's earlier snapshots hold for this run too
+            for (earlier, earlier_offset) in previous['checkpoints']:
+                if earlier < at and self.adopt(previous['run'], '%d.snap' % earlier):
+                    self.taken.append([earlier, earlier_offset])
+            sys.stderr.write('RESUMED at time %d\n' % at)
+            return state
+        return None
+
+    # while the trace is printed, sys.stdout is swapped for this, which also keeps a copy
+    def start(self):
+        self.out = sys.stdout
+        self.trace = io.open(self.path(self.run, 'trace'), 'w', encoding='utf-8', newline='')
+        sys.stdout = self
+        if self.prefix != '':
+            self.write(self.prefix)
+
+    def write(self, text):
+        self.out.write(text)
+        self.trace.write(text)
+        self.written += len(text)
+        return len(text)
+
+    def flush(self):
+        self.out.flush()
+
+    def due(self, now):
+        return now > 0 and now % self.every == 0
+
+    def save(self, now, state):
+        write_snapshot(self.path(self.run, '%d.snap' % now), self.engine, state)
+        self.taken.append([now, self.written])
+        if len(self.taken) > self.limit:
+            self.every *= 2
+            kept = []
+            for (at, offset) in self.taken:
+                if at % self.every == 0:
+                    kept.append([at, offset])
+                else:
+                    self.remove(self.run, '%d.snap' % at)
+            self.taken = kept
+
+    def stop(self):
+        sys.stdout = self.out
+        self.trace.close()
+
+    def finish(self, params):
+        manifest = {'engine': self.engine, 'run': self.run, 'params': params, 'checkpoints': self.taken}
+        temporary = self.path(self.run, 'manifest')
+        with open(temporary, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temporary, os.path.join(self.directory, MANIFEST))
+        previous = self.previous
+        if previous is not None and previous['run'] != self.run:
+            self.remove(previous['run'], 'trace')
+            for (at, _) in previous['checkpoints']:
+                self.remove(previous['run'], '%d.snap' % at)
+        # leftovers of runs that never finished (cancelled, say), once surely over
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name != MANIFEST and not name.startswith(self.run + '.'):
+                try:
+                    if time.time() - os.path.getmtime(path) > STALE:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def adopt(self, run, name):
+        try:
+            os.link(self.path(run, name), self.path(self.run, name))
+        except OSError:
+            try:
+                shutil.copyfile(self.path(run, name), self.path(self.run, name))
+            except (IOError, OSError):
+                return False
+        return True
+
+    def remove(self, run, name):
+        try:
+            os.remove(self.path(run, name))
+        except OSError:
+            pass
+
+def make_checkpoints(directory, engine, every):
+    # an empty directory means no checkpoints
+    if directory == '':
+        return NullCheckpoints()
+    if every <= 0:
+        sys.stderr.write('checkpoint interval must be positive\n')
+        sys.exit(1)
+    return Checkpoints(directory, engine, every)
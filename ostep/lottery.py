@@ -3,28 +3,32 @@
 from __future__ import print_function
 import sys
 from optparse import OptionParser
-import random
-
-# to make Python2 and Python3 act the same -- how dumb
-def random_seed(seed):
-    try:
-        random.seed(seed, version=1)
-    except:
-        random.seed(seed)
-    return
+from quantiles import LatencyStats
+from progress import make_progress
+from tailtrace import start_tail
+from segments import make_segments
+from rng import make_rng
 
 parser = OptionParser()
 parser.add_option('-s', '--seed', default=0, help='the random seed',              action='store', type='int', dest='seed')
+parser.add_option('--rng', default='python', help='random number backend: python (the classic sequence) or bulk (numpy, drawn in blocks)', action='store', type='string', dest='rng')
+parser.add_option('--stream', default=0, help='with --rng bulk, which of the seed\'s independent streams to draw from', action='store', type='int', dest='stream')
 parser.add_option('-j', '--jobs', default=3, help='number of jobs in the system', action='store', type='int', dest='jobs')
 parser.add_option('-l', '--jlist', default='', help='instead of random jobs, provide a comma-separated list of run times and ticket values (e.g., 10:100,20:100 would have two jobs with run-times of 10 and 20, each with 100 tickets)',  action='store', type='string', dest='jlist')
 parser.add_option('-m', '--maxlen',  default=10,  help='max length of job',         action='store', type='int', dest='maxlen')
 parser.add_option('-T', '--maxticket', default=100, help='maximum ticket value, if randomly assigned',          action='store', type='int', dest='maxticket')
 parser.add_option('-q', '--quantum', default=1,   help='length of time slice', action='store', type='int', dest='quantum')
 parser.add_option('-c', '--compute', help='compute answers for me', action='store_true', default=False, dest='solve')
+parser.add_option('--percentiles', help='also report p50/p95/p99 of response, turnaround and wait', action='store_true', default=False, dest='percentiles')
+parser.add_option('--tail', help='keep only the last TAIL lines of the execution trace', default=0, action='store', type='int', dest='tail')
+parser.add_option('--sample', help='with --tail, also keep the trace of every SAMPLE-th step', default=0, action='store', type='int', dest='sample')
+parser.add_option('--summary', help='print only the final statistics, not the execution trace', action='store_true', default=False, dest='summary')
+parser.add_option('--segments', help='write the run segments (lane start end job) to this file', default='', action='store', type='string', dest='segments')
+parser.add_option('--progress', help='report simulated time and finished jobs on stderr while running', action='store_true', default=False, dest='progress')
 
 (options, args) = parser.parse_args()
 
-random_seed(options.seed)
+rng = make_rng(options.rng, options.seed, options.stream)
 
 print('ARG jlist', options.jlist)
 print('ARG jobs', options.jobs)
@@ -46,10 +50,10 @@ if options.jlist == '':
     for jobnum in range(0,options.jobs):
         runtime = 0
         while runtime == 0:
-            runtime = int(options.maxlen * random.random())
+            runtime = int(options.maxlen * rng.random())
         tickets = 0
         while tickets == 0:
-            tickets = int(options.maxticket * random.random())
+            tickets = int(options.maxticket * rng.random())
         runTotal += runtime
         tickTotal += tickets
         joblist.append([jobnum, runtime, tickets])
@@ -69,7 +73,7 @@ print('\n')
 if options.solve == False:
     print('Here is the set of random numbers you will need (at most):')
     for i in range(runTotal):
-        r = int(random.random() * 1000001)
+        r = int(rng.random() * 1000001)
         print('Random', r)
 
 if options.solve == True:
@@ -77,8 +81,16 @@ if options.solve == True:
 
     jobs  = len(joblist)
     clock = 0
+    latency = LatencyStats()
+    progress = make_progress(options.progress, jobs)
+    segments = make_segments(options.segments)
+    firstRun = {}
+    slices = {}
+    tail = start_tail(options.tail, options.sample, options.summary)
     for i in range(runTotal):
-        r = int(random.random() * 1000001)
+        progress.update(clock, len(joblist) - jobs)
+        tail.mark(i)
+        r = int(rng.random() * 1000001)
         winner = int(r % tickTotal)
 
         current = 0
@@ -106,16 +118,21 @@ if options.solve == True:
         print('')
 
         # now do the accounting
+        if wjob not in firstRun:
+            firstRun[wjob] = clock
+        slices[wjob] = slices.get(wjob, 0) + 1
         if wrun >= options.quantum:
             wrun -= options.quantum
         else:
             wrun = 0
 
+        segments.run(0, clock, clock + options.quantum, wjob)
         clock += options.quantum
 
         # job completed!
         if wrun == 0:
             print('--> JOB %d DONE at time %d' % (wjob, clock))
+            latency.add(firstRun[wjob], clock, clock - slices[wjob] * options.quantum)
             tickTotal -= wtix
             wtix = 0
             jobs -= 1
@@ -126,6 +143,12 @@ if options.solve == True:
         if jobs == 0:
             print('')
             break
+    progress.finish(clock, len(joblist) - jobs)
+    tail.finish()
+    segments.close()
+
+    if options.percentiles:
+        latency.report()
 
 
 
@@ -4,14 +4,15 @@ from __future__ import print_function
 import sys
 from optparse import OptionParser
 import random
-
-# to make Python2 and Python3 act the same -- how dumb
-def random_seed(seed):
-    try:
-        random.seed(seed, version=1)
-    except:
-        random.seed(seed)
-    return
+from profiling import make_profiler
+from quantiles import LatencyStats
+from progress import make_progress
+from tailtrace import start_tail
+from timeline import make_timeline
+from segments import make_segments
+from rng import make_rng
+from snapshot import write_snapshot, read_snapshot
+from checkpoints import make_checkpoints
 
 # finds the highest nonempty queue
 # -1 if they are all empty
@@ -37,6 +38,13 @@ def Abort(str):
 parser = OptionParser()
 parser.add_option('-s', '--seed', help='the random seed', 
                   default=0, action='store', type='int', dest='seed')
+parser.add_option('--rng', default='python',
+                  help='random number backend: python (the classic sequence) ' + \
+                  'or bulk (numpy, drawn in blocks)',
+                  action='store', type='string', dest='rng')
+parser.add_option('--stream', default=0,
+                  help='with --rng bulk, which of the seed\'s independent streams to draw from',
+                  action='store', type='int', dest='stream')
 parser.add_option('-n', '--numQueues',
                   help='number of queues in MLFQ (if not using -Q)', 
                   default=3, action='store', type='int', dest='numQueues')
@@ -82,6 +90,53 @@ parser.add_option('-l', '--jlist', default='',
                   action='store', type='string', dest='jlist')
 parser.add_option('-c', help='compute answers for me', action='store_true',
                   default=False, dest='solve')
+parser.add_option('--percentiles', default=False,
+                  help='also report p50/p95/p99 of response, turnaround and wait',
+                  action='store_true', dest='percentiles')
+parser.add_option('--tail', default=0,
+                  help='keep only the last TAIL lines of the execution trace',
+                  action='store', type='int', dest='tail')
+parser.add_option('--sample', default=0,
+                  help='with --tail, also keep the trace of every SAMPLE-th tick',
+                  action='store', type='int', dest='sample')
+parser.add_option('--summary', default=False,
+                  help='print only the final statistics, not the execution trace',
+                  action='store_true', dest='summary')
+parser.add_option('--timeline', default='',
+                  help='write a per-tick time series (running job, its level, ' + \
+                  'length of each queue) to this .npz file; needs numpy',
+                  action='store', type='string', dest='timeline')
+parser.add_option('--timeline-every', default=1,
+                  help='with --timeline, keep every N-th tick',
+                  action='store', type='int', dest='timelineEvery')
+parser.add_option('--segments', default='',
+                  help='write the run segments (level start end job) to this file',
+                  action='store', type='string', dest='segments')
+parser.add_option('--snapshot', default='',
+                  help='save the whole simulation state to this file at time ' + \
+                  'SNAPSHOT_AT (the run goes on to the end as usual)',
+                  action='store', type='string', dest='snapshot')
+parser.add_option('--snapshot-at', default=0,
+                  help='with --snapshot, the time at which to save the state',
+                  action='store', type='int', dest='snapshotAt')
+parser.add_option('--resume', default='',
+                  help='resume from a snapshot file instead of starting at time 0; ' + \
+                  'the jobs come from the snapshot, other options apply from then on',
+                  action='store', type='string', dest='resume')
+parser.add_option('--checkpoints', default='',
+                  help='keep checkpoints of this run in this directory, and ' + \
+                  'resume from the last run kept there where its results still hold',
+                  action='store', type='string', dest='checkpoints')
+parser.add_option('--checkpoint-every', default=100,
+                  help='with --checkpoints, ticks between checkpoints (at first; ' + \
+                  'the spacing grows on long runs)',
+                  action='store', type='int', dest='checkpointEvery')
+parser.add_option('--progress', default=False,
+                  help='report simulated time and finished jobs on stderr while running',
+                  action='store_true', dest='progress')
+parser.add_option('--profile', default=False,
+                  help='report time spent in each phase of the simulation loop',
+                  action='store_true', dest='profile')
 
 (options, args) = parser.parse_args()
 
@@ -133,7 +188,7 @@ ioDone = {}
 job = {}
 
 # seed the random generator
-random_seed(options.seed)
+rng = make_rng(options.rng, options.seed, options.stream)
 
 # jlist 'startTime,runTime,ioFreq:startTime,runTime,ioFreq:...'
 jobCnt = 0
@@ -152,7 +207,7 @@ if options.jlist != '':
         job[jobCnt] = {'currPri':hiQueue, 'ticksLeft':quantum[hiQueue],
                        'allotLeft':allotment[hiQueue], 'startTime':startTime,
                        'runTime':runTime, 'timeLeft':runTime, 'ioFreq':ioFreq, 'doingIO':False,
-                       'firstRun':-1}
+                       'firstRun':-1, 'ioCount':0}
         if startTime not in ioDone:
             ioDone[startTime] = []
         ioDone[startTime].append((jobCnt, 'JOB BEGINS'))
@@ -161,19 +216,27 @@ else:
     # do something random
     for j in range(options.numJobs):
         startTime = 0
-        runTime   = int(random.random() * (options.maxlen - 1) + 1)
-        ioFreq    = int(random.random() * (options.maxio - 1) + 1)
+        runTime   = int(rng.random() * (options.maxlen - 1) + 1)
+        ioFreq    = int(rng.random() * (options.maxio - 1) + 1)
         
         job[jobCnt] = {'currPri':hiQueue, 'ticksLeft':quantum[hiQueue],
                        'allotLeft':allotment[hiQueue], 'startTime':startTime,
                        'runTime':runTime, 'timeLeft':runTime, 'ioFreq':ioFreq, 'doingIO':False,
-                       'firstRun':-1}
+                       'firstRun':-1, 'ioCount':0}
         if startTime not in ioDone:
             ioDone[startTime] = []
         ioDone[startTime].append((jobCnt, 'JOB BEGINS'))
         jobCnt += 1
 
 
+# resuming: the snapshot has the jobs (as they are at that time); the rest is restored below
+resume = None
+if options.resume != '':
+    resume = read_snapshot(options.resume, 'mlfq')
+    if len(resume['queue']) != numQueues:
+        Abort('cannot resume: the snapshot has %d queues, not %d' % (len(resume['queue']), numQueues))
+    job = dict(enumerate(resume['job']))
+
 numJobs = len(job)
 
 print('Here is the list of inputs:')
@@ -215,17 +278,125 @@ for q in range(numQueues):
 # TIME IS CENTRAL
 currTime = 0
 
+# when the first I/O was issued (-1 until then)
+firstIO = -1
+
 # use these to know when we're finished
 totalJobs    = len(job)
 finishedJobs = 0
 
+# fed as jobs finish; wait is time spent runnable but not running
+latency = LatencyStats()
+
+# phase timings (a no-op unless profiling was asked for)
+prof = make_profiler(options.profile)
+progress = make_progress(options.progress, totalJobs, latency)
+segments = make_segments(options.segments)
+timeline = make_timeline(options.timeline, options.timelineEvery,
+                         {'job': (None, 'int32'), 'level': (None, 'int32'), 'level_len': (numQueues, 'int32')})
+
+if resume is not None:
+    currTime     = resume['currTime']
+    finishedJobs = resume['finishedJobs']
+    queue        = dict(enumerate(resume['queue']))
+    ioDone       = dict((t, [tuple(entry) for entry in entries]) for (t, entries) in resume['ioDone'])
+    firstIO      = resume.get('firstIO', -1)
+    latency.set_state(resume['latency'])
+
+# everything the loop below changes, as plain data
+def SaveState():
+    return {'currTime': currTime, 'finishedJobs': finishedJobs,
+            'job': [job[j] for j in range(numJobs)],
+            'queue': [queue[q] for q in range(numQueues)],
+            'ioDone': sorted([t, ioDone[t]] for t in ioDone if t >= currTime),
+            'firstIO': firstIO,
+            'latency': latency.get_state()}
+
+# the parameters that shape the execution trace (and when the first I/O was issued)
+def Params():
+    return {'quantum': [quantum[q] for q in range(numQueues)],
+            'allotment': [allotment[q] for q in range(numQueues)],
+            'boost': options.boost, 'ioTime': ioTime, 'stay': options.stay, 'iobump': options.iobump,
+            'jobs': [[job[j]['startTime'], job[j]['runTime'], job[j]['ioFreq']] for j in range(numJobs)],
+            'firstIO': firstIO}
+
+# earliest time at which a run with the parameters 'old' can behave differently from this one
+def Divergence(old):
+    new = Params()
+    if old['quantum'] != new['quantum'] or old['allotment'] != new['allotment']:
+        return 0
+    until = sys.maxsize
+    # a boost of 0 or less means none
+    (oldBoost, newBoost) = (max(old['boost'], 0), max(new['boost'], 0))
+    if oldBoost != newBoost:
+        until = min([b for b in (oldBoost, newBoost) if b > 0])
+    # I/O settings only matter once some job issues an I/O
+    if (old['ioTime'], old['stay'], old['iobump']) != (new['ioTime'], new['stay'], new['iobump']) and old['firstIO'] >= 0:
+        until = min(until, old['firstIO'])
+    # a job that changed (or came or went) makes no difference before it begins
+    for j in range(max(len(old['jobs']), len(new['jobs']))):
+        if j >= len(old['jobs']):
+            until = min(until, new['jobs'][j][0])
+        elif j >= len(new['jobs']):
+            until = min(until, old['jobs'][j][0])
+        elif old['jobs'][j] != new['jobs'][j]:
+            until = min(until, old['jobs'][j][0], new['jobs'][j][0])
+    return until
+
+# checkpoints for re-simulating only what changed since the last run; none are kept when
+# the output covers only part of the run (tail, summary, timeline, segments, snapshots) or times it
+keepCheckpoints = options.tail <= 0 and not options.summary and options.timeline == '' and options.segments == '' and \
+                  options.snapshot == '' and options.resume == '' and not options.profile
+checkpoints = make_checkpoints(options.checkpoints if keepCheckpoints else '', 'mlfq', options.checkpointEvery)
+# (with fewer jobs, this run stops once they are all done, which the last run may have been past)
+resumed = checkpoints.resume(Divergence, lambda state: state['finishedJobs'] < totalJobs)
+if resumed is not None:
+    # same state as the last run at this time, except for jobs that changed but had not begun
+    currTime     = resumed['currTime']
+    finishedJobs = resumed['finishedJobs']
+    firstIO      = resumed['firstIO']
+    queue        = dict(enumerate(resumed['queue']))
+    for j in range(min(numJobs, len(resumed['job']))):
+        old = resumed['job'][j]
+        if (old['startTime'], old['runTime'], old['ioFreq']) == (job[j]['startTime'], job[j]['runTime'], job[j]['ioFreq']):
+            job[j] = old
+    # jobs yet to begin come first at their start time, as they would from time 0
+    ioDone = {}
+    for j in range(numJobs):
+        startTime = job[j]['startTime']
+        if startTime >= currTime:
+            if startTime not in ioDone:
+                ioDone[startTime] = []
+            ioDone[startTime].append((j, 'JOB BEGINS'))
+    for (t, entries) in resumed['ioDone']:
+        for (j, type) in entries:
+            if type != 'JOB BEGINS':
+                if t not in ioDone:
+                    ioDone[t] = []
+                ioDone[t].append((j, type))
+    latency.set_state(resumed['latency'])
+
 print('\nExecution Trace:\n')
+if resume is not None:
+    print('[ time %d ] RESUMED from %s' % (currTime, options.resume))
+checkpoints.start()
+tail = start_tail(options.tail, options.sample, options.summary)
+# jobs that have run at all (counted again, as a resumed run starts part way through)
+startedJobs = len([j for j in range(numJobs) if job[j]['firstRun'] != -1])
 
 while finishedJobs < totalJobs:
     # find highest priority job
     # run it until either
     # (a) the job uses up its time quantum
     # (b) the job performs an I/O
+    prof.tick()
+    progress.update(currTime, finishedJobs, startedJobs)
+    tail.mark(currTime)
+    if options.snapshot != '' and currTime == options.snapshotAt:
+        write_snapshot(options.snapshot, 'mlfq', SaveState())
+    if checkpoints.due(currTime):
+        checkpoints.save(currTime, SaveState())
+    t = prof.now()
 
     # check for priority boost
     if options.boost > 0 and currTime != 0:
@@ -250,6 +421,7 @@ while finishedJobs < totalJobs:
                     job[j]['allotLeft'] = allotment[hiQueue]
                     # print('  BOOST', j, ' ticks:', job[j]['ticksLeft'], ' allot:', job[j]['allotLeft'])
             # print('BOOST END: QUEUES look like:', queue)
+    t = prof.lap('boost', t)
 
     # check for any I/Os done
     if currTime in ioDone:
@@ -261,9 +433,14 @@ while finishedJobs < totalJobs:
                 queue[q].append(j)
             else:
                 queue[q].insert(0, j)
+    t = prof.lap('io_done', t)
 
     # now find the highest priority job
     currQueue = FindQueue()
+    t = prof.lap('find_queue', t)
+    if timeline.due(currTime):
+        timeline.record(currTime, job=queue[currQueue][0] if currQueue != -1 else -1, level=currQueue,
+                        level_len=[len(queue[q]) for q in range(numQueues)])
     if currQueue == -1:
         print('[ time %d ] IDLE' % (currTime))
         currTime += 1
@@ -279,6 +456,7 @@ while finishedJobs < totalJobs:
 
     if job[currJob]['firstRun'] == -1:
         job[currJob]['firstRun'] = currTime
+        startedJobs += 1
 
     runTime   = job[currJob]['runTime']
     ioFreq    = job[currJob]['ioFreq']
@@ -291,9 +469,11 @@ while finishedJobs < totalJobs:
 
     if timeLeft < 0:
         Abort('Error: should never have less than 0 time left to run')
+    t = prof.lap('dispatch', t)
 
 
     # UPDATE TIME
+    segments.run(currQueue, currTime, currTime + 1, currJob)
     currTime += 1
 
     # CHECK FOR JOB ENDING
@@ -301,10 +481,14 @@ while finishedJobs < totalJobs:
         print('[ time %d ] FINISHED JOB %d' % (currTime, currJob))
         finishedJobs += 1
         job[currJob]['endTime'] = currTime
+        turnaround = currTime - job[currJob]['startTime']
+        latency.add(job[currJob]['firstRun'] - job[currJob]['startTime'], turnaround,
+                    turnaround - runTime - ioTime * job[currJob]['ioCount'])
         # print('BEFORE POP', queue)
         done = queue[currQueue].pop(0)
         # print('AFTER POP', queue)
         assert(done == currJob)
+        prof.lap('accounting', t)
         continue
 
     # CHECK FOR IO
@@ -313,9 +497,12 @@ while finishedJobs < totalJobs:
         # time for an IO!
         print('[ time %d ] IO_START by JOB %d' % (currTime, currJob))
         issuedIO = True
+        if firstIO == -1:
+            firstIO = currTime - 1
         desched = queue[currQueue].pop(0)
         assert(desched == currJob)
         job[currJob]['doingIO'] = True
+        job[currJob]['ioCount'] += 1
         # this does the bad rule -- reset your time at this level if you do I/O
         if options.stay == True:
             job[currJob]['ticksLeft'] = quantum[currQueue]
@@ -355,8 +542,18 @@ while finishedJobs < totalJobs:
             job[currJob]['ticksLeft'] = quantum[currQueue]
             if issuedIO == False:
                 queue[currQueue].append(currJob)
+    prof.lap('accounting', t)
 
         
+progress.finish(currTime, finishedJobs, startedJobs)
+if options.snapshot != '' and currTime <= options.snapshotAt:
+    sys.stderr.write('no snapshot written: the run ended at time %d\n' % currTime)
+checkpoints.stop()
+checkpoints.finish(Params())
+tail.finish()
+segments.close()
+timeline.save(start_time=[job[j]['startTime'] for j in range(numJobs)],
+              run_time=[job[j]['runTime'] for j in range(numJobs)])
 
 
 # print out statistics
@@ -373,3 +570,8 @@ for i in range(numJobs):
 
 print('\n  Avg %2d: startTime n/a - response %.2f - turnaround %.2f' % (i, float(responseSum)/numJobs, float(turnaroundSum)/numJobs))
 print('\n')
+
+if options.percentiles:
+    latency.report()
+
+prof.report()
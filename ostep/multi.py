@@ -11,16 +11,22 @@
 
 from __future__ import print_function
 from collections import *
+import functools
 from optparse import OptionParser
-import random
-
-# to make Python2 and Python3 act the same -- how dumb
-def random_seed(seed):
-    try:
-        random.seed(seed, version=1)
-    except:
-        random.seed(seed)
-    return
+import sys
+from profiling import make_profiler
+from quantiles import LatencyStats
+from progress import make_progress
+from tailtrace import start_tail
+from timeline import make_timeline
+from segments import make_segments
+from rng import active_rng, make_rng
+from snapshot import write_snapshot, read_snapshot
+from telemetry import NullTelemetry, make_telemetry
+
+# only the vector engine needs numpy, imported once it is picked (scalar runs
+# then start without paying for it)
+np = None
 
 # helper print function for columnar output
 def print_cpu(cpu, str):
@@ -42,9 +48,11 @@ Job = namedtuple('Job', ['name', 'run_time', 'working_set_size', 'affinity', 'ti
 # cache has limited size, so only so many jobs can be "warm" at a time
 # 
 class cache:
-    def __init__(self, cpu_id, jobs, cache_size, cache_rate_cold, cache_rate_warm, cache_warmup_time):
+    def __init__(self, cpu_id, jobs, cache_size, cache_rate_cold, cache_rate_warm, cache_warmup_time, llc=None, telemetry=None):
         self.cpu_id = cpu_id
         self.jobs = jobs
+        self.llc = llc
+        self.telemetry = telemetry if telemetry is not None else NullTelemetry()
         self.cache_size = cache_size
         self.cache_rate_cold = cache_rate_cold
         self.cache_rate_warm = cache_rate_warm
@@ -72,6 +80,7 @@ class cache:
             if self.cache_warmup_time == 0:
                 # special case (alas): no warmup, just right into cache
                 self.cache_contents.insert(0, job_name)
+                self.hold(job_name)
                 self.adjust_size()
             else:
                 self.cache_warming.append(job_name)
@@ -91,20 +100,50 @@ class cache:
             job_gone = self.cache_contents[last_entry]
             # print_cpu(self.cpu_id, 'kicking out %s' % job_gone)
             del self.cache_contents[last_entry]
+            self.telemetry.evicted(self.cpu_id, job_gone)
+            if self.llc is not None:
+                self.llc.release(job_gone, self.cpu_id)
             self.cache_warming.append(job_gone)
             self.cache_warming_counter[job_gone] = cache_warmup_time
             working_set_total -= self.jobs[job_gone].working_set_size
         return
 
+    def hold(self, job_name):
+        # with a shared cache below, whatever this cache holds, the shared one holds too
+        if self.llc is not None:
+            self.llc.hold(job_name, self.cpu_id)
+        return
+
+    def evict(self, job_name):
+        # the shared cache dropped this job, so this cache loses it too
+        self.cache_contents.remove(job_name)
+        self.telemetry.evicted(self.cpu_id, job_name)
+        self.cache_warming.append(job_name)
+        self.cache_warming_counter[job_name] = self.cache_warmup_time
+        return
+
+    def forget(self, job_name):
+        # the job has left the system (open-system runs), so nothing about it need be kept
+        if job_name in self.cache_contents:
+            self.cache_contents.remove(job_name)
+        if job_name in self.cache_warming:
+            self.cache_warming.remove(job_name)
+        self.cache_warming_counter.pop(job_name, None)
+        return
+
     def get_cache_state(self, job_name):
         if job_name in self.cache_contents:
             return 'w'
+        elif self.llc is not None and job_name in self.llc.cache_contents:
+            return 'l'
         else:
             return ' '
         
     def get_rate(self, job_name):
         if job_name in self.cache_contents:
             return self.cache_rate_warm
+        elif self.llc is not None and job_name in self.llc.cache_contents:
+            return self.llc.cache_rate
         else:
             return self.cache_rate_cold
 
@@ -114,10 +153,119 @@ class cache:
             if self.cache_warming_counter[job_name] <= 0:
                 self.cache_warming.remove(job_name)
                 self.cache_contents.insert(0, job_name)
+                self.hold(job_name)
                 self.adjust_size()
                 # print_cpu(self.cpu_id, '*warm cache*')
         return
 
+    def get_state(self):
+        return {'contents': self.cache_contents,
+                'warming': [[job_name, self.cache_warming_counter[job_name]] for job_name in self.cache_warming]}
+
+    def set_state(self, state):
+        self.cache_contents = list(state['contents'])
+        self.cache_warming = [job_name for (job_name, _) in state['warming']]
+        self.cache_warming_counter = dict(state['warming'])
+        return
+
+#
+# class shared_cache
+#
+# optional last-level cache shared by all CPUs, below the per-CPU caches:
+# - a job warms it by running on any CPU for 'cache_warmup_time'
+# - a job in it, but not in the cache of the CPU it runs on, runs at 'cache_rate'
+#   (so a job that moves to another CPU need not start from cold)
+# - it is inclusive: when a per-CPU cache warms up for a job, the job is
+#   brought in here too, and when a job is kicked out of here, it is kicked
+#   out of every per-CPU cache as well
+# 'holders' maps each job to the CPUs whose caches hold it, so that a kick-out
+# only touches those caches, however many CPUs there are
+#
+class shared_cache:
+    def __init__(self, jobs, caches, cache_size, cache_rate, cache_warmup_time):
+        self.jobs = jobs
+        self.caches = caches
+        self.cache_size = cache_size
+        self.cache_rate = cache_rate
+        self.cache_warmup_time = cache_warmup_time
+
+        # job_name -> True, oldest first; kicked out oldest first
+        self.cache_contents = OrderedDict()
+        self.cache_used = 0
+        self.holders = {}
+
+        # job_name -> how long until the cache is warm for that job
+        self.cache_warming_counter = {}
+        return
+
+    def new_job(self, job_name):
+        if job_name not in self.cache_contents and job_name not in self.cache_warming_counter:
+            if self.cache_warmup_time == 0:
+                self.fill(job_name)
+            else:
+                self.cache_warming_counter[job_name] = self.cache_warmup_time
+        return
+
+    def update_warming(self, job_name):
+        if job_name in self.cache_warming_counter:
+            self.cache_warming_counter[job_name] -= 1
+            if self.cache_warming_counter[job_name] <= 0:
+                self.fill(job_name)
+        return
+
+    def fill(self, job_name):
+        if job_name in self.cache_contents:
+            return
+        self.cache_warming_counter.pop(job_name, None)
+        self.cache_contents[job_name] = True
+        self.cache_used += self.jobs[job_name].working_set_size
+        self.holders[job_name] = set()
+        # make room, but always keep the job just brought in (its working set may be too big)
+        while self.cache_used > self.cache_size and len(self.cache_contents) > 1:
+            self.kick_out(next(iter(self.cache_contents)))
+        return
+
+    def kick_out(self, job_gone):
+        del self.cache_contents[job_gone]
+        self.cache_used -= self.jobs[job_gone].working_set_size
+        for cpu in self.holders.pop(job_gone):
+            self.caches[cpu].evict(job_gone)
+        self.cache_warming_counter[job_gone] = self.cache_warmup_time
+        return
+
+    def hold(self, job_name, cpu):
+        self.fill(job_name)
+        self.holders[job_name].add(cpu)
+        return
+
+    def release(self, job_name, cpu):
+        self.holders[job_name].discard(cpu)
+        return
+
+    def forget(self, job_name):
+        # the job has left the system; the per-CPU caches forget it too, on their own
+        if job_name in self.cache_contents:
+            del self.cache_contents[job_name]
+            self.cache_used -= self.jobs[job_name].working_set_size
+            del self.holders[job_name]
+        self.cache_warming_counter.pop(job_name, None)
+        return
+
+    def get_state(self):
+        # holders are left out: they follow from what the per-CPU caches hold
+        return {'contents': list(self.cache_contents),
+                'warming': [[job_name, left] for (job_name, left) in self.cache_warming_counter.items()]}
+
+    def set_state(self, state, caches):
+        self.cache_contents = OrderedDict((job_name, True) for job_name in state['contents'])
+        self.cache_used = sum(self.jobs[job_name].working_set_size for job_name in self.cache_contents)
+        self.cache_warming_counter = dict(state['warming'])
+        self.holders = dict((job_name, set()) for job_name in self.cache_contents)
+        for cpu in range(len(caches)):
+            for job_name in caches[cpu]['contents']:
+                self.holders[job_name].add(cpu)
+        return
+
 #
 # class scheduler
 #
@@ -128,13 +276,19 @@ class scheduler:
                  job_num, max_run, max_wset,
                  num_cpus, time_slice, random_order,
                  cache_size, cache_rate_cold, cache_rate_warm, cache_warmup_time,
-                 solve, trace, trace_time_left, trace_cache, trace_sched):
+                 llc_size, llc_rate, llc_warmup_time,
+                 solve, trace, trace_time_left, trace_cache, trace_sched, profile=False, percentiles=False, progress=False,
+                 tail=0, sample=0, summary=False, timeline='', timeline_every=1,
+                 segments='', snapshot='', snapshot_at=0, resume=None, telemetry=False, rng=None):
+
+        # random jobs, CPU order and steal victims all come from the run's generator
+        self.rng = rng if rng is not None else active_rng()
 
         if job_list == '':
             # this means randomly generate jobs
             for j in range(job_num):
-                run_time = int((random.random() * max_run)/10.0) * 10
-                working_set = int((random.random() * max_wset)/10.0) * 10
+                run_time = int((self.rng.random() * max_run)/10.0) * 10
+                working_set = int((self.rng.random() * max_wset)/10.0) * 10
                 if job_list == '':
                     job_list = '%s:%d:%d' % (str(j), run_time, working_set)
                 else:
@@ -233,6 +387,39 @@ class scheduler:
         self.trace_cache = trace_cache
         self.trace_sched = trace_sched
 
+        # phase timings (a no-op unless profiling was asked for)
+        self.prof = make_profiler(profile)
+        self.progress = make_progress(progress, self.num_jobs)
+
+        # keep only the end of the trace (and every sample-th tick), or none of it, if asked
+        self.tail_lines = tail
+        self.tail_sample = sample
+        self.summary = summary
+
+        # save the whole state at time snapshot_at, and/or start from a saved state
+        self.snapshot = snapshot
+        self.snapshot_at = snapshot_at
+        self.resume = resume
+
+        # stretches of each CPU's time spent on one job, for the Gantt chart
+        self.segments = make_segments(segments)
+
+        # per-tick time series: which job each CPU runs, warm or not, queue depths
+        self.job_index = dict((job_name, index) for (index, job_name) in enumerate(self.job_name_list))
+        self.timeline = make_timeline(timeline, timeline_every,
+                                      {'cpu_job': (num_cpus, 'int32'), 'cpu_warm': (num_cpus, 'bool'),
+                                       'queue_depth': (num_cpus if per_cpu_queues else 1, 'int32')})
+
+        # migrations, steals, warm/cold ticks, evictions and queue waits (a no-op unless asked for)
+        self.telemetry = make_telemetry(telemetry, num_cpus, self.job_name_list, cache_warmup_time)
+
+        # per-job latency: when it first ran, when it last got a CPU, and CPU ticks received
+        self.percentiles = percentiles
+        self.latency = LatencyStats()
+        self.first_run = {}
+        self.assigned_at = {}
+        self.ran_ticks = {}
+
         # tracking each CPU: is it idle or running a job?
         self.STATE_IDLE = 1
         self.STATE_RUNNING = 2
@@ -250,14 +437,22 @@ class scheduler:
         # just some stats
         self.stats_ran = {}
         self.stats_ran_warm = {}
+        self.stats_ran_llc = {}
         for cpu in range(self.num_cpus):
             self.stats_ran[cpu] = 0
             self.stats_ran_warm[cpu] = 0
+            self.stats_ran_llc[cpu] = 0
 
-        # scheduler (because it runs the simulation) also instantiates and updates each cache
+        # scheduler (because it runs the simulation) also instantiates and updates each cache,
+        # and the shared last-level cache below them, if there is one
         self.caches = {}
+        if llc_size > 0:
+            self.llc = shared_cache(self.jobs, self.caches, llc_size, llc_rate, llc_warmup_time)
+        else:
+            self.llc = None
         for cpu in range(self.num_cpus):
-            self.caches[cpu] = cache(cpu, self.jobs, cache_size, cache_rate_cold, cache_rate_warm, cache_warmup_time)
+            self.caches[cpu] = cache(cpu, self.jobs, cache_size, cache_rate_cold, cache_rate_warm, cache_warmup_time, self.llc,
+                                     self.telemetry)
 
         return
 
@@ -268,7 +463,7 @@ class scheduler:
             job_name = self.sched_current[cpu]
             self.sched_current[cpu] = ''
             # print_cpu(cpu, 'tick done for job %s' % job_name)
-            self.per_cpu_sched_queue[cpu].append(job_name)
+            self.descheduled(cpu, job_name)
         return
 
     def handle_interrupts(self):
@@ -289,6 +484,10 @@ class scheduler:
             print(' %3d   ' % self.system_time, end='')
 
         # INTERRUPTS first: this might deschedule a job, putting it into a runqueue
+        self.handle_cpu_interrupts(interrupt)
+        return
+
+    def handle_cpu_interrupts(self, interrupt):
         for cpu in range(self.num_cpus):
             self.handle_one_interrupt(interrupt, cpu)
         return
@@ -301,23 +500,131 @@ class scheduler:
             if len(self.jobs[job_name].affinity) == 0 or cpu in self.jobs[job_name].affinity:
                 # extract job from runqueue, put in CPU local structures
                 sched_queue.pop(job_index)
-                self.sched_state[cpu] = self.STATE_RUNNING
-                self.sched_current[cpu] = job_name
-                self.caches[cpu].new_job(job_name)
+                self.telemetry.dispatched(cpu, job_name, self.system_time)
+                self.dispatch(cpu, job_name)
                 # print('got job %s' % job_name)
                 return
         return
 
+    def dispatch(self, cpu, job_name):
+        self.sched_state[cpu] = self.STATE_RUNNING
+        self.sched_current[cpu] = job_name
+        self.caches[cpu].new_job(job_name)
+        if self.llc is not None:
+            self.llc.new_job(job_name)
+        self.dispatched(job_name)
+        return
+
+    def dispatched(self, job_name):
+        self.assigned_at[job_name] = self.system_time
+        if job_name not in self.first_run:
+            self.first_run[job_name] = self.system_time
+        return
+
     def assign_jobs(self):
         if self.random_order:
             cpu_list = list(range(self.num_cpus))
-            random.shuffle(cpu_list)
+            self.rng.shuffle(cpu_list)
         else:
             cpu_list = range(self.num_cpus)
         for cpu in cpu_list:
             if self.sched_state[cpu] == self.STATE_IDLE:
                 self.get_job(cpu, self.per_cpu_sched_queue[cpu])
 
+    def record_timeline(self):
+        cpu_job = []
+        cpu_warm = []
+        for cpu in range(self.num_cpus):
+            job_name = self.sched_current[cpu]
+            if self.sched_state[cpu] == self.STATE_RUNNING:
+                cpu_job.append(self.job_index[job_name])
+                cpu_warm.append(self.caches[cpu].get_cache_state(job_name) == 'w')
+            else:
+                cpu_job.append(-1)
+                cpu_warm.append(False)
+        self.timeline.record(self.system_time, cpu_job=cpu_job, cpu_warm=cpu_warm, queue_depth=self.queue_depths())
+        return
+
+    #
+    # SNAPSHOTS: everything run() changes, as plain data (see snapshot.py)
+    #
+    def get_state(self):
+        state = {'job_list': ','.join('%s:%d:%d' % (job_name, self.jobs[job_name].run_time, self.jobs[job_name].working_set_size)
+                                      for job_name in self.job_name_list),
+                 'system_time': self.system_time,
+                 'jobs_finished': self.jobs_finished,
+                 'first_run': self.first_run,
+                 'assigned_at': self.assigned_at,
+                 'ran_ticks': self.ran_ticks,
+                 'latency': self.latency.get_state()}
+        if self.telemetry.enabled:
+            state['telemetry'] = self.telemetry.get_state()
+        if self.per_cpu_queues:
+            state['queues'] = [self.per_cpu_sched_queue[cpu] for cpu in range(self.num_cpus)]
+        else:
+            state['queue'] = self.single_sched_queue
+        state.update(self.get_cpu_state())
+        return state
+
+    def get_cpu_state(self):
+        # what each CPU runs, its cache and stats, and each job's time left
+        return {'current': [self.sched_current[cpu] for cpu in range(self.num_cpus)],
+                'time_left': [self.jobs[job_name].time_left[0] for job_name in self.job_name_list],
+                'stats_ran': [self.stats_ran[cpu] for cpu in range(self.num_cpus)],
+                'stats_ran_warm': [self.stats_ran_warm[cpu] for cpu in range(self.num_cpus)],
+                'stats_ran_llc': [self.stats_ran_llc[cpu] for cpu in range(self.num_cpus)],
+                'caches': [self.caches[cpu].get_state() for cpu in range(self.num_cpus)],
+                'llc': self.llc.get_state() if self.llc is not None else None}
+
+    def set_state(self, state):
+        if len(state['current']) != self.num_cpus:
+            print('cannot resume: the snapshot has %d CPUs, not %d' % (len(state['current']), self.num_cpus))
+            exit(1)
+        if ('queues' in state) != self.per_cpu_queues:
+            print('cannot resume: the snapshot was taken with%s per-CPU queues' % ('' if 'queues' in state else 'out'))
+            exit(1)
+        if (state['llc'] is not None) != (self.llc is not None):
+            print('cannot resume: the snapshot was taken with%s a shared cache' % ('' if state['llc'] is not None else 'out'))
+            exit(1)
+        self.system_time = state['system_time']
+        self.jobs_finished = state['jobs_finished']
+        self.first_run = state['first_run']
+        self.assigned_at = state['assigned_at']
+        self.ran_ticks = state['ran_ticks']
+        self.latency.set_state(state['latency'])
+        self.telemetry.set_state(state.get('telemetry'))
+        if self.per_cpu_queues:
+            for cpu in range(self.num_cpus):
+                self.per_cpu_sched_queue[cpu] = state['queues'][cpu]
+        else:
+            # every CPU shares this one list
+            self.single_sched_queue[:] = state['queue']
+        self.set_cpu_state(state)
+        return
+
+    def set_cpu_state(self, state):
+        for cpu in range(self.num_cpus):
+            job_name = state['current'][cpu]
+            self.sched_current[cpu] = job_name
+            self.sched_state[cpu] = self.STATE_RUNNING if job_name != '' else self.STATE_IDLE
+            self.stats_ran[cpu] = state['stats_ran'][cpu]
+            self.stats_ran_warm[cpu] = state['stats_ran_warm'][cpu]
+            self.stats_ran_llc[cpu] = state['stats_ran_llc'][cpu]
+            self.caches[cpu].set_state(state['caches'][cpu])
+        for (job_name, time_left) in zip(self.job_name_list, state['time_left']):
+            self.jobs[job_name].time_left[:] = [time_left]
+        if self.llc is not None:
+            self.llc.set_state(state['llc'], state['caches'])
+        return
+
+    def done(self):
+        return self.jobs_finished >= self.num_jobs
+
+    def queue_depths(self):
+        if self.per_cpu_queues:
+            return [len(self.per_cpu_sched_queue[cpu]) for cpu in range(self.num_cpus)]
+        return [len(self.single_sched_queue)]
+
     def print_sched_queues(self):
         # PRINT queue information
         if not self.trace_sched:
@@ -347,7 +654,7 @@ class scheduler:
                     # find IDLE job in some other CPUs queue
                     other_cpu_list = list(range(self.num_cpus))
                     other_cpu_list.remove(cpu)
-                    other_cpu = random.choice(other_cpu_list)
+                    other_cpu = self.rng.choice(other_cpu_list)
                     # print('cpu %d is idle' % cpu)
                     # print('-> look at %d' % other_cpu)
 
@@ -356,6 +663,7 @@ class scheduler:
                         if len(self.jobs[job_name].affinity) == 0 or cpu in self.jobs[job_name]:
                            self.per_cpu_sched_queue[other_cpu].remove(job_name)
                            self.per_cpu_sched_queue[cpu].append(job_name)
+                           self.telemetry.stolen(job_name, other_cpu, cpu)
                            # print('stole job %s from %d to %d' % (job_name, other_cpu, cpu))
                            break
         return
@@ -369,7 +677,13 @@ class scheduler:
         current_rate = self.caches[cpu].get_rate(job_name)
         self.stats_ran[cpu] += 1
         if current_rate > 1:
-            self.stats_ran_warm[cpu] += 1
+            if self.caches[cpu].get_cache_state(job_name) == 'l':
+                self.stats_ran_llc[cpu] += 1
+            else:
+                self.stats_ran_warm[cpu] += 1
+        if self.telemetry.enabled:
+            self.telemetry.ran(job_name, self.caches[cpu].get_cache_state(job_name))
+        self.segments.run(cpu, self.system_time, self.system_time + 1, job_name)
         time_left = job.time_left.pop() - current_rate
         if time_left < 0:
             time_left = 0
@@ -382,14 +696,29 @@ class scheduler:
 
         # UPDATE: cache warming
         self.caches[cpu].update_warming(job_name)
+        if self.llc is not None:
+            self.llc.update_warming(job_name)
 
         if time_left <= 0:
             self.sched_state[cpu] = self.STATE_IDLE
             job_name = self.sched_current[cpu]
             self.sched_current[cpu] = ''
-            # remember: it is time X now, but job ran through this tick, so finished at X + 1
-            # print_cpu(cpu, 'finished %s at time %d' % (job_name, self.system_time + 1))
-            self.jobs_finished += 1
+            self.finished(job_name)
+        return
+
+    def finished(self, job_name):
+        # remember: it is time X now, but job ran through this tick, so finished at X + 1
+        # print_cpu(cpu, 'finished %s at time %d' % (job_name, self.system_time + 1))
+        self.jobs_finished += 1
+        turnaround = self.system_time + 1
+        ran = self.ran_ticks.get(job_name, 0) + turnaround - self.assigned_at[job_name]
+        self.latency.add(self.first_run[job_name], turnaround, turnaround - ran)
+        return
+
+    def descheduled(self, cpu, job_name):
+        self.per_cpu_sched_queue[cpu].append(job_name)
+        self.telemetry.queued(job_name, self.system_time)
+        self.ran_ticks[job_name] = self.ran_ticks.get(job_name, 0) + self.system_time - self.assigned_at[job_name]
         return
 
     def run_jobs(self):
@@ -401,13 +730,13 @@ class scheduler:
                 if self.trace_time_left:
                     print('[   ] ', end='')
 
-            # PRINT: cache state
-            cache_string = ''
-            for job_name in self.job_name_list:
-                # cache_string += '%s%s ' % (job_name, self.caches[cpu].get_cache_state(job_name))
-                cache_string += '%s' % self.caches[cpu].get_cache_state(job_name)
+            # PRINT: cache state (only built when traced: it costs a look at every job on every CPU)
             if self.trace:
                 if self.trace_cache:
+                    cache_string = ''
+                    for job_name in self.job_name_list:
+                        # cache_string += '%s%s ' % (job_name, self.caches[cpu].get_cache_state(job_name))
+                        cache_string += '%s' % self.caches[cpu].get_cache_state(job_name)
                     print('cache[%s]' % cache_string, end='')
                 print('     ', end='')
         return
@@ -419,36 +748,590 @@ class scheduler:
         # things to track
         self.system_time = 0
         self.jobs_finished = 0
+        if self.resume is not None:
+            self.set_state(self.resume)
+            if self.trace:
+                print('[ resumed at time %d ]' % self.system_time)
+
+        prof = self.prof
+        progress = self.progress
+        tail = start_tail(self.tail_lines, self.tail_sample, self.summary)
+        while not self.done():
+            progress.update(self.system_time, self.jobs_finished)
+            tail.mark(self.system_time)
+            if self.snapshot != '' and self.system_time == self.snapshot_at:
+                write_snapshot(self.snapshot, 'multi', self.get_state())
+            t = prof.now()
 
-        while self.jobs_finished < self.num_jobs:
             # interrupts: may cause end of a tick, thus making job schedulable elsewhere
             self.handle_interrupts()
+            t = prof.lap('handle_interrupts', t)
 
             # if it's time, do some job stealing
             self.steal_jobs()
+            t = prof.lap('steal_jobs', t)
                 
             # assign_jobsign news jobs to CPUs (this can happen every tick?)
             self.assign_jobs()
+            t = prof.lap('assign_jobs', t)
+
+            if self.timeline.due(self.system_time):
+                self.record_timeline()
 
             # run each CPU for a time slice and handle POSSIBLE end of job
             self.run_jobs()
+            t = prof.lap('run_jobs', t)
 
             self.print_sched_queues()
 
             # to add a newline after all the job updates
             if self.trace:
                 print('')
+            prof.lap('print_sched_queues', t)
 
             # the clock keeps ticking            
             self.system_time += 1
+            prof.tick()
+        progress.finish(self.system_time, self.jobs_finished)
+        if self.snapshot != '' and self.system_time <= self.snapshot_at:
+            sys.stderr.write('no snapshot written: the run ended at time %d\n' % self.system_time)
+        tail.finish()
+        self.timeline.save(job_names=self.job_name_list)
+        self.segments.close()
 
         if self.solve:
             print('\nFinished time %d\n' % self.system_time)
             print('Per-CPU stats')
-            for cpu in range(self.num_cpus):
-                print('  CPU %d  utilization %3.2f [ warm %3.2f ]' % (cpu, 100.0 * float(self.stats_ran[cpu])/float(self.system_time),
-                                                                      100.0 * float(self.stats_ran_warm[cpu])/float(self.system_time)))
+            self.print_utilization(self.stats_ran, self.stats_ran_warm, self.stats_ran_llc, self.system_time)
             print('')
+            self.print_stats()
+            self.telemetry.report()
+            if self.percentiles:
+                self.latency.report()
+        prof.report()
+        return
+
+    def print_utilization(self, ran, ran_warm, ran_llc, ticks):
+        for cpu in range(self.num_cpus):
+            if self.llc is not None:
+                print('  CPU %d  utilization %3.2f [ warm %3.2f llc %3.2f ]' % (cpu, 100.0 * float(ran[cpu])/float(ticks),
+                                                                              100.0 * float(ran_warm[cpu])/float(ticks),
+                                                                              100.0 * float(ran_llc[cpu])/float(ticks)))
+                continue
+            print('  CPU %d  utilization %3.2f [ warm %3.2f ]' % (cpu, 100.0 * float(ran[cpu])/float(ticks),
+                                                                  100.0 * float(ran_warm[cpu])/float(ticks)))
+        return
+
+    def print_stats(self):
+        # anything a variant of the scheduler adds to the final statistics
+        return
+
+#
+# class cache_table
+#
+# the same caches as above -- one per CPU, plus the shared one if there is
+# one -- kept in arrays for the vector engine:
+# - warm[cpu, job] says whether the job's working set is in that CPU's cache
+# - warming[cpu, job] whether it is warming up there, warming_left[cpu, job]
+#   how long to go
+# - llc_warm[job], llc_warming[job] and llc_warming_left[job] the same for
+#   the shared cache
+# the order of each cache (newest first, kicked out from the back) is still
+# kept in lists, which only change when a cache warms up or kicks a job out.
+# jobs are numbered in job list order.
+#
+class cache_table:
+    def __init__(self, wset, num_cpus, cache_size, cache_rate_cold, cache_rate_warm, cache_warmup_time,
+                 llc_size, llc_rate, llc_warmup_time, job_names, telemetry):
+        num_jobs = len(wset)
+        self.job_names = job_names
+        self.telemetry = telemetry
+        self.wset = wset
+        self.cache_size = cache_size
+        self.cache_rate_cold = cache_rate_cold
+        self.cache_rate_warm = cache_rate_warm
+        self.cache_warmup_time = cache_warmup_time
+
+        self.contents = [[] for cpu in range(num_cpus)]
+        self.warm = np.zeros((num_cpus, num_jobs), dtype=bool)
+        self.warming = np.zeros((num_cpus, num_jobs), dtype=bool)
+        self.warming_left = np.zeros((num_cpus, num_jobs), dtype=np.int64)
+
+        self.llc = llc_size > 0
+        self.llc_size = llc_size
+        self.llc_rate = llc_rate
+        self.llc_warmup_time = llc_warmup_time
+        self.llc_contents = OrderedDict()
+        self.llc_used = 0
+        self.holders = {}
+        self.llc_warm = np.zeros(num_jobs, dtype=bool)
+        self.llc_warming = np.zeros(num_jobs, dtype=bool)
+        self.llc_warming_left = np.zeros(num_jobs, dtype=np.int64)
+        return
+
+    # per-CPU caches, one CPU and job at a time (see class cache)
+    def new_job(self, cpu, job):
+        if not self.warm[cpu, job] and not self.warming[cpu, job]:
+            if self.cache_warmup_time == 0:
+                self.insert(cpu, job)
+            else:
+                self.warming[cpu, job] = True
+                self.warming_left[cpu, job] = self.cache_warmup_time
+        return
+
+    def update_warming(self, cpu, job):
+        if self.warming[cpu, job]:
+            self.warming_left[cpu, job] -= 1
+            if self.warming_left[cpu, job] <= 0:
+                self.warming[cpu, job] = False
+                self.insert(cpu, job)
+        return
+
+    def insert(self, cpu, job):
+        self.contents[cpu].insert(0, job)
+        self.warm[cpu, job] = True
+        if self.llc:
+            self.llc_fill(job)
+            self.holders[job].add(cpu)
+        self.adjust_size(cpu)
+        return
+
+    def adjust_size(self, cpu):
+        contents = self.contents[cpu]
+        working_set_total = sum(self.wset[job] for job in contents)
+        while working_set_total > self.cache_size:
+            job_gone = contents.pop()
+            if self.llc:
+                self.holders[job_gone].discard(cpu)
+            self.kicked_out(cpu, job_gone)
+            working_set_total -= self.wset[job_gone]
+        return
+
+    def kicked_out(self, cpu, job):
+        self.telemetry.evicted(cpu, self.job_names[job])
+        self.warm[cpu, job] = False
+        self.warming[cpu, job] = True
+        self.warming_left[cpu, job] = self.cache_warmup_time
+        return
+
+    def get_cache_state(self, cpu, job):
+        if self.warm[cpu, job]:
+            return 'w'
+        elif self.llc_warm[job]:
+            return 'l'
+        else:
+            return ' '
+
+    def get_rate(self, cpu, job):
+        if self.warm[cpu, job]:
+            return self.cache_rate_warm
+        elif self.llc_warm[job]:
+            return self.llc_rate
+        else:
+            return self.cache_rate_cold
+
+    # the shared cache (see class shared_cache)
+    def llc_new_job(self, job):
+        if not self.llc_warm[job] and not self.llc_warming[job]:
+            if self.llc_warmup_time == 0:
+                self.llc_fill(job)
+            else:
+                self.llc_warming[job] = True
+                self.llc_warming_left[job] = self.llc_warmup_time
+        return
+
+    def llc_update_warming(self, job):
+        if self.llc_warming[job]:
+            self.llc_warming_left[job] -= 1
+            if self.llc_warming_left[job] <= 0:
+                self.llc_fill(job)
+        return
+
+    def llc_fill(self, job):
+        if self.llc_warm[job]:
+            return
+        self.llc_warming[job] = False
+        self.llc_warm[job] = True
+        self.llc_contents[job] = True
+        self.llc_used += self.wset[job]
+        self.holders[job] = set()
+        while self.llc_used > self.llc_size and len(self.llc_contents) > 1:
+            job_gone = next(iter(self.llc_contents))
+            del self.llc_contents[job_gone]
+            self.llc_warm[job_gone] = False
+            self.llc_used -= self.wset[job_gone]
+            for cpu in self.holders.pop(job_gone):
+                self.contents[cpu].remove(job_gone)
+                self.kicked_out(cpu, job_gone)
+            self.llc_warming[job_gone] = True
+            self.llc_warming_left[job_gone] = self.llc_warmup_time
+        return
+
+    # all running CPUs at once
+    def fills_due(self, cpus, jobs):
+        # will warming up this tick bring any job into the shared cache (and so maybe kick others out)?
+        if not self.llc:
+            return False
+        l1_done = self.warming[cpus, jobs] & (self.warming_left[cpus, jobs] <= 1)
+        llc_done = self.llc_warming[jobs] & (self.llc_warming_left[jobs] <= 1)
+        return bool((llc_done | (l1_done & ~self.llc_warm[jobs])).any())
+
+#
+# class vector_scheduler
+#
+# the same scheduler, but with the state of every CPU -- running or not, its
+# job, and (in a cache_table) its cache -- and each job's time left in NumPy
+# arrays, so that a tick advances all running CPUs in a few array operations
+# rather than a Python loop over CPUs. results match the scalar scheduler:
+# - things that happen to one CPU (a time slice ending, a job arriving or
+#   finishing, a cache warming up) are still handled one by one, in CPU order
+# - a tick in which the shared cache takes in a job can kick jobs out of
+#   other CPUs' caches mid-tick, so such ticks go CPU by CPU, as does any
+#   traced run (the trace is per CPU anyway)
+#
+class vector_scheduler(scheduler):
+    def __init__(self, **kwargs):
+        scheduler.__init__(self, **kwargs)
+        # the cache objects built by the scalar scheduler go unused; the table stands in for them
+        self.table = cache_table([self.jobs[job_name].working_set_size for job_name in self.job_name_list],
+                                 self.num_cpus, kwargs['cache_size'], kwargs['cache_rate_cold'],
+                                 kwargs['cache_rate_warm'], kwargs['cache_warmup_time'],
+                                 kwargs['llc_size'], kwargs['llc_rate'], kwargs['llc_warmup_time'],
+                                 self.job_name_list, self.telemetry)
+        self.keep_segments = kwargs.get('segments', '') != ''
+
+        self.running = np.zeros(self.num_cpus, dtype=bool)
+        self.current = np.full(self.num_cpus, -1, dtype=np.int64)
+        self.time_left = np.array([self.jobs[job_name].run_time for job_name in self.job_name_list], dtype=np.int64)
+        self.stats_ran = np.zeros(self.num_cpus, dtype=np.int64)
+        self.stats_ran_warm = np.zeros(self.num_cpus, dtype=np.int64)
+        self.stats_ran_llc = np.zeros(self.num_cpus, dtype=np.int64)
+        return
+
+    def handle_cpu_interrupts(self, interrupt):
+        if not interrupt:
+            return
+        for cpu in np.flatnonzero(self.running):
+            job_name = self.job_name_list[self.current[cpu]]
+            self.running[cpu] = False
+            self.current[cpu] = -1
+            self.descheduled(cpu, job_name)
+        return
+
+    def assign_jobs(self):
+        if self.random_order:
+            cpu_list = list(range(self.num_cpus))
+            self.rng.shuffle(cpu_list)
+            cpus = np.array(cpu_list)
+            cpus = cpus[~self.running[cpus]]
+        else:
+            cpus = np.flatnonzero(~self.running)
+        for cpu in cpus:
+            sched_queue = self.per_cpu_sched_queue[cpu]
+            if len(sched_queue) > 0:
+                self.get_job(int(cpu), sched_queue)
+        return
+
+    def dispatch(self, cpu, job_name):
+        job = self.job_index[job_name]
+        self.running[cpu] = True
+        self.current[cpu] = job
+        self.table.new_job(cpu, job)
+        if self.table.llc:
+            self.table.llc_new_job(job)
+        self.dispatched(job_name)
+        return
+
+    def get_cpu_state(self):
+        # same layout as the scalar scheduler's, so snapshots move freely between engines
+        names = self.job_name_list
+        table = self.table
+        state = {'current': [names[job] if job >= 0 else '' for job in self.current],
+                 'time_left': [int(time_left) for time_left in self.time_left],
+                 'stats_ran': [int(ran) for ran in self.stats_ran],
+                 'stats_ran_warm': [int(ran) for ran in self.stats_ran_warm],
+                 'stats_ran_llc': [int(ran) for ran in self.stats_ran_llc],
+                 'caches': [], 'llc': None}
+        for cpu in range(self.num_cpus):
+            warming = np.flatnonzero(table.warming[cpu])
+            state['caches'].append({'contents': [names[job] for job in table.contents[cpu]],
+                                    'warming': [[names[job], int(table.warming_left[cpu, job])] for job in warming]})
+        if table.llc:
+            state['llc'] = {'contents': [names[job] for job in table.llc_contents],
+                            'warming': [[names[job], int(table.llc_warming_left[job])] for job in np.flatnonzero(table.llc_warming)]}
+        return state
+
+    def set_cpu_state(self, state):
+        table = self.table
+        for cpu in range(self.num_cpus):
+            job_name = state['current'][cpu]
+            self.running[cpu] = job_name != ''
+            self.current[cpu] = self.job_index[job_name] if job_name != '' else -1
+            cache_state = state['caches'][cpu]
+            table.contents[cpu] = [self.job_index[job_name] for job_name in cache_state['contents']]
+            table.warm[cpu] = False
+            table.warm[cpu, table.contents[cpu]] = True
+            table.warming[cpu] = False
+            for (job_name, left) in cache_state['warming']:
+                table.warming[cpu, self.job_index[job_name]] = True
+                table.warming_left[cpu, self.job_index[job_name]] = left
+        self.time_left[:] = state['time_left']
+        self.stats_ran[:] = state['stats_ran']
+        self.stats_ran_warm[:] = state['stats_ran_warm']
+        self.stats_ran_llc[:] = state['stats_ran_llc']
+        if table.llc:
+            llc_state = state['llc']
+            table.llc_contents = OrderedDict((self.job_index[job_name], True) for job_name in llc_state['contents'])
+            table.llc_used = sum(table.wset[job] for job in table.llc_contents)
+            table.llc_warm[:] = False
+            table.llc_warm[list(table.llc_contents)] = True
+            table.llc_warming[:] = False
+            for (job_name, left) in llc_state['warming']:
+                table.llc_warming[self.job_index[job_name]] = True
+                table.llc_warming_left[self.job_index[job_name]] = left
+            table.holders = dict((job, set()) for job in table.llc_contents)
+            for cpu in range(self.num_cpus):
+                for job in table.contents[cpu]:
+                    table.holders[job].add(cpu)
+        return
+
+    def record_timeline(self):
+        cpus = np.arange(self.num_cpus)
+        cpu_job = np.where(self.running, self.current, -1)
+        cpu_warm = self.running & self.table.warm[cpus, np.maximum(self.current, 0)]
+        self.timeline.record(self.system_time, cpu_job=cpu_job, cpu_warm=cpu_warm, queue_depth=self.queue_depths())
+        return
+
+    def run_one_tick(self, cpu):
+        job = self.current[cpu]
+        job_name = self.job_name_list[job]
+        table = self.table
+
+        current_rate = table.get_rate(cpu, job)
+        self.stats_ran[cpu] += 1
+        if current_rate > 1:
+            if table.get_cache_state(cpu, job) == 'l':
+                self.stats_ran_llc[cpu] += 1
+            else:
+                self.stats_ran_warm[cpu] += 1
+        if self.telemetry.enabled:
+            self.telemetry.ran(job_name, table.get_cache_state(cpu, job))
+        self.segments.run(cpu, self.system_time, self.system_time + 1, job_name)
+        time_left = max(self.time_left[job] - current_rate, 0)
+        self.time_left[job] = time_left
+
+        if self.trace:
+            print('%s ' % job_name, end='')
+            if self.trace_time_left:
+                print('[%3d] ' % time_left, end='')
+
+        table.update_warming(cpu, job)
+        if table.llc:
+            table.llc_update_warming(job)
+
+        if time_left <= 0:
+            self.running[cpu] = False
+            self.current[cpu] = -1
+            self.finished(job_name)
+        return
+
+    def run_jobs(self):
+        if self.trace:
+            for cpu in range(self.num_cpus):
+                if self.running[cpu]:
+                    self.run_one_tick(cpu)
+                else:
+                    print('- ', end='')
+                    if self.trace_time_left:
+                        print('[   ] ', end='')
+                if self.trace_cache:
+                    cache_string = ''
+                    for job in range(self.num_jobs):
+                        cache_string += self.table.get_cache_state(cpu, job)
+                    print('cache[%s]' % cache_string, end='')
+                print('     ', end='')
+            return
+
+        cpus = np.flatnonzero(self.running)
+        jobs = self.current[cpus]
+        table = self.table
+        if table.fills_due(cpus, jobs):
+            for cpu in cpus:
+                self.run_one_tick(int(cpu))
+            return
+
+        # rates: warm in this CPU's cache, else warm in the shared cache, else cold
+        warm = table.warm[cpus, jobs]
+        rate = np.where(warm, table.cache_rate_warm, table.cache_rate_cold)
+        in_llc = ~warm & table.llc_warm[jobs]
+        rate[in_llc] = table.llc_rate
+        self.stats_ran[cpus] += 1
+        faster = rate > 1
+        self.stats_ran_warm[cpus] += faster & ~in_llc
+        self.stats_ran_llc[cpus] += faster & in_llc
+        if self.telemetry.enabled:
+            self.telemetry.ran_many(jobs, warm, in_llc)
+        if self.keep_segments:
+            for cpu, job in zip(cpus, jobs):
+                self.segments.run(cpu, self.system_time, self.system_time + 1, self.job_name_list[job])
+        time_left = np.maximum(self.time_left[jobs] - rate, 0)
+        self.time_left[jobs] = time_left
+
+        # cache warming: no job reaches the shared cache this tick, so each CPU only touches its own cache
+        warming = table.warming[cpus, jobs]
+        warming_cpus, warming_jobs = cpus[warming], jobs[warming]
+        table.warming_left[warming_cpus, warming_jobs] -= 1
+        warmed = table.warming_left[warming_cpus, warming_jobs] <= 0
+        for cpu, job in zip(warming_cpus[warmed], warming_jobs[warmed]):
+            table.warming[cpu, job] = False
+            table.insert(int(cpu), job)
+        if table.llc:
+            llc_jobs = jobs[table.llc_warming[jobs]]
+            table.llc_warming_left[llc_jobs] -= 1
+
+        done = time_left <= 0
+        for cpu, job in zip(cpus[done], jobs[done]):
+            self.running[cpu] = False
+            self.current[cpu] = -1
+            self.finished(self.job_name_list[job])
+        return
+
+#
+# class open_scheduler
+#
+# the same scheduler as an open system: besides the jobs there at time 0,
+# jobs keep arriving, as a Poisson process of 'arrival_rate' jobs per tick,
+# each drawn the way random jobs are (run time up to max_run, working set up
+# to max_wset) from 'arrivals', a generator of their own split off the run's
+# (for the python backend, seeded with the simulation seed). the run
+# goes on for 'warmup' ticks to reach a steady state, then 'window' ticks over
+# which it measures throughput, queue lengths, utilization and the
+# response/turnaround/wait percentiles of the jobs that finish. a finished
+# job is dropped from every table and cache, so memory follows the number of
+# jobs in the system, not the length of the run; stretches with no job at
+# all are skipped over unless traced.
+#
+class open_scheduler(scheduler):
+    def __init__(self, arrival_rate, warmup, window, arrivals, **kwargs):
+        scheduler.__init__(self, **kwargs)
+        self.arrival_rate = arrival_rate
+        self.warmup = warmup
+        self.end_time = warmup + window
+        self.arrivals = arrivals
+        self.next_arrival = self.arrivals.expovariate(arrival_rate)
+        self.max_run = kwargs['max_run']
+        self.max_wset = kwargs['max_wset']
+        self.next_name = len(self.job_name_list)
+        self.next_queue = 0
+        self.percentiles = True
+        self.progress = make_progress(kwargs.get('progress', False), 0)
+
+        # when each job arrived, and the CPUs whose caches it may be in
+        self.arrived_at = dict((job_name, 0) for job_name in self.job_name_list)
+        self.ran_on = dict((job_name, set()) for job_name in self.job_name_list)
+        self.running = 0
+
+        # measurements over the window
+        self.measuring = False
+        self.arrived = 0
+        self.departed = 0
+        self.queued_sum = 0
+        self.queued_max = 0
+        self.in_system_sum = 0
+        self.window_ran = None
+        return
+
+    def done(self):
+        return self.system_time >= self.end_time
+
+    def handle_interrupts(self):
+        # nothing in the system: nothing happens until the next arrival
+        if self.num_jobs == 0 and not self.trace:
+            self.system_time = max(self.system_time, min(int(self.next_arrival), self.end_time - 1))
+        if not self.measuring and self.system_time >= self.warmup:
+            self.measuring = True
+            self.window_ran = (list(self.stats_ran.values()), list(self.stats_ran_warm.values()), list(self.stats_ran_llc.values()))
+        scheduler.handle_interrupts(self)
+        self.arrive()
+        return
+
+    def arrive(self):
+        while self.next_arrival < self.system_time + 1:
+            job_name = str(self.next_name)
+            self.next_name += 1
+            if job_name in self.jobs:
+                continue
+            run_time = int((self.arrivals.random() * self.max_run)/10.0) * 10
+            working_set = int((self.arrivals.random() * self.max_wset)/10.0) * 10
+            self.jobs[job_name] = Job(name=job_name, run_time=run_time, working_set_size=working_set, affinity=[], time_left=[run_time])
+            self.job_name_list.append(job_name)
+            self.arrived_at[job_name] = self.system_time
+            self.ran_on[job_name] = set()
+            self.num_jobs += 1
+            if self.measuring:
+                self.arrived += 1
+            # new jobs go to the queues in turn, as the ones there at time 0 did
+            self.per_cpu_sched_queue[self.next_queue].append(job_name)
+            if self.per_cpu_queues:
+                self.next_queue = (self.next_queue + 1) % self.num_cpus
+            self.next_arrival += self.arrivals.expovariate(self.arrival_rate)
+        return
+
+    def assign_jobs(self):
+        scheduler.assign_jobs(self)
+        if self.measuring:
+            queued = self.num_jobs - self.running
+            self.queued_sum += queued
+            self.queued_max = max(self.queued_max, queued)
+            self.in_system_sum += self.num_jobs
+        return
+
+    def dispatch(self, cpu, job_name):
+        scheduler.dispatch(self, cpu, job_name)
+        self.ran_on[job_name].add(cpu)
+        self.running += 1
+        return
+
+    def descheduled(self, cpu, job_name):
+        scheduler.descheduled(self, cpu, job_name)
+        self.running -= 1
+        return
+
+    def finished(self, job_name):
+        self.running -= 1
+        self.jobs_finished += 1
+        end = self.system_time + 1
+        arrived = self.arrived_at.pop(job_name)
+        ran = self.ran_ticks.pop(job_name, 0) + end - self.assigned_at.pop(job_name)
+        if self.measuring:
+            self.departed += 1
+            self.latency.add(self.first_run[job_name] - arrived, end - arrived, end - arrived - ran)
+        del self.first_run[job_name]
+
+        # forget the job everywhere
+        for cpu in self.ran_on.pop(job_name):
+            self.caches[cpu].forget(job_name)
+        if self.llc is not None:
+            self.llc.forget(job_name)
+        del self.jobs[job_name]
+        self.job_name_list.remove(job_name)
+        self.num_jobs -= 1
+        return
+
+    def print_stats(self):
+        ticks = self.system_time - self.warmup
+        if ticks <= 0:
+            print('Open system: the run ended before the warmup (%d ticks) did\n' % self.warmup)
+            return
+        print('Open system: arrival rate %g per tick, measured from time %d to %d' % (self.arrival_rate, self.warmup, self.system_time))
+        print('  arrived %d  finished %d  throughput %.4f per tick' % (self.arrived, self.departed, float(self.departed) / ticks))
+        print('  queue length mean %.2f max %d  jobs in system mean %.2f' % (float(self.queued_sum) / ticks, self.queued_max,
+                                                                              float(self.in_system_sum) / ticks))
+        (ran, ran_warm, ran_llc) = self.window_ran
+        self.print_utilization([self.stats_ran[cpu] - ran[cpu] for cpu in range(self.num_cpus)],
+                               [self.stats_ran_warm[cpu] - ran_warm[cpu] for cpu in range(self.num_cpus)],
+                               [self.stats_ran_llc[cpu] - ran_llc[cpu] for cpu in range(self.num_cpus)], ticks)
+        print('  (percentiles below: jobs that finished in the window, timed from their arrival)\n')
         return
 
 #
@@ -456,6 +1339,8 @@ class scheduler:
 #
 parser = OptionParser()
 parser.add_option('-s', '--seed',        default=0,     help='the random seed',                        action='store', type='int', dest='seed')
+parser.add_option('--rng',               default='python', help='random number backend: python (the classic sequence) or bulk (numpy, drawn in blocks)', action='store', type='string', dest='rng')
+parser.add_option('--stream',            default=0,     help='with --rng bulk, which of the seed\'s independent streams to draw from', action='store', type='int', dest='stream')
 parser.add_option('-j', '--job_num',     default=3,     help='number of jobs in the system',           action='store', type='int', dest='job_num')
 parser.add_option('-R', '--max_run',     default=100,   help='max run time of random-gen jobs',        action='store', type='int', dest='max_run')
 parser.add_option('-W', '--max_wset',    default=200,   help='max working set of random-gen jobs',     action='store', type='int', dest='max_wset')
@@ -468,16 +1353,36 @@ parser.add_option('-P', '--peek_interval', default=30,  help='for per-cpu schedu
 parser.add_option('-w', '--warmup_time', default=10,    help='time it takes to warm cache',            action='store', type='int', dest='warmup_time')
 parser.add_option('-r', '--warm_rate', default=2,     help='how much faster to run with warm cache', action='store', type='int', dest='warm_rate')
 parser.add_option('-M', '--cache_size',  default=100,   help='cache size',                             action='store', type='int', dest='cache_size')
+parser.add_option('--llc_size',          default=0,     help='size of a cache shared by all CPUs, below the per-CPU ones; 0 means none', action='store', type='int', dest='llc_size')
+parser.add_option('--llc_rate',          default=2,     help='how much faster to run with the working set in the shared cache only', action='store', type='int', dest='llc_rate')
+parser.add_option('--llc_warmup',        default=20,    help='time it takes to warm the shared cache',  action='store', type='int', dest='llc_warmup')
 parser.add_option('-o', '--rand_order',  default=False, help='has CPUs get jobs in random order',      action='store_true',        dest='random_order')
 parser.add_option('-t', '--trace',       default=False, help='enable basic tracing (show which jobs got scheduled)',      action='store_true',        dest='trace')
 parser.add_option('-T', '--trace_time_left', default=False, help='trace time left for each job',       action='store_true',        dest='trace_time_left')
 parser.add_option('-C', '--trace_cache', default=False, help='trace cache status (warm/cold) too',     action='store_true',        dest='trace_cache')
 parser.add_option('-S', '--trace_sched', default=False, help='trace scheduler state',                  action='store_true',        dest='trace_sched')
 parser.add_option('-c', '--compute',     default=False, help='compute answers for me',                 action='store_true',        dest='solve')
+parser.add_option('--arrival_rate',      default=0.0,   help='open system: besides the jobs at time 0, jobs arrive at this many per tick (Poisson); 0 means none', action='store', type='float', dest='arrival_rate')
+parser.add_option('--open_warmup',       default=1000,  help='open system: ticks to run before measuring', action='store', type='int', dest='open_warmup')
+parser.add_option('--open_window',       default=10000, help='open system: ticks to measure over, after the warmup', action='store', type='int', dest='open_window')
+parser.add_option('--engine',            default='scalar', help='scalar, or vector: keep CPU and job state in NumPy arrays and advance all CPUs at once (for many CPUs; needs numpy)', action='store', type='string', dest='engine')
+parser.add_option('--percentiles',       default=False, help='also report p50/p95/p99 of response, turnaround and wait', action='store_true', dest='percentiles')
+parser.add_option('--tail',              default=0,     help='keep only the last TAIL lines of the trace', action='store', type='int', dest='tail')
+parser.add_option('--sample',            default=0,     help='with --tail, also keep the trace of every SAMPLE-th tick', action='store', type='int', dest='sample')
+parser.add_option('--summary',           default=False, help='print only the final statistics, not the trace', action='store_true', dest='summary')
+parser.add_option('--timeline',          default='',    help='write a per-tick time series (job and cache state per CPU, queue depths) to this .npz file; needs numpy', action='store', type='string', dest='timeline')
+parser.add_option('--timeline-every',    default=1,     help='with --timeline, keep every N-th tick', action='store', type='int', dest='timeline_every')
+parser.add_option('--segments',          default='',    help='write the run segments (cpu start end job) to this file', action='store', type='string', dest='segments')
+parser.add_option('--snapshot',          default='',    help='save the whole simulation state to this file at time SNAPSHOT_AT (the run goes on to the end as usual)', action='store', type='string', dest='snapshot')
+parser.add_option('--snapshot-at',       default=0,     help='with --snapshot, the time at which to save the state', action='store', type='int', dest='snapshot_at')
+parser.add_option('--resume',            default='',    help='resume from a snapshot file instead of starting at time 0; the jobs come from the snapshot, other options apply from then on', action='store', type='string', dest='resume')
+parser.add_option('--progress',          default=False, help='report simulated time and finished jobs on stderr while running', action='store_true', dest='progress')
+parser.add_option('--profile',           default=False, help='report time spent in each phase of the simulation loop', action='store_true', dest='profile')
+parser.add_option('--telemetry',         default=False, help='also report, per job and per CPU, migrations, steals, warm/cold ticks, cache evictions and queue wait', action='store_true', dest='telemetry')
 
 (options, args) = parser.parse_args()
 
-random_seed(options.seed)
+rng = make_rng(options.rng, options.seed, options.stream)
 
 print('ARG seed %s' % options.seed)
 print('ARG job_num %s' % options.job_num)
@@ -491,6 +1396,14 @@ print('ARG quantum %s' % options.time_slice)
 print('ARG peek_interval %s' % options.peek_interval)
 print('ARG warmup_time %s' % options.warmup_time)
 print('ARG cache_size %s' % options.cache_size)
+if options.llc_size > 0:
+    print('ARG llc_size %s' % options.llc_size)
+    print('ARG llc_rate %s' % options.llc_rate)
+    print('ARG llc_warmup %s' % options.llc_warmup)
+if options.arrival_rate > 0:
+    print('ARG arrival_rate %s' % options.arrival_rate)
+    print('ARG open_warmup %s' % options.open_warmup)
+    print('ARG open_window %s' % options.open_window)
 print('ARG random_order %s' % options.random_order)
 print('ARG trace %s' % options.trace)
 print('ARG trace_time %s' % options.trace_time_left)
@@ -503,6 +1416,12 @@ print('')
 # JOBS
 # 
 job_list = options.job_list
+
+# resuming: the snapshot has the jobs; the scheduler restores the rest when it starts running
+resume = None
+if options.resume != '':
+    resume = read_snapshot(options.resume, 'multi')
+    job_list = resume['job_list']
 job_num = int(options.job_num)
 max_run = int(options.max_run)
 max_wset = int(options.max_wset)
@@ -519,6 +1438,9 @@ time_slice = int(options.time_slice)
 cache_size = int(options.cache_size)
 cache_rate_warm = int(options.warm_rate)
 cache_warmup_time = int(options.warmup_time)
+llc_size = int(options.llc_size)
+llc_rate = int(options.llc_rate)
+llc_warmup_time = int(options.llc_warmup)
 
 do_trace = options.trace
 if options.trace_time_left or options.trace_cache or options.trace_sched:
@@ -527,13 +1449,46 @@ if options.trace_time_left or options.trace_cache or options.trace_sched:
 #
 # SCHEDULER (and simulator)
 #
-S = scheduler(job_list=job_list, affinity=options.affinity, per_cpu_queues=options.per_cpu_queues, peek_interval=options.peek_interval,
-              job_num=job_num, max_run=max_run, max_wset=max_wset,
-              num_cpus=num_cpus, time_slice=time_slice, random_order=options.random_order,
-              cache_size=cache_size, cache_rate_cold=1, cache_rate_warm=cache_rate_warm,
-              cache_warmup_time=cache_warmup_time, solve=options.solve,
-              trace=do_trace, trace_time_left=options.trace_time_left, trace_cache=options.trace_cache,
-              trace_sched=options.trace_sched)
+if options.engine == 'scalar':
+    engine = scheduler
+elif options.engine == 'vector':
+    try:
+        import numpy as np
+    except ImportError:
+        print('the vector engine needs numpy (pip install numpy)')
+        exit(1)
+    engine = vector_scheduler
+else:
+    print('bad engine %s: must be scalar or vector' % options.engine)
+    exit(1)
+
+# open system: jobs keep arriving; nothing here can follow a job's identity across the run
+if options.arrival_rate < 0:
+    print('bad arrival rate %s: must be 0 (none) or more' % options.arrival_rate)
+    exit(1)
+if options.arrival_rate > 0:
+    for (option, value) in (('--engine vector', options.engine == 'vector'), ('--timeline', options.timeline != ''),
+                            ('--segments', options.segments != ''), ('--snapshot', options.snapshot != ''),
+                            ('--resume', options.resume != ''), ('--telemetry', options.telemetry)):
+        if value:
+            print('%s does not work with --arrival_rate' % option)
+            exit(1)
+    engine = functools.partial(open_scheduler, options.arrival_rate, options.open_warmup, options.open_window, rng.spawn(0))
+
+S = engine(job_list=job_list, affinity=options.affinity, per_cpu_queues=options.per_cpu_queues, peek_interval=options.peek_interval,
+           job_num=job_num, max_run=max_run, max_wset=max_wset,
+           num_cpus=num_cpus, time_slice=time_slice, random_order=options.random_order,
+           cache_size=cache_size, cache_rate_cold=1, cache_rate_warm=cache_rate_warm,
+           cache_warmup_time=cache_warmup_time,
+           llc_size=llc_size, llc_rate=llc_rate, llc_warmup_time=llc_warmup_time, solve=options.solve,
+           trace=do_trace, trace_time_left=options.trace_time_left, trace_cache=options.trace_cache,
+           trace_sched=options.trace_sched, profile=options.profile,
+           percentiles=options.percentiles, progress=options.progress,
+           tail=options.tail, sample=options.sample, summary=options.summary,
+           timeline=options.timeline, timeline_every=options.timeline_every,
+           segments=options.segments,
+           snapshot=options.snapshot, snapshot_at=options.snapshot_at, resume=resume,
+           telemetry=options.telemetry, rng=rng)
 
 # Finally, ...
 S.run()
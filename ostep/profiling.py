@@ -0,0 +1,73 @@
+#
+# phase-level profiling for the simulator hot loops
+#
+# usage inside a simulation loop:
+#
+#   prof = make_profiler(options.profile)
+#   t = prof.now()
+#   do_something()
+#   t = prof.lap('something', t)
+#   ...
+#   prof.tick()
+#
+# when profiling is off, make_profiler() hands back a NullProfiler whose
+# methods do nothing, so the hot loops pay only for a couple of no-op calls
+#
+
+from __future__ import print_function
+import time
+
+class NullProfiler:
+    enabled = False
+
+    def now(self):
+        return 0
+
+    def lap(self, phase, start):
+        return 0
+
+    def tick(self, count=1):
+        return
+
+    def report(self):
+        return
+
+class PhaseProfiler:
+    enabled = True
+
+    def __init__(self):
+        # phase name -> [calls, cumulative seconds], in first-seen order
+        self.phases = {}
+        self.ticks = 0
+        self.started = time.perf_counter()
+
+    def now(self):
+        return time.perf_counter()
+
+    def lap(self, phase, start):
+        # charge the time since 'start' to 'phase' and return the new start
+        end = time.perf_counter()
+        entry = self.phases.get(phase)
+        if entry is None:
+            entry = self.phases[phase] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += end - start
+        return end
+
+    def tick(self, count=1):
+        self.ticks += count
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        print('Profile:')
+        print('  %-20s %10s %12s %10s' % ('phase', 'calls', 'total(ms)', 'avg(us)'))
+        for phase, (calls, total) in self.phases.items():
+            print('  %-20s %10d %12.3f %10.3f' % (phase, calls, 1000.0 * total, 1000000.0 * total / calls))
+        rate = self.ticks / elapsed if elapsed > 0 else 0.0
+        print('  ticks %d in %.4f secs ( %.0f ticks/sec )' % (self.ticks, elapsed, rate))
+        print('')
+
+def make_profiler(enabled):
+    if enabled:
+        return PhaseProfiler()
+    return NullProfiler()
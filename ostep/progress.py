@@ -0,0 +1,67 @@
+#
+# progress reports for long simulations
+#
+# the simulation loop calls update(simulated time, jobs finished) once per
+# step; every so often (checked every 1024 calls, printed at most every
+# 'interval' seconds) a line like
+#
+#   PROGRESS time 52000 done 17 of 40 ( 250000 ticks/sec )
+#
+# (with 'started 23' after the total when the loop also passes the number of
+# jobs that have run at all, and 'totals 310.00 5120.00 4400.00' after that,
+# the sums of response, turnaround and wait over the finished jobs, when it
+# was made with the LatencyStats those are fed to; together they bound the
+# statistics while a run goes)
+# goes to stderr, where the app reads it while stdout carries the results.
+# without --progress the loop gets a NullProgress and pays only for the call
+#
+
+from __future__ import print_function
+import sys
+import time
+
+class NullProgress:
+    def update(self, now, done, started=None):
+        return
+
+    def finish(self, now, done, started=None):
+        return
+
+class ProgressReporter:
+    def __init__(self, total, interval=0.2, stream=None, latency=None):
+        self.total = total
+        self.interval = interval
+        self.latency = latency
+        self.stream = stream if stream is not None else sys.stderr
+        self.calls = 0
+        self.last_wall = time.perf_counter()
+        self.last_now = 0
+
+    def update(self, now, done, started=None):
+        self.calls += 1
+        if self.calls & 1023:
+            return
+        wall = time.perf_counter()
+        if wall - self.last_wall >= self.interval:
+            self.report(wall, now, done, started)
+
+    def finish(self, now, done, started=None):
+        self.report(time.perf_counter(), now, done, started)
+
+    def report(self, wall, now, done, started=None):
+        elapsed = wall - self.last_wall
+        rate = (now - self.last_now) / elapsed if elapsed > 0 else 0.0
+        counts = 'done %d of %d' % (done, self.total)
+        if started is not None:
+            counts += ' started %d' % started
+        if self.latency is not None:
+            counts += ' totals ' + ' '.join('%.2f' % sketch.total for (_, sketch) in self.latency.metrics)
+        print('PROGRESS time %d %s ( %.0f ticks/sec )' % (now, counts, rate), file=self.stream)
+        self.stream.flush()
+        self.last_wall = wall
+        self.last_now = now
+
+def make_progress(enabled, total, latency=None):
+    if enabled:
+        return ProgressReporter(total, latency=latency)
+    return NullProgress()
@@ -0,0 +1,131 @@
+#
+# streaming quantiles for per-job statistics
+#
+# jobs are fed in as they complete; the sketch keeps a bounded number of
+# samples (a KLL sketch: a stack of compactors, each holding items that
+# stand for 2^level original values), so p50/p95/p99 can be reported for
+# any number of jobs in (nearly) constant memory.
+#
+# compaction alternates which half it keeps instead of flipping a coin,
+# so feeding the sketch never touches the simulators' random stream.
+#
+
+from __future__ import print_function
+
+class QuantileSketch:
+    def __init__(self, k=200):
+        self.k = k
+        self.compactors = [[]]
+        self.offsets = [0]
+        self.size = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(self.k * (2.0 / 3.0) ** depth))
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.max is None or value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+        self.compactors[0].append(value)
+        self.size += 1
+        if self.size >= self.max_size():
+            self.compress()
+
+    def max_size(self):
+        return sum(self.capacity(level) for level in range(len(self.compactors)))
+
+    def compress(self):
+        for level in range(len(self.compactors)):
+            if len(self.compactors[level]) >= self.capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                    self.offsets.append(0)
+                items = sorted(self.compactors[level])
+                # an odd item out stays behind at this level
+                leftover = []
+                if len(items) % 2 == 1:
+                    leftover.append(items.pop())
+                offset = self.offsets[level]
+                self.offsets[level] = 1 - offset
+                promoted = items[offset::2]
+                self.compactors[level] = leftover
+                self.compactors[level + 1].extend(promoted)
+                self.size -= len(promoted)
+                if self.size < self.max_size():
+                    return
+        return
+
+    def quantile(self, q):
+        if self.count == 0:
+            return 0.0
+        weighted = []
+        for level, items in enumerate(self.compactors):
+            for value in items:
+                weighted.append((value, 1 << level))
+        weighted.sort()
+        target = q * sum(weight for (_, weight) in weighted)
+        seen = 0
+        for (value, weight) in weighted:
+            seen += weight
+            if seen >= target:
+                return value
+        return weighted[-1][0]
+
+    def mean(self):
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    # plain-data copy of everything above, for snapshots
+    def get_state(self):
+        return {'k': self.k, 'compactors': self.compactors, 'offsets': self.offsets,
+                'size': self.size, 'count': self.count, 'total': self.total,
+                'min': self.min, 'max': self.max}
+
+    def set_state(self, state):
+        self.k = state['k']
+        self.compactors = [list(items) for items in state['compactors']]
+        self.offsets = list(state['offsets'])
+        self.size = state['size']
+        self.count = state['count']
+        self.total = state['total']
+        self.min = state['min']
+        self.max = state['max']
+
+#
+# response/turnaround/wait, one sketch each, reported in a common format
+# (tools such as the policy comparison parse these lines)
+#
+class LatencyStats:
+    def __init__(self, k=200):
+        self.metrics = [('Response', QuantileSketch(k)),
+                        ('Turnaround', QuantileSketch(k)),
+                        ('Wait', QuantileSketch(k))]
+
+    def add(self, response, turnaround, wait):
+        self.metrics[0][1].add(response)
+        self.metrics[1][1].add(turnaround)
+        self.metrics[2][1].add(wait)
+
+    def get_state(self):
+        return [sketch.get_state() for (_, sketch) in self.metrics]
+
+    def set_state(self, state):
+        for ((_, sketch), sketch_state) in zip(self.metrics, state):
+            sketch.set_state(sketch_state)
+
+    def report(self):
+        print('Percentiles:')
+        for (name, sketch) in self.metrics:
+            print('  %-10s -- mean %.2f  p50 %.2f  p95 %.2f  p99 %.2f  max %.2f' %
+                  (name, sketch.mean(), sketch.quantile(0.50), sketch.quantile(0.95),
+                   sketch.quantile(0.99), sketch.max if sketch.max is not None else 0.0))
+        print('')
@@ -0,0 +1,165 @@
+#
+# random numbers for the simulators, from one of two backends
+#
+# every script draws its random numbers from the generator make_rng() hands
+# back for its --rng option:
+#
+# - python (the default) is the random module, seeded as the scripts always
+#   seeded it (version=1), so a run prints exactly what it always printed
+#
+# - bulk draws doubles from numpy's PCG64 a block at a time and hands them
+#   out one by one from the block (or n at once with randoms(n)). its
+#   streams split reproducibly: stream k of seed s (--stream k) is child k of
+#   numpy's SeedSequence(s), so parallel workers given one seed and streams
+#   0, 1, 2, ... draw independent numbers, and running any one of them again
+#   draws the same numbers again. spawn(i) splits a stream the same way, for
+#   a part of one run that wants numbers of its own. the numbers do not
+#   depend on the block size.
+#
+# both offer random(), randoms(n) (the next n numbers, in the order n calls
+# to random() would draw them), shuffle, choice and expovariate, and a state
+# that snapshots save and restore, so a resumed run goes on drawing the
+# numbers the original run would have.
+#
+
+from __future__ import print_function
+import itertools
+import math
+import random
+import sys
+
+BACKENDS = ['python', 'bulk']
+
+# doubles drawn at a time by the bulk backend
+BLOCK = 4096
+
+class PythonRNG:
+    def __init__(self, seed=None, generator=None):
+        # the module's own generator unless given one; it is only seeded when a seed is given
+        self.generator = generator if generator is not None else random
+        self.seed = seed
+        if seed is not None:
+            # to make Python2 and Python3 act the same
+            try:
+                self.generator.seed(seed, version=1)
+            except:
+                self.generator.seed(seed)
+        # the generator's own methods, so a draw costs what it always did
+        self.random = self.generator.random
+        self.shuffle = self.generator.shuffle
+        self.choice = self.generator.choice
+        self.expovariate = self.generator.expovariate
+
+    def randoms(self, n):
+        draw = self.random
+        return [draw() for _ in range(n)]
+
+    def spawn(self, index):
+        # a generator of its own seeded with seed + index, as the scripts always made them
+        # (so spawn(0) repeats this generator's sequence from the start)
+        return PythonRNG(generator=random.Random(self.seed + index))
+
+    def getstate(self):
+        return self.generator.getstate()
+
+    def setstate(self, state):
+        # a state from JSON has lists for tuples; a bulk state is not ours to take
+        if isinstance(state, dict):
+            return False
+        version, internal, gauss = state
+        self.generator.setstate((version, tuple(internal), gauss))
+        return True
+
+class BulkRNG:
+    def __init__(self, seed, key=(0,), block=BLOCK):
+        import numpy as np
+        self.seed = seed
+        self.key = tuple(key)
+        self.block = block
+        self.bits = np.random.PCG64(np.random.SeedSequence(seed, spawn_key=self.key))
+        self.generator = np.random.Generator(self.bits)
+        self.start(self.bits.state, 0)
+
+    def start(self, state, used):
+        # draw on from the block starting at bit generator state 'state', 'used' numbers into it
+        self.bits.state = state
+        self.block_state = state
+        self.skip = used
+        self.current = None
+        self.stream = itertools.chain.from_iterable(self.blocks())
+        # a draw is one step of a C iterator over the block, with no Python call in between
+        self.random = self.stream.__next__
+
+    def blocks(self):
+        while True:
+            self.block_state = self.bits.state
+            self.current = iter(self.generator.random(self.block).tolist())
+            if self.skip > 0:
+                self.current.__setstate__(self.skip)
+                self.skip = 0
+            yield self.current
+
+    def randoms(self, n):
+        return list(itertools.islice(self.stream, n))
+
+    def shuffle(self, x):
+        # Fisher-Yates, as random.shuffle does it
+        for i in reversed(range(1, len(x))):
+            j = int(self.random() * (i + 1))
+            x[i], x[j] = x[j], x[i]
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+    def expovariate(self, rate):
+        return -math.log(1.0 - self.random()) / rate
+
+    def spawn(self, index):
+        return BulkRNG(self.seed, self.key + (index,), self.block)
+
+    def getstate(self):
+        if self.current is None:
+            used = self.skip
+        else:
+            # a list iterator pickles as (iter, (list,), position), without the position once exhausted
+            reduced = self.current.__reduce__()
+            used = reduced[2] if len(reduced) > 2 else self.block
+        return {'backend': 'bulk', 'key': list(self.key), 'block': self.block,
+                'bits': self.block_state, 'used': used}
+
+    def setstate(self, state):
+        if not isinstance(state, dict) or state.get('backend') != 'bulk':
+            return False
+        self.key = tuple(state['key'])
+        self.block = state['block']
+        self.start(state['bits'], state['used'])
+        return True
+
+# the generator the running script drew from, for snapshots to save and restore
+_active = [None]
+
+def active_rng():
+    if _active[0] is None:
+        _active[0] = PythonRNG()
+    return _active[0]
+
+def make_rng(backend, seed, stream=0):
+    if backend == 'python':
+        if stream != 0:
+            sys.stderr.write('--stream needs --rng bulk: the python backend has a single stream per seed\n')
+            sys.exit(1)
+        rng = PythonRNG(seed)
+    elif backend == 'bulk':
+        if seed < 0 or stream < 0:
+            sys.stderr.write('with --rng bulk, the seed and stream must be 0 or more\n')
+            sys.exit(1)
+        try:
+            rng = BulkRNG(seed, (stream,))
+        except ImportError:
+            sys.stderr.write('--rng bulk needs numpy (pip install numpy)\n')
+            sys.exit(1)
+    else:
+        sys.stderr.write('bad rng %s: must be one of %s\n' % (backend, ', '.join(BACKENDS)))
+        sys.exit(1)
+    _active[0] = rng
+    return rng
@@ -0,0 +1,49 @@
+#
+# run segments: which job ran on which lane (a CPU, or an MLFQ level), when
+#
+# the engine reports every stretch of running with run(lane, start, end, job);
+# back-to-back stretches of the same job on a lane are merged as they come
+# in, and each finished segment is written straight to the file as
+#
+#   lane start end job
+#
+# so memory holds one open segment per lane however long the run is. the
+# app reads the file to draw its Gantt chart.
+#
+
+class NullSegments:
+    def run(self, lane, start, end, job):
+        return
+
+    def close(self):
+        return
+
+class SegmentWriter:
+    def __init__(self, path):
+        self.out = open(path, 'w')
+        # lane -> [job, start, end] of the segment still growing there
+        self.current = {}
+
+    def run(self, lane, start, end, job):
+        segment = self.current.get(lane)
+        if segment is not None:
+            if segment[0] == job and segment[2] == start:
+                segment[2] = end
+                return
+            self.write(lane, segment)
+        self.current[lane] = [job, start, end]
+
+    def write(self, lane, segment):
+        self.out.write('%s %s %s %s\n' % (lane, segment[1], segment[2], segment[0]))
+
+    def close(self):
+        for lane, segment in self.current.items():
+            self.write(lane, segment)
+        self.current = {}
+        self.out.close()
+
+def make_segments(path):
+    # an empty path means nobody wants the segments
+    if path == '':
+        return NullSegments()
+    return SegmentWriter(path)
@@ -0,0 +1,48 @@
+#
+# snapshots: the whole state of a simulation at one point in simulated time
+#
+# the engine hands over its state as plain data (dicts, lists, numbers and
+# strings) and gets the same back when resuming. it is stored as
+# zlib-compressed JSON, so snapshots are small and can be kept, copied and
+# looked into; JSON turns dict keys into strings, so engines store tables
+# keyed by numbers as lists. the state of the run's random number generator
+# (see rng.py) goes in too, so a resumed run draws the same numbers the
+# original run would have; a snapshot only resumes with the backend it was
+# taken with.
+#
+# a run resumed from a snapshot may be given other parameters (a different
+# boost, quantum, time slice, ...): they take effect from the snapshot's
+# time on, which is how one simulated prefix is shared by many what-ifs.
+#
+
+import json
+from rng import active_rng
+import sys
+import zlib
+
+FORMAT = 1
+
+def write_snapshot(path, engine, state):
+    data = {'format': FORMAT, 'engine': engine, 'random': active_rng().getstate(), 'state': state}
+    with open(path, 'wb') as f:
+        f.write(zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8')))
+
+def load_snapshot(path, engine):
+    # returns the state, or None if the file is missing, damaged, not from this engine or from another --rng
+    try:
+        with open(path, 'rb') as f:
+            data = json.loads(zlib.decompress(f.read()).decode('utf-8'))
+    except (IOError, OSError, ValueError, zlib.error):
+        return None
+    if data.get('format') != FORMAT or data.get('engine') != engine:
+        return None
+    if not active_rng().setstate(data['random']):
+        return None
+    return data['state']
+
+def read_snapshot(path, engine):
+    state = load_snapshot(path, engine)
+    if state is None:
+        sys.stderr.write('cannot resume: %s is not a %s snapshot (or was taken with another --rng)\n' % (path, engine))
+        sys.exit(1)
+    return state
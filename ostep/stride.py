@@ -0,0 +1,138 @@
+#! /usr/bin/env python
+
+#
+# stride scheduling: the deterministic cousin of lottery.py
+#
+# takes the same jobs (run time plus tickets, random or via -l) and the same
+# quantum; each job gets a stride of BIG/tickets and a pass value starting at
+# zero. every quantum the job with the lowest pass runs and its pass grows by
+# its stride. the runnable jobs live in a min-heap keyed on pass, so each
+# decision costs O(log n).
+#
+
+from __future__ import print_function
+import sys
+from optparse import OptionParser
+import heapq
+from quantiles import LatencyStats
+from progress import make_progress
+from tailtrace import start_tail
+from segments import make_segments
+from rng import make_rng
+
+parser = OptionParser()
+parser.add_option('-s', '--seed', default=0, help='the random seed',              action='store', type='int', dest='seed')
+parser.add_option('--rng', default='python', help='random number backend: python (the classic sequence) or bulk (numpy, drawn in blocks)', action='store', type='string', dest='rng')
+parser.add_option('--stream', default=0, help='with --rng bulk, which of the seed\'s independent streams to draw from', action='store', type='int', dest='stream')
+parser.add_option('-j', '--jobs', default=3, help='number of jobs in the system', action='store', type='int', dest='jobs')
+parser.add_option('-l', '--jlist', default='', help='instead of random jobs, provide a comma-separated list of run times and ticket values (e.g., 10:100,20:100 would have two jobs with run-times of 10 and 20, each with 100 tickets)',  action='store', type='string', dest='jlist')
+parser.add_option('-m', '--maxlen',  default=10,  help='max length of job',         action='store', type='int', dest='maxlen')
+parser.add_option('-T', '--maxticket', default=100, help='maximum ticket value, if randomly assigned',          action='store', type='int', dest='maxticket')
+parser.add_option('-q', '--quantum', default=1,   help='length of time slice', action='store', type='int', dest='quantum')
+parser.add_option('-b', '--big', default=10000, help='large number divided by tickets to get each stride', action='store', type='int', dest='big')
+parser.add_option('-c', '--compute', help='compute answers for me', action='store_true', default=False, dest='solve')
+parser.add_option('--percentiles', help='also report p50/p95/p99 of response, turnaround and wait', action='store_true', default=False, dest='percentiles')
+parser.add_option('--tail', help='keep only the last TAIL lines of the execution trace', default=0, action='store', type='int', dest='tail')
+parser.add_option('--sample', help='with --tail, also keep the trace of every SAMPLE-th step', default=0, action='store', type='int', dest='sample')
+parser.add_option('--summary', help='print only the final statistics, not the execution trace', action='store_true', default=False, dest='summary')
+parser.add_option('--segments', help='write the run segments (lane start end job) to this file', default='', action='store', type='string', dest='segments')
+parser.add_option('--progress', help='report simulated time and finished jobs on stderr while running', action='store_true', default=False, dest='progress')
+
+(options, args) = parser.parse_args()
+
+rng = make_rng(options.rng, options.seed, options.stream)
+
+print('ARG jlist', options.jlist)
+print('ARG jobs', options.jobs)
+print('ARG maxlen', options.maxlen)
+print('ARG maxticket', options.maxticket)
+print('ARG quantum', options.quantum)
+print('ARG big', options.big)
+print('ARG seed', options.seed)
+print('')
+
+print('Here is the job list, with the run time of each job: ')
+
+# same job generation as lottery.py, so a seed gives the same jobs in both
+joblist = []
+if options.jlist == '':
+    for jobnum in range(0,options.jobs):
+        runtime = 0
+        while runtime == 0:
+            runtime = int(options.maxlen * rng.random())
+        tickets = 0
+        while tickets == 0:
+            tickets = int(options.maxticket * rng.random())
+        joblist.append([jobnum, runtime, tickets])
+else:
+    jobnum = 0
+    for entry in options.jlist.split(','):
+        (runtime, tickets) = entry.split(':')
+        joblist.append([jobnum, int(runtime), int(tickets)])
+        jobnum += 1
+for (job, runtime, tickets) in joblist:
+    if tickets <= 0:
+        print('Error: job %d needs a positive number of tickets' % job)
+        sys.exit(1)
+    print('  Job %d ( length = %d, tickets = %d, stride = %d )' % (job, runtime, tickets, options.big // tickets))
+print('\n')
+
+if options.solve == False:
+    print('Compute the order in which the jobs run, and when each one finishes.')
+    print('Each quantum goes to the job with the lowest pass value (ties go to the')
+    print('lowest job number); that job then adds its stride to its pass.')
+    print('Use -c to check your answers.')
+    print('')
+
+if options.solve == True:
+    print('** Solutions **\n')
+
+    latency = LatencyStats()
+    progress = make_progress(options.progress, len(joblist))
+    segments = make_segments(options.segments)
+    stride = {}
+    timeleft = {}
+    firstRun = {}
+    slices = {}
+
+    # (pass, job): ties on pass go to the lower job number
+    heap = []
+    for (job, runtime, tickets) in joblist:
+        stride[job] = options.big // tickets
+        timeleft[job] = runtime
+        heap.append((0, job))
+    heapq.heapify(heap)
+
+    clock = 0
+    tail = start_tail(options.tail, options.sample, options.summary)
+    while len(heap) > 0:
+        progress.update(clock, len(joblist) - len(heap))
+        tail.mark(clock)
+        (passval, job) = heapq.heappop(heap)
+
+        if job not in firstRun:
+            firstRun[job] = clock
+        slices[job] = slices.get(job, 0) + 1
+
+        if timeleft[job] >= options.quantum:
+            timeleft[job] -= options.quantum
+        else:
+            timeleft[job] = 0
+
+        print('[ time %d ] Run job %d ( pass %d stride %d ) timeleft %d' % (clock, job, passval, stride[job], timeleft[job]))
+        segments.run(0, clock, clock + options.quantum, job)
+        clock += options.quantum
+
+        # job completed!
+        if timeleft[job] == 0:
+            print('--> JOB %d DONE at time %d' % (job, clock))
+            latency.add(firstRun[job], clock, clock - slices[job] * options.quantum)
+        else:
+            heapq.heappush(heap, (passval + stride[job], job))
+    progress.finish(clock, len(joblist))
+    tail.finish()
+    segments.close()
+
+    print('')
+    if options.percentiles:
+        latency.report()
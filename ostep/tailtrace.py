@@ -0,0 +1,98 @@
+#
+# bounded "tail trace": keep only the end of a long execution trace
+#
+# while the trace is being printed, sys.stdout is swapped for a TailTrace,
+# which keeps the last N complete lines in a ring buffer (and, if asked,
+# the lines printed during every K-th tick in a second ring of the same
+# size). everything else is counted and dropped, so memory stays the same
+# however long the simulation runs. finish() puts stdout back and prints
+# what was kept, so the final statistics follow as usual.
+#
+# the engine calls mark(now) at the start of each tick so samples line up
+# with simulated time; engines without ticks simply never mark.
+#
+# with --summary nothing of the trace is kept: stdout is swapped for a sink
+# that drops it, so a run costs the simulation and the final statistics
+# only, which is what the app's live preview re-runs on every edit.
+#
+
+from __future__ import print_function
+from collections import deque
+import sys
+
+class NullTail:
+    def mark(self, now):
+        return
+
+    def finish(self):
+        return
+
+class DroppedTrace:
+    def __init__(self):
+        self.out = sys.stdout
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        return
+
+    def mark(self, now):
+        return
+
+    def finish(self):
+        sys.stdout = self.out
+        print('[ trace not printed (--summary) ]')
+
+class TailTrace:
+    def __init__(self, lines, every=0):
+        self.out = sys.stdout
+        self.tail = deque(maxlen=lines)
+        self.samples = deque(maxlen=lines)
+        self.every = every
+        self.sampling = False
+        self.partial = ''
+        self.total = 0
+
+    # file-like interface, enough for print()
+    def write(self, text):
+        lines = (self.partial + text).split('\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self.total += 1
+            self.tail.append(line)
+            if self.sampling:
+                self.samples.append(line)
+        return len(text)
+
+    def flush(self):
+        return
+
+    def mark(self, now):
+        self.sampling = self.every > 0 and now % self.every == 0
+
+    def finish(self):
+        if self.partial != '':
+            self.write('\n')
+        sys.stdout = self.out
+        if self.every > 0:
+            print('[ samples every %d ticks, last %d lines ]' % (self.every, len(self.samples)))
+            for line in self.samples:
+                print(line)
+        omitted = self.total - len(self.tail)
+        if omitted > 0:
+            print('[ %d earlier trace lines not kept ]' % omitted)
+        for line in self.tail:
+            print(line)
+
+def start_tail(lines, every=0, summary=False):
+    # lines <= 0 means keep the whole trace (print it as it happens); summary keeps none of it
+    if summary:
+        tail = DroppedTrace()
+        sys.stdout = tail
+        return tail
+    if lines <= 0:
+        return NullTail()
+    tail = TailTrace(lines, every)
+    sys.stdout = tail
+    return tail
@@ -0,0 +1,159 @@
+#
+# migration and cache-affinity telemetry for the multi-CPU simulator
+#
+# counts, for every job: how often it moved to another CPU, how often it was
+# stolen, the ticks it ran warm (in its CPU's cache), warm in the shared cache
+# only, or cold, how often its working set was kicked out of a cache, and the
+# ticks it spent waiting in a queue; and for every CPU: the steals it got and
+# gave, the jobs that moved to it and the working sets kicked out of it. each
+# kicked-out working set is a warmup paid for and lost.
+#
+# the counters live in array('l')s, one per counter, indexed by job (in job
+# list order) or by CPU, so they take a machine word per job and counter
+# whatever the number of jobs. the vector engine counts ticks for all CPUs at
+# once through numpy views of the same arrays.
+#
+# without --telemetry the engines get a NullTelemetry. they check its
+# 'enabled' before counting a tick, so the per-tick loops pay nothing; the
+# other events (dispatches, steals, evictions) call its no-ops
+#
+
+from __future__ import print_function
+from array import array
+
+JOB_COUNTERS = ['migrations', 'steals', 'warm', 'llc', 'cold', 'evictions', 'queue_wait']
+CPU_COUNTERS = ['steals_in', 'steals_out', 'migrations_in', 'evictions']
+
+class NullTelemetry:
+    enabled = False
+
+    def dispatched(self, cpu, job_name, now):
+        return
+
+    def queued(self, job_name, now):
+        return
+
+    def stolen(self, job_name, from_cpu, to_cpu):
+        return
+
+    def ran(self, job_name, cache_state):
+        return
+
+    def ran_many(self, jobs, warm, llc):
+        return
+
+    def evicted(self, cpu, job_name):
+        return
+
+    def get_state(self):
+        return None
+
+    def set_state(self, state):
+        return
+
+    def report(self):
+        return
+
+class Telemetry:
+    enabled = True
+
+    def __init__(self, num_cpus, job_names, warmup_time):
+        self.num_cpus = num_cpus
+        self.warmup_time = warmup_time
+        self.job_names = job_names
+        self.index = dict((job_name, index) for (index, job_name) in enumerate(job_names))
+        self.jobs = dict((name, array('l', [0]) * len(job_names)) for name in JOB_COUNTERS)
+        self.cpus = dict((name, array('l', [0]) * num_cpus) for name in CPU_COUNTERS)
+        # when each job last went into a queue (every job starts queued at time 0), and where it last ran
+        self.queued_at = array('l', [0]) * len(job_names)
+        self.last_cpu = array('l', [-1]) * len(job_names)
+        self.views = None
+
+    def dispatched(self, cpu, job_name, now):
+        job = self.index[job_name]
+        self.jobs['queue_wait'][job] += now - self.queued_at[job]
+        last = self.last_cpu[job]
+        if last >= 0 and last != cpu:
+            self.jobs['migrations'][job] += 1
+            self.cpus['migrations_in'][cpu] += 1
+        self.last_cpu[job] = cpu
+        return
+
+    def queued(self, job_name, now):
+        self.queued_at[self.index[job_name]] = now
+        return
+
+    def stolen(self, job_name, from_cpu, to_cpu):
+        self.jobs['steals'][self.index[job_name]] += 1
+        self.cpus['steals_out'][from_cpu] += 1
+        self.cpus['steals_in'][to_cpu] += 1
+        return
+
+    def ran(self, job_name, cache_state):
+        # cache_state as the caches report it: 'w' warm, 'l' in the shared cache only, ' ' cold
+        counter = 'warm' if cache_state == 'w' else 'llc' if cache_state == 'l' else 'cold'
+        self.jobs[counter][self.index[job_name]] += 1
+        return
+
+    def ran_many(self, jobs, warm, llc):
+        # one tick of the running jobs at once (numpy arrays): their indices, and which ran warm / in the shared cache
+        if self.views is None:
+            import numpy as np
+            self.views = dict((name, np.frombuffer(self.jobs[name], dtype=np.dtype('l')))
+                              for name in ('warm', 'llc', 'cold'))
+        # a job runs on one CPU at a time, so the indices are distinct and += counts each once
+        self.views['warm'][jobs[warm]] += 1
+        self.views['llc'][jobs[llc]] += 1
+        self.views['cold'][jobs[~(warm | llc)]] += 1
+        return
+
+    def evicted(self, cpu, job_name):
+        self.jobs['evictions'][self.index[job_name]] += 1
+        self.cpus['evictions'][cpu] += 1
+        return
+
+    def get_state(self):
+        state = dict((name, list(self.jobs[name])) for name in JOB_COUNTERS)
+        state.update(dict(('cpu_' + name, list(self.cpus[name])) for name in CPU_COUNTERS))
+        state['queued_at'] = list(self.queued_at)
+        state['last_cpu'] = list(self.last_cpu)
+        return state
+
+    def set_state(self, state):
+        # a snapshot taken without --telemetry has no counters; counting starts from the resume
+        if state is None:
+            return
+        for name in JOB_COUNTERS:
+            self.jobs[name][:] = array('l', state[name])
+        for name in CPU_COUNTERS:
+            self.cpus[name][:] = array('l', state['cpu_' + name])
+        self.queued_at[:] = array('l', state['queued_at'])
+        self.last_cpu[:] = array('l', state['last_cpu'])
+        return
+
+    def report(self):
+        print('Telemetry')
+        for cpu in range(self.num_cpus):
+            print('  CPU %d  steals in %d out %d  migrations in %d  evictions %d' %
+                  (cpu, self.cpus['steals_in'][cpu], self.cpus['steals_out'][cpu],
+                   self.cpus['migrations_in'][cpu], self.cpus['evictions'][cpu]))
+        for (job, job_name) in enumerate(self.job_names):
+            print('  Job %s  migrations %d  steals %d  ticks warm %d llc %d cold %d  evictions %d  queue wait %d' %
+                  (job_name, self.jobs['migrations'][job], self.jobs['steals'][job], self.jobs['warm'][job],
+                   self.jobs['llc'][job], self.jobs['cold'][job], self.jobs['evictions'][job],
+                   self.jobs['queue_wait'][job]))
+        totals = dict((name, sum(self.jobs[name])) for name in JOB_COUNTERS)
+        ran = totals['warm'] + totals['llc'] + totals['cold']
+        print('  Total  migrations %d  steals %d  ticks warm %d llc %d cold %d  evictions %d ( %d warmup ticks lost )  queue wait %d' %
+              (totals['migrations'], totals['steals'], totals['warm'], totals['llc'], totals['cold'],
+               totals['evictions'], totals['evictions'] * self.warmup_time, totals['queue_wait']))
+        if ran > 0:
+            print('  Warm share %3.2f  llc share %3.2f  migrations per 1000 ticks %3.2f' %
+                  (100.0 * totals['warm'] / ran, 100.0 * totals['llc'] / ran, 1000.0 * totals['migrations'] / ran))
+        print('')
+        return
+
+def make_telemetry(enabled, num_cpus, job_names, warmup_time):
+    if not enabled:
+        return NullTelemetry()
+    return Telemetry(num_cpus, job_names, warmup_time)
@@ -0,0 +1,74 @@
+#
+# per-tick time series, exported as a NumPy .npz file
+#
+# the engine declares its columns up front (name -> (width, dtype), with
+# width None for a single value per tick) and calls
+# record(now, column=values, ...) each tick; only every K-th tick is kept.
+# rows go into preallocated arrays that double in size when full, and
+# save() writes the filled part (plus any extra arrays, such as job names)
+# with numpy.savez_compressed, ready for np.load() in a notebook.
+#
+# numpy is only needed when a timeline is asked for, so it is imported then.
+#
+
+from __future__ import print_function
+import sys
+
+np = None
+
+class NullTimeline:
+    def due(self, now):
+        return False
+
+    def record(self, now, **values):
+        return
+
+    def save(self, **extra):
+        return
+
+class Timeline:
+    def __init__(self, path, every, columns, capacity=1024):
+        self.path = path
+        self.every = every
+        self.rows = 0
+        self.arrays = {'time': np.empty(capacity, dtype=np.int64)}
+        for name, (width, dtype) in columns.items():
+            shape = (capacity,) if width is None else (capacity, width)
+            self.arrays[name] = np.empty(shape, dtype=dtype)
+
+    def due(self, now):
+        return now % self.every == 0
+
+    def record(self, now, **values):
+        if self.rows == len(self.arrays['time']):
+            for name, array in self.arrays.items():
+                grown = np.empty((2 * array.shape[0],) + array.shape[1:], dtype=array.dtype)
+                grown[:self.rows] = array
+                self.arrays[name] = grown
+        row = self.rows
+        self.arrays['time'][row] = now
+        for name, value in values.items():
+            self.arrays[name][row] = value
+        self.rows += 1
+
+    def save(self, **extra):
+        arrays = dict((name, array[:self.rows]) for (name, array) in self.arrays.items())
+        arrays['every'] = np.array(self.every)
+        for name, value in extra.items():
+            arrays[name] = np.asarray(value)
+        np.savez_compressed(self.path, **arrays)
+
+def make_timeline(path, every, columns):
+    global np
+    # an empty path means no timeline
+    if path == '':
+        return NullTimeline()
+    try:
+        import numpy as np
+    except ImportError:
+        sys.stderr.write('timeline export needs numpy (pip install numpy)\n')
+        sys.exit(1)
+    if every <= 0:
+        sys.stderr.write('timeline sampling interval must be positive\n')
+        sys.exit(1)
+    return Timeline(path, every, columns)
@@ -0,0 +1,277 @@
+"""Pool of pre-warmed worker processes that run the simulators
+
+Starting a fresh interpreter for every solve costs far more than most
+simulations. Each worker here starts once, imports the simulators' helper
+modules and compiles every script under ostep/, then runs one solve after
+another by executing the compiled script with its own argv, stdout and stderr.
+Requests and results travel over a pipe. A worker that crashes, is cancelled,
+has run max_jobs solves or has grown past max_rss_mb is replaced by a fresh
+one, so solves stay isolated from the app and from each other. Each request
+carries the hash of the script's current source (as the result store keys it);
+a worker that compiled an older version exits instead of running it, and the
+solve goes to a fresh worker that loads the edited code.
+"""
+
+from multiprocessing.connection import Connection
+from typing import Callable, Sequence
+import glob
+import io
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import traceback
+
+from runner import ROOT, Progress, SimulationCancelled, build_command, parse_progress, parse_resumed
+from store import source_hash
+
+try:
+	import resource
+except ImportError:		# not on Windows; memory-based recycling is skipped there
+	resource = None
+
+_OSTEP = os.path.join(ROOT, "ostep")
+
+# seconds between checks for a cancel while a solve waits for a free worker
+_ACQUIRE_POLL = 0.1
+
+class _Stderr:
+	"""Stands in for a script's stderr: progress and resume lines go straight to the pool, the rest is kept"""
+	def __init__(self, conn:Connection, forward:bool) -> None:
+		self._conn = conn
+		self._forward = forward
+		self._partial = ""
+		self.lines: list[str] = []
+
+	def write(self, text:str) -> int:
+		lines = (self._partial + text).split("\n")
+		self._partial = lines.pop()
+		for line in lines:
+			if self._forward and line.startswith("PROGRESS "):
+				self._conn.send(("progress", line))
+			elif line.startswith("RESUMED "):
+				self._conn.send(("resumed", line))
+			else:
+				self.lines.append(line + "\n")
+		return len(text)
+
+	def flush(self):
+		return
+
+	def getvalue(self) -> str:
+		return "".join(self.lines) + self._partial
+
+def _peak_rss_mb() -> float:
+	if resource is None:
+		return 0.0
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# kilobytes on Linux, bytes on macOS
+	return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _worker_main(conn:Connection):
+	"""Worker loop: (script path, argv, forward progress, source hash) in, ("done", output, peak RSS in MB) out
+
+	Answers ("stale",) and exits when the hash is not that of the code it loaded.
+	"""
+	sys.path.insert(0, _OSTEP)
+	scripts = {}
+	hashes = {}
+	for path in glob.glob(os.path.join(_OSTEP, "*.py")):
+		with open(path) as f:
+			source = f.read()
+		if not source.startswith("#!"):
+			__import__(os.path.splitext(os.path.basename(path))[0])
+	for path in glob.glob(os.path.join(_OSTEP, "*.py")):
+		with open(path) as f:
+			source = f.read()
+		if source.startswith("#!"):
+			# hashed after the helpers were imported, so a helper edited since makes it stale
+			hashes[path] = source_hash(os.path.relpath(path, ROOT))
+			scripts[path] = compile(source, path, "exec")
+
+	while True:
+		request = conn.recv()
+		if request is None:
+			return
+		relative, argv, forward, expected = request
+		path = os.path.join(ROOT, relative)
+		code = scripts.get(path)
+		if code is None:
+			hashes[path] = source_hash(relative)
+			with open(path) as f:
+				code = scripts[path] = compile(f.read(), path, "exec")
+		if hashes[path] != expected:
+			conn.send(("stale",))
+			return
+
+		stdout = io.StringIO()
+		stderr = _Stderr(conn, forward)
+		saved = (sys.argv, sys.stdout, sys.stderr)
+		sys.argv, sys.stdout, sys.stderr = [path] + argv, stdout, stderr
+		try:
+			exec(code, {"__name__": "__main__", "__file__": path})
+		except SystemExit:
+			pass
+		except Exception:
+			traceback.print_exc()
+		finally:
+			sys.argv, sys.stdout, sys.stderr = saved
+		conn.send(("done", stdout.getvalue() + stderr.getvalue(), _peak_rss_mb()))
+
+class _Worker:
+	def __init__(self, context) -> None:
+		self.conn, child = context.Pipe()
+		self.process = context.Process(target=_worker_main, args=(child,), daemon=True)
+		self.process.start()
+		child.close()
+		self.jobs = 0
+
+	def stop(self):
+		try:
+			self.conn.send(None)
+		except OSError:
+			pass
+		self.process.join(timeout=1)
+		if self.process.is_alive():
+			self.process.kill()
+		self.conn.close()
+
+	def kill(self):
+		self.process.kill()
+		self.process.join()
+		self.conn.close()
+
+class PoolRun:
+	"""One solve handed to a pool worker; same interface as runner.SimulatorRun"""
+	def __init__(self, pool:"SimulatorPool", path:str, parameters:dict[str,str], extra:Sequence[str],
+				 on_progress:Callable[[Progress], None] | None) -> None:
+		self._pool = pool
+		self._on_progress = on_progress
+		self._cancelled = False
+		self.resumed_at: int | None = None
+		self._path = path
+		self._argv = build_command(path, parameters, extra)[2:]
+		if on_progress is not None:
+			self._argv.append("--progress")
+		# a worker is taken in wait, so the run can be cancelled while it waits for one
+		self._worker: _Worker | None = None
+		self._lock = threading.Lock()
+
+	def _start(self) -> _Worker:
+		"""Hands the solve to the next free worker"""
+		worker = self._pool._acquire(lambda: self._cancelled)
+		with self._lock:
+			cancelled = self._cancelled
+			if not cancelled:
+				self._worker = worker
+		if cancelled:
+			# cancelled just as the worker was taken; it never ran anything
+			self._pool._release(worker, 0.0)
+			raise SimulationCancelled()
+		worker.conn.send((self._path, self._argv, self._on_progress is not None, source_hash(self._path)))
+		return worker
+
+	def wait(self) -> str:
+		"""Waits for a free worker, then for the solve, and returns everything the simulator printed"""
+		worker = self._start()
+		try:
+			while True:
+				message = worker.conn.recv()
+				if message[0] == "stale":
+					# the worker has older code than the script on disk; it exits, and a fresh one loads the new
+					self._pool._replace(worker)
+					worker = self._start()
+					continue
+				if message[0] == "progress":
+					progress = parse_progress(message[1])
+					if progress is not None and self._on_progress is not None:
+						self._on_progress(progress)
+					continue
+				if message[0] == "resumed":
+					self.resumed_at = parse_resumed(message[1])
+					continue
+				_, output, peak_rss_mb = message
+				worker.jobs += 1
+				self._pool._release(worker, peak_rss_mb)
+				return output
+		except (EOFError, OSError):
+			# the worker died: cancelled, or the simulation crashed it
+			self._pool._replace(worker)
+			if self._cancelled:
+				raise SimulationCancelled()
+			raise RuntimeError("simulator worker exited unexpectedly")
+
+	def cancel(self):
+		"""Kills the worker running this solve (the pool starts a fresh one in its place), or stops it waiting for one"""
+		with self._lock:
+			self._cancelled = True
+			worker = self._worker
+		if worker is not None:
+			worker.process.kill()
+
+class SimulatorPool:
+	"""Fixed number of warm simulator workers; at most that many solves run at once, the rest wait"""
+	def __init__(self, size:int | None = None, max_jobs:int = 200, max_rss_mb:float = 1024) -> None:
+		self._context = multiprocessing.get_context("spawn")
+		self._size = size if size is not None else min(os.cpu_count() or 2, 8)
+		self._max_jobs = max_jobs
+		self._max_rss_mb = max_rss_mb
+		self._idle: queue.Queue[_Worker] = queue.Queue()
+		self._lock = threading.Lock()
+		self._closed = False
+		for _ in range(self._size):
+			self._idle.put(_Worker(self._context))
+
+	@property
+	def size(self) -> int:
+		return self._size
+
+	def _acquire(self, cancelled:Callable[[], bool]) -> _Worker:
+		"""Waits for an idle worker, raising SimulationCancelled as soon as cancelled() says so"""
+		while True:
+			if cancelled():
+				raise SimulationCancelled()
+			try:
+				return self._idle.get(timeout=_ACQUIRE_POLL)
+			except queue.Empty:
+				if self._closed:
+					raise RuntimeError("simulator pool is closed")
+
+	def _release(self, worker:_Worker, peak_rss_mb:float):
+		if self._closed or worker.jobs >= self._max_jobs or (self._max_rss_mb and peak_rss_mb > self._max_rss_mb):
+			worker.stop()
+			worker = self._spawn()
+		if worker is not None:
+			self._idle.put(worker)
+
+	def _replace(self, worker:_Worker):
+		worker.kill()
+		replacement = self._spawn()
+		if replacement is not None:
+			self._idle.put(replacement)
+
+	def _spawn(self) -> _Worker | None:
+		with self._lock:
+			if self._closed:
+				return None
+			return _Worker(self._context)
+
+	def submit(self, path:str, parameters:dict[str,str], extra:Sequence[str] = (),
+			   on_progress:Callable[[Progress], None] | None = None) -> PoolRun:
+		"""Queues a solve for the next free worker; its wait() waits for one if all are busy"""
+		return PoolRun(self, path, parameters, extra, on_progress)
+
+	def run(self, path:str, parameters:dict[str,str], extra:Sequence[str] = ()) -> str:
+		"""Runs a simulator to completion on a worker and returns everything it printed"""
+		return self.submit(path, parameters, extra).wait()
+
+	def close(self):
+		"""Stops every idle worker; busy ones stop when their solve returns"""
+		with self._lock:
+			self._closed = True
+		while True:
+			try:
+				self._idle.get_nowait().stop()
+			except queue.Empty:
+				return
@@ -0,0 +1,107 @@
+"""Finds the simulators the app can run, loading each one only when it is first needed
+
+The simulators that come with the app are listed here by the module that
+describes them; others are added by installing a package that declares an
+entry point in the "ostep_simulators" group, for example in its
+pyproject.toml:
+
+	[project.entry-points.ostep_simulators]
+	"My scheduler" = "my_package.simulator:MySimulator"
+
+Only the names are read up front, so the dropdown can be filled without
+importing anything. A simulator's module is imported, and its class
+instantiated, the first time it is picked or run.
+"""
+
+from importlib import import_module
+from importlib.metadata import entry_points
+from typing import NamedTuple, Protocol
+import threading
+
+GROUP = "ostep_simulators"
+
+class Parameter(NamedTuple):
+	"""One simulator parameter: the name the app shows, the script's flag for it, and a hint for the field"""
+	name: str
+	flag: str
+	hint: str
+	switch: bool = False		# an on/off flag, given as True/False
+
+class Simulator(Protocol):
+	@property
+	def name(self) -> str:
+		...
+
+	@property
+	def parameters(self) -> list[Parameter]:
+		...
+
+	@property
+	def path(self) -> str:
+		...
+
+	@property
+	def profiled(self) -> bool:
+		...
+
+	@property
+	def incremental(self) -> bool:
+		...
+
+	def split(self, output:str) -> tuple[str, str]:
+		...
+
+	def lane_label(self, lane:int) -> str:
+		...
+
+# name -> (module:attribute, script path); the path lets runs be matched to their simulator without importing it
+_builtin = {"Basic":		("simulators.basic:BasicScheduler", "ostep/basic.py"),
+			"Lottery":		("simulators.lottery:LotteryScheduler", "ostep/lottery.py"),
+			"Stride":		("simulators.stride:StrideScheduler", "ostep/stride.py"),
+			"MLFQ":			("simulators.mlfq:MLFQScheduler", "ostep/mlfq.py"),
+			"Multi-CPU":	("simulators.multi:MultiCPUScheduler", "ostep/multi.py"),
+			}
+
+_lock = threading.RLock()
+_plugins: dict[str, str] | None = None
+_loaded: dict[str, Simulator] = {}
+
+def _discover() -> dict[str, str]:
+	global _plugins
+	with _lock:
+		if _plugins is None:
+			_plugins = {entry.name: entry.value for entry in entry_points(group=GROUP) if entry.name not in _builtin}
+		return _plugins
+
+def names() -> list[str]:
+	"""Every simulator that can be picked: the built-in ones, then those installed packages add"""
+	return list(_builtin) + list(_discover())
+
+def load(name:str) -> Simulator:
+	"""The simulator called name, importing its module the first time; KeyError if there is none"""
+	with _lock:
+		simulator = _loaded.get(name)
+		if simulator is not None:
+			return simulator
+		reference = _builtin[name][0] if name in _builtin else _discover()[name]
+		module, _, attribute = reference.partition(":")
+		target = import_module(module)
+		for part in attribute.split("."):
+			target = getattr(target, part)
+		# a class (or any factory) is called; an object is taken as it is
+		simulator = _loaded[name] = target() if callable(target) else target
+		return simulator
+
+def for_path(path:str) -> Simulator:
+	"""The simulator whose script is at path (relative to the repo), loading only what it must to find it"""
+	with _lock:
+		for simulator in _loaded.values():
+			if simulator.path == path:
+				return simulator
+		for name, (_, builtin_path) in _builtin.items():
+			if builtin_path == path:
+				return load(name)
+		for name in _discover():
+			if load(name).path == path:
+				return _loaded[name]
+	raise KeyError(f"no simulator runs {path}")
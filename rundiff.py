@@ -0,0 +1,323 @@
+"""Compares two runs of a simulator by lining their traces up on simulated time
+
+Both outputs are read once, line by line, side by side: the trace is cut into
+groups of lines that share a timestamp and only the current group of each run
+is held, so two long traces diff in memory that does not grow with their
+length. Alongside the trace it keeps what each job did (response, turnaround
+and wait, from the final statistics or counted off the trace when a simulator
+prints none) and the summary lines printed after the trace.
+
+Run it as a script to diff two saved outputs:
+
+	python rundiff.py old.txt new.txt
+"""
+
+from typing import Iterable, Iterator, NamedTuple
+import re
+import sys
+
+METRICS = ["Response", "Turnaround", "Wait"]
+
+_arg_line = re.compile(r"^ARG (\S+) ?(.*)$")
+_option_line = re.compile(r"^OPTIONS (\S+)")
+_bracket_time = re.compile(r"^\s*\[ time\s+(\d+(?:\.\d+)?) \]")
+_multi_time = re.compile(r"^\s*(\d+)   ")
+_multi_column = re.compile(r"(\S+) (?:\[[ \d]{3}\] )?(?:cache\[[^\]]*\])?     ")
+_lottery_pick = re.compile(r"^Random \d+ -> Winning ticket \d+ \(of \d+\) -> Run (\d+)$")
+_stride_pick = re.compile(r"\] Run job (\d+) ")
+_job_done = re.compile(r"^--> JOB (\d+) DONE at time (\d+)$")
+_basic_stats = re.compile(r"^\s*Job\s+(\d+) -- Response: (\S+)\s+Turnaround (\S+)\s+Wait (\S+)$")
+_mlfq_stats = re.compile(r"^\s*Job\s+(\d+): startTime\s+\S+ - response\s+(\S+) - turnaround\s+(\S+)$")
+_number = re.compile(r"-?\d+(?:\.\d+)?")
+
+# lines that end the trace; everything after the profile is timings, which differ on every run
+_trace_ends = ("Final statistics", "Finished time", "Percentiles:")
+_output_ends = ("Profile:",)
+
+class Group(NamedTuple):
+	"""The trace lines a run printed for one point in simulated time"""
+	time: float
+	lines: tuple[str, ...]
+
+class Divergence(NamedTuple):
+	"""First point in simulated time where the two traces differ; a run with nothing there has no lines"""
+	time: float
+	old: tuple[str, ...]
+	new: tuple[str, ...]
+
+class SummaryChange(NamedTuple):
+	"""A line printed after the trace whose numbers changed; label has each number replaced by #"""
+	label: str
+	old: list[float]
+	new: list[float]
+
+class RunDiff(NamedTuple):
+	"""Everything diff_runs found between two runs"""
+	engine: str
+	divergence: Divergence | None
+	same: int
+	changed: int
+	old_only: int
+	new_only: int
+	jobs: dict[str, dict[str, tuple[float | None, float | None]]]
+	summary: list[SummaryChange]
+
+class _RunReader:
+	"""Streams one run's output: yields its trace groups, collecting job metrics and summary lines on the way"""
+	def __init__(self, lines:Iterable[str]) -> None:
+		self._lines = lines
+		self._args: dict[str, str] = {}
+		self._mlfq = False
+		self.engine = "unknown"
+		self.jobs: dict[str, dict[str, float]] = {}
+		self.summary: list[str] = []
+		# per-job counts kept off the trace, for the simulators that print no per-job statistics
+		self._first: dict[str, float] = {}
+		self._last: dict[str, float] = {}
+		self._runs: dict[str, int] = {}
+		self._quantum = 1
+
+	def _detect(self) -> str:
+		if self._mlfq:
+			return "mlfq"
+		for arg, engine in (("num_cpus", "multi"), ("big", "stride"), ("maxticket", "lottery"), ("policy", "basic")):
+			if arg in self._args:
+				return engine
+		return "unknown"
+
+	def groups(self) -> Iterator[Group]:
+		"""Trace groups in order of simulated time; the reader's other fields are complete once this is exhausted"""
+		lines = iter(self._lines)
+		in_trace = False
+		step = 0
+		time: float | None = None
+		group: list[str] = []
+
+		for line in lines:
+			line = line.rstrip("\n")
+			# checked first, as a run without a trace (Multi-CPU without -t) goes straight from its header to these
+			if line.startswith(_trace_ends) or line.startswith(_output_ends):
+				if not in_trace:
+					self.engine = self._detect()
+				if time is not None:
+					yield Group(time, tuple(group))
+				self._read_statistics(line, lines)
+				return
+
+			if not in_trace:
+				if line.startswith(("** Solutions **", "Execution Trace:")) or \
+				   ("num_cpus" in self._args and _multi_time.match(line)):
+					in_trace = True
+					self.engine = self._detect()
+					self._quantum = int(self._args.get("quantum", "1") or 1)
+				else:
+					self._read_header(line)
+					continue
+
+			stamp = self._timestamp(line, step)
+			if stamp is not None:
+				if self.engine == "lottery":
+					step += 1
+				if time is not None:
+					yield Group(time, tuple(group))
+				time, group = stamp, []
+			# blank lines, separators between time slices and resume notes say nothing about the schedule
+			if not line.strip("- ") or line.startswith("[ resumed at time") or time is None:
+				continue
+			group.append(line)
+			self._count(line, time)
+
+		if time is not None:
+			yield Group(time, tuple(group))
+		self._finish_counts()
+
+	def _read_header(self, line:str):
+		match = _arg_line.match(line)
+		if match is not None:
+			self._args[match.group(1)] = match.group(2)
+			return
+		if _option_line.match(line):
+			self._mlfq = True
+
+	def _timestamp(self, line:str, step:int) -> float | None:
+		if self.engine == "lottery":
+			return float(step * self._quantum) if _lottery_pick.match(line) else None
+		match = (_multi_time if self.engine == "multi" else _bracket_time).match(line)
+		return float(match.group(1)) if match is not None else None
+
+	def _count(self, line:str, time:float):
+		if self.engine == "multi":
+			match = _multi_time.match(line)
+			if match is None:
+				return
+			pos = match.end()
+			for _ in range(int(self._args["num_cpus"])):
+				column = _multi_column.match(line, pos)
+				if column is None:
+					break
+				pos = column.end()
+				if column.group(1) != "-":
+					self._ran(column.group(1), time)
+			return
+
+		if self.engine in ("lottery", "stride"):
+			match = (_lottery_pick if self.engine == "lottery" else _stride_pick).search(line)
+			if match is not None:
+				self._ran(match.group(1), time)
+				return
+			match = _job_done.match(line)
+			if match is not None:
+				self._last[match.group(1)] = float(match.group(2))
+
+	def _ran(self, job:str, time:float):
+		self._first.setdefault(job, time)
+		self._runs[job] = self._runs.get(job, 0) + 1
+		if self.engine == "multi":
+			self._last[job] = time + 1
+
+	def _finish_counts(self):
+		if self.engine not in ("multi", "lottery", "stride"):
+			return
+		for job, response in self._first.items():
+			metrics = self.jobs.setdefault(job, {})
+			metrics["Response"] = response
+			if job in self._last:
+				turnaround = self._last[job]
+				metrics["Turnaround"] = turnaround
+				metrics["Wait"] = turnaround - self._runs[job] * (1 if self.engine == "multi" else self._quantum)
+
+	def _read_statistics(self, line:str, lines:Iterator[str]):
+		self._finish_counts()
+		while line is not None:
+			line = line.rstrip("\n")
+			if line.startswith(_output_ends):
+				return
+			match = _basic_stats.match(line)
+			if match is not None:
+				self.jobs[match.group(1)] = dict(zip(METRICS, (float(v) for v in match.groups()[1:])))
+			else:
+				match = _mlfq_stats.match(line)
+				if match is not None:
+					self.jobs[match.group(1)] = dict(zip(METRICS, (float(v) for v in match.groups()[1:])))
+				elif _number.search(line):
+					self.summary.append(line.strip())
+			line = next(lines, None)
+
+def _job_order(job:str) -> tuple[int, int | str]:
+	return (0, int(job)) if job.isdigit() else (1, job)
+
+def _label(line:str) -> str:
+	return _number.sub("#", line)
+
+def _numbers(line:str) -> list[float]:
+	return [float(n) for n in _number.findall(line)]
+
+def diff_runs(old_lines:Iterable[str], new_lines:Iterable[str]) -> RunDiff:
+	"""Diffs two outputs of the same simulator, reading each once and holding one trace group of each at a time"""
+	old_reader, new_reader = _RunReader(old_lines), _RunReader(new_lines)
+	old_groups, new_groups = old_reader.groups(), new_reader.groups()
+	old, new = next(old_groups, None), next(new_groups, None)
+	divergence = None
+	same = changed = old_only = new_only = 0
+
+	while old is not None or new is not None:
+		if new is None or (old is not None and old.time < new.time):
+			old_only += 1
+			divergence = divergence or Divergence(old.time, old.lines, ())
+			old = next(old_groups, None)
+		elif old is None or new.time < old.time:
+			new_only += 1
+			divergence = divergence or Divergence(new.time, (), new.lines)
+			new = next(new_groups, None)
+		else:
+			if old.lines == new.lines:
+				same += 1
+			else:
+				changed += 1
+				divergence = divergence or Divergence(old.time, old.lines, new.lines)
+			old, new = next(old_groups, None), next(new_groups, None)
+
+	jobs = {}
+	for job in sorted(old_reader.jobs.keys() | new_reader.jobs.keys(), key=_job_order):
+		old_metrics, new_metrics = old_reader.jobs.get(job, {}), new_reader.jobs.get(job, {})
+		metrics = {metric: (old_metrics.get(metric), new_metrics.get(metric))
+				   for metric in METRICS if metric in old_metrics or metric in new_metrics}
+		if any(a != b for a, b in metrics.values()):
+			jobs[job] = metrics
+
+	# summary lines pair up by label, and by order among lines with the same label (one per CPU, say)
+	new_summary: dict[str, list[str]] = {}
+	for line in new_reader.summary:
+		new_summary.setdefault(_label(line), []).append(line)
+	summary = []
+	for line in old_reader.summary:
+		label = _label(line)
+		matches = new_summary.get(label)
+		if not matches:
+			summary.append(SummaryChange(label, _numbers(line), []))
+			continue
+		old_numbers, new_numbers = _numbers(line), _numbers(matches.pop(0))
+		if old_numbers != new_numbers:
+			summary.append(SummaryChange(label, old_numbers, new_numbers))
+	for label, lines in new_summary.items():
+		summary.extend(SummaryChange(label, [], _numbers(line)) for line in lines)
+
+	engine = old_reader.engine if old_reader.engine != "unknown" else new_reader.engine
+	return RunDiff(engine, divergence, same, changed, old_only, new_only, jobs, summary)
+
+def _change(old:float | None, new:float | None) -> str:
+	if old is None:
+		return f"(none) -> {new:g}"
+	if new is None:
+		return f"{old:g} -> (none)"
+	return f"{old:g} -> {new:g} ({new - old:+g})"
+
+def _summary_line(change:SummaryChange) -> str:
+	if not change.new:
+		return "only in the old run: " + _fill(change.label, change.old)
+	if not change.old:
+		return "only in the new run: " + _fill(change.label, change.new)
+	values = iter([f"{a:g}" if a == b else _change(a, b) for a, b in zip(change.old, change.new)])
+	return re.sub("#", lambda _: next(values, "#"), change.label)
+
+def _fill(label:str, numbers:list[float]) -> str:
+	values = iter(f"{n:g}" for n in numbers)
+	return re.sub("#", lambda _: next(values, "#"), label)
+
+def format_diff(diff:RunDiff) -> str:
+	"""Readable report of a RunDiff"""
+	lines = []
+	point = "step starting at time" if diff.engine == "lottery" else "time"
+	if diff.divergence is None and diff.same == 0:
+		lines.append("Neither run printed a trace")
+	elif diff.divergence is None:
+		lines.append("The traces are the same")
+	else:
+		lines.append(f"Runs diverge at {point} {diff.divergence.time:g}")
+		lines.extend(f"  old: {line.strip()}" for line in diff.divergence.old or ("(nothing)",))
+		lines.extend(f"  new: {line.strip()}" for line in diff.divergence.new or ("(nothing)",))
+	lines.append(f"Trace: {diff.same} the same, {diff.changed} changed, "
+				 f"{diff.old_only} only in the old run, {diff.new_only} only in the new run")
+
+	lines.append("")
+	if diff.jobs:
+		lines.append("Per-job changes:")
+		for job, metrics in diff.jobs.items():
+			changes = [f"{metric} {_change(old, new)}" for metric, (old, new) in metrics.items() if old != new]
+			lines.append(f"  Job {job}  " + "  ".join(changes))
+	else:
+		lines.append("No per-job changes")
+
+	lines.append("")
+	if diff.summary:
+		lines.append("Summary changes:")
+		lines.extend(f"  {_summary_line(change)}" for change in diff.summary)
+	else:
+		lines.append("No summary changes")
+	return "\n".join(lines)
+
+if __name__ == "__main__":
+	if len(sys.argv) != 3:
+		sys.exit("usage: rundiff.py OLD_OUTPUT NEW_OUTPUT")
+	with open(sys.argv[1]) as old_file, open(sys.argv[2]) as new_file:
+		print(format_diff(diff_runs(old_file, new_file)))
@@ -0,0 +1,124 @@
+"""Helpers that run the OSTEP simulator scripts as child processes"""
+
+from typing import Callable, Iterator, NamedTuple, Sequence
+import os
+import re
+import subprocess
+import sys
+import threading
+
+import registry
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def build_command(path:str, parameters:dict[str,str], extra:Sequence[str] = ()) -> list[str]:
+	"""Builds the command line that runs the simulator at path (relative to the repo) with the given parameters"""
+	cmd = [sys.executable, os.path.join(ROOT, path), "-c"]
+
+	if parameters:
+		# each simulator's schema says which flag a parameter maps to and whether it is an on/off switch
+		schema = {parameter.name: parameter for parameter in registry.for_path(path).parameters}
+		for k, v in parameters.items():
+			parameter = schema[k]
+			if parameter.switch:
+				if v.strip().lower() in ("true", "1", "yes"):
+					cmd.append(parameter.flag)
+				continue
+			cmd.extend([parameter.flag, v.strip()])
+
+	cmd.extend(extra)
+	return cmd
+
+class Progress(NamedTuple):
+	"""One progress report from a running simulator"""
+	time: int
+	done: int
+	total: int
+	rate: float
+	started: int | None = None		# jobs that have run at all, from simulators that count them
+	totals: dict[str, float] | None = None	# metric -> sum over the finished jobs, from simulators that report it
+
+class SimulationCancelled(Exception):
+	"""Raised when a run is cancelled before the simulator finished"""
+
+_progress_line = re.compile(r"^PROGRESS time (\d+) done (\d+) of (\d+)(?: started (\d+))?(?: totals (\S+) (\S+) (\S+))? \( (\S+) ticks/sec \)$")
+_resumed_line = re.compile(r"^RESUMED at time (\d+)$")
+
+def parse_progress(line:str) -> Progress | None:
+	"""Reads a PROGRESS line written by a simulator run with --progress, None for any other line"""
+	match = _progress_line.match(line.rstrip("\n"))
+	if match is None:
+		return None
+	time, done, total, started, response, turnaround, wait, rate = match.groups()
+	totals = {"Response": float(response), "Turnaround": float(turnaround), "Wait": float(wait)} if response is not None else None
+	return Progress(int(time), int(done), int(total), float(rate), int(started) if started is not None else None, totals)
+
+def parse_resumed(line:str) -> int | None:
+	"""Reads the line a simulator run with --checkpoints writes when it reuses its last run up to some time, None for any other line"""
+	match = _resumed_line.match(line.rstrip("\n"))
+	return int(match.group(1)) if match is not None else None
+
+class SimulatorRun:
+	"""A simulator running in a child process, reporting progress as it goes and killable at any time"""
+	def __init__(self, path:str, parameters:dict[str,str], extra:Sequence[str] = (),
+				 on_progress:Callable[[Progress], None] | None = None) -> None:
+		cmd = build_command(path, parameters, extra)
+		if on_progress is not None:
+			cmd.append("--progress")
+		self._on_progress = on_progress
+		self._cancelled = False
+		self._errors: list[str] = []
+		self.resumed_at: int | None = None
+		self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+		self._stderr_reader = threading.Thread(target=self._read_stderr, daemon=True)
+		self._stderr_reader.start()
+
+	def _read_stderr(self):
+		for line in self._process.stderr:
+			progress = parse_progress(line)
+			if progress is not None:
+				if self._on_progress is not None:
+					self._on_progress(progress)
+				continue
+			resumed_at = parse_resumed(line)
+			if resumed_at is not None:
+				self.resumed_at = resumed_at
+				continue
+			self._errors.append(line)
+
+	def wait(self) -> str:
+		"""Waits for the simulator and returns everything it printed, raising SimulationCancelled if it was cancelled"""
+		output = self._process.stdout.read()
+		self._process.wait()
+		self._stderr_reader.join()
+		if self._cancelled:
+			raise SimulationCancelled()
+		return output + "".join(self._errors)
+
+	def lines(self) -> Iterator[str]:
+		"""Everything the simulator prints, a line at a time as it prints it, instead of wait
+
+		Only the current line is held. Closing the iterator before the end kills the simulator.
+		"""
+		try:
+			yield from self._process.stdout
+			self._process.wait()
+			self._stderr_reader.join()
+			if self._cancelled:
+				raise SimulationCancelled()
+			yield from self._errors
+		finally:
+			if self._process.poll() is None:
+				self.cancel()
+				self._process.wait()
+			self._process.stdout.close()
+
+	def cancel(self):
+		"""Kills the simulator process, releasing everything it holds"""
+		self._cancelled = True
+		self._process.kill()
+
+def run_simulator(path:str, parameters:dict[str,str], extra:Sequence[str] = ()) -> str:
+	"""Runs a simulator to completion and returns everything it printed"""
+	return SimulatorRun(path, parameters, extra).wait()
+
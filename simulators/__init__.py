@@ -0,0 +1,13 @@
+"""The simulators that come with the app, one module each, loaded through the registry when first picked"""
+
+from registry import Parameter
+
+# parameters every simulator takes the same way
+SEED = Parameter("SEED", "-s", "42")
+RNG = Parameter("RNG", "--rng", "python (the classic sequence) or bulk (numpy, drawn in blocks)")
+STREAM = Parameter("STREAM", "--stream", "with RNG bulk, which of the seed's independent streams to draw from")
+PERCENTILES = Parameter("PERCENTILES", "--percentiles", "True/False: also report p50/p95/p99 of response, turnaround and wait", switch=True)
+TAIL = Parameter("TAIL", "--tail", "keep only the last N lines of the execution trace (memory stays fixed)")
+SAMPLE = Parameter("SAMPLE", "--sample", "with TAIL, also keep the trace of every K-th tick")
+
+SOLUTIONS = "\n\n** Solutions **\n"
@@ -0,0 +1,52 @@
+from registry import Parameter
+from simulators import PERCENTILES, RNG, SAMPLE, SEED, SOLUTIONS, STREAM, TAIL
+
+
+class BasicScheduler:
+	"""Basic Scheduler simulator provided in the OS in Three Easy Steps Codebase"""
+
+	def __init__(self) -> None:
+		self._name = "Basic"
+		self._parameters = [SEED,
+							RNG,
+							STREAM,
+							Parameter("JOBS", "-j", "number of jobs in system"),
+							Parameter("JLIST", "-l", "x,y:a,z,... run times of the jobs, each optionally followed by :arrival time (used by STCF), instead of random ones"),
+							Parameter("MAXLEN", "-m", "max run-time of a job (if randomly generating)"),
+							Parameter("POLICY", "-p", "SJF, FIFO, RR, STCF"),
+							Parameter("QUANTUM", "-q", "length of time slice (for RR policy)"),
+							PERCENTILES,
+							TAIL,
+							SAMPLE,
+							]
+		self._path = "ostep/basic.py"
+		self._profiled = False
+		self._incremental = False
+
+	@property
+	def name(self) -> str:
+		return self._name
+
+	@property
+	def parameters(self) -> list[Parameter]:
+		return self._parameters
+
+	@property
+	def path(self):
+		return self._path
+
+	@property
+	def profiled(self) -> bool:
+		return self._profiled
+
+	@property
+	def incremental(self) -> bool:
+		return self._incremental
+
+	def split(self, output:str) -> tuple[str, str]:
+		"""The given part of the output (the jobs) and the solution"""
+		given, _, solution = output.partition(SOLUTIONS)
+		return given, solution
+
+	def lane_label(self, lane:int) -> str:
+		return f"CPU {lane}"
@@ -0,0 +1,60 @@
+from registry import Parameter
+from simulators import PERCENTILES, RNG, SAMPLE, SEED, STREAM, TAIL
+
+
+class MLFQScheduler:
+	"""Multi-level Feedback Queue Scheduler simulator provided in the OS in Three Easy Steps Codebase"""
+	def __init__(self) -> None:
+		self._name = "MLFQ"
+		self._parameters = [SEED,
+							RNG,
+							STREAM,
+							Parameter("NUMQUEUES", "-n", "number of queues (if not using -QUANTUMLIST)"),
+							Parameter("QUANTUM", "-q", "length of time slice (if not using -QUANTUMLIST)"),
+							Parameter("ALLOTMENT", "-a", "length of allotment (if not using -ALLOTMENTLIST)"),
+							Parameter("QUANTUMLIST", "-Q", "x,y,z,... where x=quantum length for the highest priority queue, y the next highest, and so on"),
+							Parameter("ALLOTMENTLIST", "-A", "x,y,z,... where x=# of time slices for the highest priority queue, y the next highest, and so on"),
+							Parameter("JOBS", "-j", "number of jobs in system"),
+							Parameter("JLIST", "-l", "x1,y1,z1:x2,y2,z2:... where x=arrival,y=runtime,z=how often I/O issued"),
+							Parameter("MAXLEN", "-m", "max run-time of a job (if randomly generating)"),
+							Parameter("MAXIO", "-M", "max I/O frequency of a job (if randomly generating)"),
+							Parameter("BOOST", "-B", "how often to boost the priority of all jobs back tohigh priority"),
+							Parameter("IOTIME", "-i", "how long an I/O should last"),
+							Parameter("IOBUMP", "-I", "True/False:  jobs that finished I/O move immediately to front of current queue", switch=True),
+							Parameter("STAY", "-S", "True/False: reset and stay at same priority level when issuing I/O", switch=True),
+							PERCENTILES,
+							TAIL,
+							SAMPLE,
+							]
+		self._path = "ostep/mlfq.py"
+		self._profiled = True
+		self._incremental = True
+
+	@property
+	def name(self) -> str:
+		return self._name
+
+	@property
+	def parameters(self) -> list[Parameter]:
+		return self._parameters
+
+	@property
+	def path(self):
+		return self._path
+
+	@property
+	def profiled(self) -> bool:
+		return self._profiled
+
+	@property
+	def incremental(self) -> bool:
+		return self._incremental
+
+	def split(self, output:str) -> tuple[str, str]:
+		"""The given part of the output (options and jobs) and the execution trace with its statistics"""
+		given, _, solution = output.partition("\n\nExecution Trace:\n")
+		return given, solution
+
+	def lane_label(self, lane:int) -> str:
+		# MLFQ's Gantt lanes are its priority levels
+		return f"Q{lane}"
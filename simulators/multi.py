@@ -0,0 +1,77 @@
+from registry import Parameter
+from simulators import PERCENTILES, RNG, SAMPLE, SEED, STREAM, TAIL
+
+
+class MultiCPUScheduler:
+	"""Multi-CPU Scheduler simulator provided in the OS in Three Easy Steps Codebase, with caches per CPU"""
+	def __init__(self) -> None:
+		self._name = "Multi-CPU"
+		self._parameters = [SEED,
+							RNG,
+							STREAM,
+							Parameter("JOBS", "-j", "number of jobs in system"),
+							Parameter("JLIST", "-L", "a:x1:y1,b:x2:y2,... where a=name, x=run time, y=working set size"),
+							Parameter("MAXRUN", "-R", "max run-time of a job (if randomly generating)"),
+							Parameter("MAXWSET", "-W", "max working set size of a job (if randomly generating)"),
+							Parameter("CPUS", "-n", "number of CPUs"),
+							Parameter("QUANTUM", "-q", "length of time slice"),
+							Parameter("PERCPU", "-p", "True/False: one scheduling queue per CPU instead of one for all", switch=True),
+							Parameter("AFFINITY", "-A", "a:0.1.2,b:0.1,... which CPUs each job may run on"),
+							Parameter("PEEK", "-P", "with PERCPU, how often an idle CPU looks at other queues to steal a job (0 = never)"),
+							Parameter("RANDORDER", "-o", "True/False: CPUs pick jobs in random order", switch=True),
+							Parameter("CACHESIZE", "-M", "size of each CPU's cache"),
+							Parameter("WARMUP", "-w", "time a job must run on a CPU to warm its cache"),
+							Parameter("WARMRATE", "-r", "how much faster a job runs with a warm cache"),
+							Parameter("LLCSIZE", "--llc_size", "size of a cache shared by all CPUs (0 = none)"),
+							Parameter("LLCRATE", "--llc_rate", "with LLCSIZE, how much faster a job runs with its working set in the shared cache only"),
+							Parameter("LLCWARMUP", "--llc_warmup", "with LLCSIZE, time a job must run to warm the shared cache"),
+							Parameter("ARRIVALRATE", "--arrival_rate", "open system: jobs arriving per tick besides the first ones (0 = none)"),
+							Parameter("OPENWARMUP", "--open_warmup", "open system: ticks to run before measuring"),
+							Parameter("OPENWINDOW", "--open_window", "open system: ticks to measure over"),
+							Parameter("ENGINE", "--engine", "scalar, or vector for many CPUs (needs numpy)"),
+							Parameter("TELEMETRY", "--telemetry", "True/False: also report migrations, steals, warm/cold ticks, evictions and queue wait per job and CPU", switch=True),
+							Parameter("TRACE", "-t", "True/False: show which job each CPU runs every tick", switch=True),
+							Parameter("TRACETIME", "-T", "True/False: also show each job's time left", switch=True),
+							Parameter("TRACECACHE", "-C", "True/False: also show each cache's state", switch=True),
+							Parameter("TRACESCHED", "-S", "True/False: also show the scheduling queues", switch=True),
+							PERCENTILES,
+							TAIL,
+							SAMPLE,
+							]
+		self._path = "ostep/multi.py"
+		self._profiled = True
+		self._incremental = False
+
+	@property
+	def name(self) -> str:
+		return self._name
+
+	@property
+	def parameters(self) -> list[Parameter]:
+		return self._parameters
+
+	@property
+	def path(self):
+		return self._path
+
+	@property
+	def profiled(self) -> bool:
+		return self._profiled
+
+	@property
+	def incremental(self) -> bool:
+		return self._incremental
+
+	def split(self, output:str) -> tuple[str, str]:
+		"""The given part of the output (options, jobs, starting queues) and the trace with its statistics"""
+		# the given part ends with the blank line after the "Scheduler ... queue" lines
+		start = output.find("\nScheduler ")
+		if start < 0:
+			return output, ""
+		end = output.find("\n\n", start)
+		if end < 0:
+			return output, ""
+		return output[:end + 1], output[end + 2:].lstrip("\n")
+
+	def lane_label(self, lane:int) -> str:
+		return f"CPU {lane}"
@@ -0,0 +1,151 @@
+"""On-disk store of simulator results, keyed by simulator source and parameters"""
+
+from contextlib import closing
+from typing import Sequence
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+from runner import ROOT
+
+# seconds between writes of the last-use times of entries read from the store
+TOUCH_INTERVAL = 5.0
+
+# entries looked at per query when evicting
+EVICT_BATCH = 64
+
+_local_import = re.compile(r"^(?:from|import)\s+(\w+)", re.MULTILINE)
+
+def default_cache_dir() -> str:
+	"""Per-user cache directory for the app"""
+	if sys.platform == "win32":
+		base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+	else:
+		base = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+	return os.path.join(base, "flet-ostep-simulator")
+
+def source_hash(path:str) -> str:
+	"""Hash of a simulator script together with the helper modules it imports from its own directory"""
+	full_path = os.path.join(ROOT, path)
+	directory = os.path.dirname(full_path)
+	with open(full_path, "rb") as f:
+		source = f.read()
+
+	digest = hashlib.sha256(source)
+	for module in sorted(set(_local_import.findall(source.decode("utf-8", "replace")))):
+		helper = os.path.join(directory, f"{module}.py")
+		if os.path.isfile(helper):
+			with open(helper, "rb") as f:
+				digest.update(module.encode() + b"\0" + f.read())
+	return digest.hexdigest()
+
+class ResultStore:
+	"""SQLite-backed cache of simulator output
+
+	Entries are keyed by the hash of the simulator source plus its normalized
+	arguments, so editing a simulator makes its old entries unreachable; they
+	are dropped the next time a result for that simulator is stored. The total
+	size of stored output is capped, evicting least recently used entries first.
+	The database runs in WAL mode so readers never block each other or a writer;
+	reads only note when an entry was used, and those times are written in one
+	transaction at most every TOUCH_INTERVAL seconds (and before any eviction).
+	The total size is kept in a one-row table by triggers on every insert and
+	delete, so checking the cap does not scan the entries.
+	"""
+	def __init__(self, path:str | None = None, max_bytes:int = 64 * 1024 * 1024) -> None:
+		if path is None:
+			path = os.path.join(default_cache_dir(), "results.sqlite3")
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		self._path = path
+		self._max_bytes = max_bytes
+		self._touch_lock = threading.Lock()
+		self._touched: dict[str, float] = {}
+		self._touch_flushed = time.monotonic()
+
+		with closing(self._connect()) as db, db:
+			db.execute("PRAGMA journal_mode=WAL")
+			db.execute("""CREATE TABLE IF NOT EXISTS results (
+							key TEXT PRIMARY KEY,
+							script TEXT NOT NULL,
+							script_hash TEXT NOT NULL,
+							output BLOB NOT NULL,
+							size INTEGER NOT NULL,
+							last_used REAL NOT NULL)""")
+			db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+			db.execute("CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER NOT NULL)")
+			# summed once, for a store made before the total was kept
+			db.execute("INSERT OR IGNORE INTO totals SELECT 0, COALESCE(SUM(size), 0) FROM results")
+			db.execute("""CREATE TRIGGER IF NOT EXISTS results_inserted AFTER INSERT ON results
+							BEGIN UPDATE totals SET size = size + new.size WHERE id = 0; END""")
+			db.execute("""CREATE TRIGGER IF NOT EXISTS results_deleted AFTER DELETE ON results
+							BEGIN UPDATE totals SET size = size - old.size WHERE id = 0; END""")
+
+	@property
+	def path(self) -> str:
+		return self._path
+
+	def _connect(self) -> sqlite3.Connection:
+		return sqlite3.connect(self._path, timeout=30)
+
+	def key(self, script:str, arguments:Sequence[str]) -> str:
+		"""Key for running script with the given (already normalized) command line arguments"""
+		digest = hashlib.sha256(source_hash(script).encode())
+		digest.update("\0".join(arguments).encode())
+		return digest.hexdigest()
+
+	def get(self, key:str) -> str | None:
+		"""Stored output for key, or None"""
+		with closing(self._connect()) as db:
+			row = db.execute("SELECT output FROM results WHERE key = ?", (key,)).fetchone()
+		if row is None:
+			return None
+		with self._touch_lock:
+			self._touched[key] = time.time()
+			due = time.monotonic() - self._touch_flushed >= TOUCH_INTERVAL
+		if due:
+			with closing(self._connect()) as db, db:
+				self._flush_touched(db)
+		return zlib.decompress(row[0]).decode()
+
+	def _flush_touched(self, db:sqlite3.Connection):
+		"""Writes the last-use times noted by get since the last flush, inside the caller's transaction"""
+		with self._touch_lock:
+			touched, self._touched = self._touched, {}
+			self._touch_flushed = time.monotonic()
+		if touched:
+			db.executemany("UPDATE results SET last_used = MAX(last_used, ?) WHERE key = ?",
+						   [(used, key) for (key, used) in touched.items()])
+
+	def put(self, key:str, script:str, output:str):
+		"""Stores output, dropping stale entries for the script and evicting old ones past the size cap"""
+		blob = zlib.compress(output.encode())
+		script_hash = source_hash(script)
+		with closing(self._connect()) as db, db:
+			self._flush_touched(db)
+			db.execute("DELETE FROM results WHERE script = ? AND script_hash != ?", (script, script_hash))
+			# deleted rather than replaced, as a REPLACE does not fire the delete trigger that keeps the total
+			db.execute("DELETE FROM results WHERE key = ?", (key,))
+			db.execute("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)",
+						(key, script, script_hash, blob, len(blob), time.time()))
+			total = db.execute("SELECT size FROM totals WHERE id = 0").fetchone()[0]
+			# oldest first, a few at a time through the last_used index
+			while total > self._max_bytes:
+				oldest = db.execute("SELECT key, size FROM results ORDER BY last_used LIMIT ?", (EVICT_BATCH,)).fetchall()
+				if not oldest:
+					break
+				for (old_key, size) in oldest:
+					if total <= self._max_bytes:
+						break
+					db.execute("DELETE FROM results WHERE key = ?", (old_key,))
+					total -= size
+
+	def clear(self):
+		with closing(self._connect()) as db, db:
+			with self._touch_lock:
+				self._touched = {}
+			db.execute("DELETE FROM results")
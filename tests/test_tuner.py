@@ -0,0 +1,91 @@
+"""Early stopping and failed candidates in the MLFQ tuner, with scripted runs in place of the simulator"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from runner import Progress, SimulationCancelled
+from tuner import Candidate, lower_bound, parse_objective, tune
+
+_CURRENT = {"QUANTUMLIST": "10,10,10", "ALLOTMENTLIST": "1,1,1", "BOOST": "0", "STAY": "False", "IOBUMP": "False"}
+
+def _percentiles(mean:float) -> str:
+	rows = "".join(f"  {metric:<10} -- mean {mean:.2f}  p50 {mean:.2f}  p95 {mean:.2f}  p99 {mean:.2f}  max {mean:.2f}\n"
+				   for metric in ("Response", "Turnaround", "Wait"))
+	return "Final statistics:\n\nPercentiles:\n" + rows + "\n"
+
+class _ScriptedRun:
+	"""Stands in for a simulator run: reports the given progress, then prints output unless it was cancelled"""
+	def __init__(self, reports:list[Progress], output:str, on_progress) -> None:
+		self.resumed_at = None
+		self.cancelled = False
+		self._reports = reports
+		self._output = output
+		self._on_progress = on_progress
+
+	def wait(self) -> str:
+		for progress in self._reports:
+			if self._on_progress is not None:
+				self._on_progress(progress)
+			if self.cancelled:
+				raise SimulationCancelled()
+		return self._output
+
+	def cancel(self):
+		self.cancelled = True
+
+def _start(script, runs):
+	"""A tune start function: the current setting gets script(True), every other candidate script(False)"""
+	def start(path, parameters, extra, on_progress):
+		current = all(parameters[name] == value for name, value in _CURRENT.items())
+		run = _ScriptedRun(*script(current), on_progress)
+		runs.append((current, run))
+		return run
+	return start
+
+def test_candidate_past_the_bound_is_cancelled():
+	# the current setting scores 100; the others report 30 of 40 jobs unfinished at time 1000, a mean of at least 750
+	def script(current):
+		if current:
+			return [], _percentiles(100)
+		return [Progress(1000, 10, 40, 0.0, 40, {"Response": 0.0, "Turnaround": 0.0, "Wait": 0.0})], _percentiles(50)
+	runs = []
+	tuning = tune({"JOBS": "40"}, parse_objective("mean turnaround"), count=6, start=_start(script, runs), workers=2)
+
+	assert tuning.evaluations[0].score == 100
+	assert [e.stopped for e in tuning.evaluations[1:]] == [True] * 5
+	assert all(run.cancelled for current, run in runs if not current)
+	assert tuning.evaluations[1].score == 750
+
+def test_candidate_under_the_bound_runs_to_the_end():
+	def script(current):
+		return [Progress(10, 39, 40, 0.0, 40, {"Response": 0.0, "Turnaround": 100.0, "Wait": 0.0})], \
+			   _percentiles(100 if current else 50)
+	runs = []
+	tuning = tune({"JOBS": "40"}, parse_objective("mean turnaround"), count=4, start=_start(script, runs), workers=2)
+
+	assert not any(e.stopped for e in tuning.evaluations)
+	assert tuning.best.score == 50
+
+def test_response_bound_counts_jobs_not_yet_started():
+	progress = Progress(1000, 0, 10, 0.0, 6, {"Response": 200.0, "Turnaround": 0.0, "Wait": 0.0})
+	assert lower_bound(parse_objective("mean response"), progress, 0) == (200 + 4 * 1000) / 10
+	assert lower_bound(parse_objective("max response"), progress, 0) == 1000
+	assert lower_bound(parse_objective("mean response"), progress._replace(started=None), 0) == 0
+
+def test_failed_candidates_are_skipped():
+	def script(current):
+		return [], (_percentiles(100) if current else "Usage: mlfq.py [options]\n\nmlfq.py: error: bad option\n")
+	tuning = tune({"JOBS": "40"}, parse_objective("mean turnaround"), count=4, start=_start(script, []), workers=2)
+
+	assert tuning.best.candidate == Candidate((10, 10, 10), (1, 1, 1), 0, False, False)
+	assert [bool(e.error) for e in tuning.evaluations] == [False, True, True, True]
+	assert tuning.evaluations[1].error == "no statistics in its output: mlfq.py: error: bad option"
+
+def test_every_candidate_failing_is_an_error():
+	with pytest.raises(ValueError, match="every candidate failed"):
+		tune({"JOBS": "40"}, parse_objective("mean turnaround"), count=3,
+			 start=_start(lambda current: ([], "mlfq.py: error: bad option\n"), []), workers=2)
@@ -0,0 +1,258 @@
+"""Searches MLFQ settings (QUANTUMLIST, ALLOTMENTLIST, BOOST, STAY, IOBUMP) for the ones that suit a workload best
+
+Candidates are drawn from a grid of queue counts, time slices growing down
+the levels, allotments, boost intervals and the two I/O switches, and run
+several at a time. An objective is a weighted sum of statistics from the
+Percentiles block, such as "mean response" or
+"0.7*mean response + 0.3*p99 turnaround". A candidate is stopped early once
+its progress shows it is clearly worse than the best so far: a job still
+unfinished at simulated time T has a turnaround of at least T minus its start
+time, and one that has not run at all yet has a response (and so a wait) of at
+least that much, which bounds those statistics from below before the run ends;
+the means start from the sums over the jobs already finished, which the
+progress reports carry. Progress is only reported every 0.2 seconds of wall
+time, so a candidate that finishes sooner than that always runs to the end.
+A candidate whose run fails or prints no statistics is skipped; the search
+only fails when every candidate does.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Sequence
+import os
+import random
+import threading
+
+from compare import METRICS, STATISTICS, parse_percentiles
+from runner import Progress, SimulationCancelled, SimulatorRun
+
+QUANTUMS = [1, 2, 5, 10, 20, 50]
+GROWTHS = [1, 2, 4]
+ALLOTMENTS = [1, 2, 4]
+BOOSTS = [0, 10, 20, 50, 100, 200, 500]
+QUEUES = [1, 2, 3, 4, 5]
+
+# the fraction of jobs below each statistic, for bounding it while a run is going
+_quantiles = {"p50": 0.50, "p95": 0.95, "p99": 0.99, "max": 1.0}
+
+class Objective(NamedTuple):
+	"""Weighted sum of (weight, metric, statistic) terms to minimise"""
+	terms: list[tuple[float, str, str]]
+
+	def value(self, metrics:dict[str, dict[str, float]]) -> float:
+		return sum(weight * metrics[metric][stat] for weight, metric, stat in self.terms)
+
+	def __str__(self) -> str:
+		return " + ".join(f"{weight:g}*{stat} {metric.lower()}" for weight, metric, stat in self.terms)
+
+def parse_objective(text:str) -> Objective:
+	"""Reads an objective like "mean response" or "0.7*mean response + 0.3*p99 turnaround" """
+	terms = []
+	for term in text.split("+"):
+		weight, _, term = term.rpartition("*")
+		words = term.split()
+		if len(words) != 2:
+			raise ValueError(f"bad objective term {term.strip()!r}: needs a statistic and a metric, e.g. p99 turnaround")
+		stat, metric = words[0].lower(), words[1].capitalize()
+		if stat not in STATISTICS or metric not in METRICS:
+			raise ValueError(f"bad objective term {term.strip()!r}: statistics are {', '.join(STATISTICS)}, "
+							 f"metrics are {', '.join(m.lower() for m in METRICS)}")
+		terms.append((float(weight) if weight.strip() else 1.0, metric, stat))
+	if any(weight < 0 for weight, _, _ in terms):
+		raise ValueError("objective weights must not be negative")
+	return Objective(terms)
+
+class Candidate(NamedTuple):
+	"""One MLFQ setting; quantums and allotments are listed from the highest priority level down"""
+	quantums: tuple[int, ...]
+	allotments: tuple[int, ...]
+	boost: int
+	stay: bool
+	iobump: bool
+
+	def parameters(self) -> dict[str,str]:
+		return {"QUANTUMLIST": ",".join(str(q) for q in self.quantums),
+				"ALLOTMENTLIST": ",".join(str(a) for a in self.allotments),
+				"BOOST": str(self.boost),
+				"STAY": str(self.stay),
+				"IOBUMP": str(self.iobump)}
+
+	def __str__(self) -> str:
+		switches = "".join(name for name, on in ((" STAY", self.stay), (" IOBUMP", self.iobump)) if on)
+		return (f"QUANTUMLIST {','.join(str(q) for q in self.quantums)}  "
+				f"ALLOTMENTLIST {','.join(str(a) for a in self.allotments)}  BOOST {self.boost}{switches}")
+
+class Evaluation(NamedTuple):
+	"""A candidate's score, or, if it was stopped early, the bound that showed it was worse"""
+	candidate: Candidate
+	score: float
+	metrics: dict[str, dict[str, float]]
+	stopped: bool
+	error: str = ""		# why the candidate failed, if it did
+
+class Tuning(NamedTuple):
+	"""The best candidate, every evaluation, and the trade-off curve between two statistics"""
+	objective: Objective
+	best: Evaluation | None
+	evaluations: list[Evaluation]
+	axes: tuple[tuple[str, str], tuple[str, str]]
+	curve: list[Evaluation]
+
+def candidates(count:int, seed:int = 0, start:Candidate | None = None) -> list[Candidate]:
+	"""count distinct candidates drawn from the grid, starting with start if given"""
+	rng = random.Random(seed)
+	chosen = [start] if start is not None else []
+	seen = set(chosen)
+	# the grid has a few thousand points; stop drawing well before it runs dry
+	for _ in range(50 * count):
+		if len(chosen) >= count:
+			break
+		queues, quantum, growth = rng.choice(QUEUES), rng.choice(QUANTUMS), rng.choice(GROWTHS)
+		allotment, allotment_growth = rng.choice(ALLOTMENTS), rng.choice([1, 2])
+		candidate = Candidate(tuple(quantum * growth ** level for level in range(queues)),
+							  tuple(allotment * allotment_growth ** level for level in range(queues)),
+							  rng.choice(BOOSTS), rng.random() < 0.5, rng.random() < 0.5)
+		if candidate not in seen:
+			seen.add(candidate)
+			chosen.append(candidate)
+	return chosen
+
+def current_candidate(parameters:dict[str,str]) -> Candidate:
+	"""The setting the parameters already describe, as a candidate, so the search has it to beat"""
+	queues = int(parameters.get("NUMQUEUES") or 3)
+	quantums = tuple(int(q) for q in parameters["QUANTUMLIST"].split(",")) if parameters.get("QUANTUMLIST") \
+			   else (int(parameters.get("QUANTUM") or 10),) * queues
+	allotments = tuple(int(a) for a in parameters["ALLOTMENTLIST"].split(",")) if parameters.get("ALLOTMENTLIST") \
+				 else (int(parameters.get("ALLOTMENT") or 1),) * len(quantums)
+	switch = lambda name: parameters.get(name, "").strip().lower() in ("true", "1", "yes")
+	return Candidate(quantums, allotments, int(parameters.get("BOOST") or 0), switch("STAY"), switch("IOBUMP"))
+
+def _latest_start(parameters:dict[str,str]) -> int:
+	# generated MLFQ jobs all start at time 0; listed ones start where JLIST says
+	jlist = parameters.get("JLIST", "").strip()
+	if not jlist:
+		return 0
+	return max(int(job.split(",")[0]) for job in jlist.split(":"))
+
+def lower_bound(objective:Objective, progress:Progress, latest_start:int) -> float:
+	"""Least the objective can come to, given that the unfinished jobs have not finished by now"""
+	if progress.total == 0:
+		return 0.0
+	least = max(progress.time - latest_start, 0)
+	# jobs still waiting at this time: unfinished for turnaround; never run for response and wait,
+	# counted only when the simulator reports how many have started
+	waiting = {"Turnaround": progress.total - progress.done}
+	if progress.started is not None:
+		waiting["Response"] = waiting["Wait"] = progress.total - progress.started
+	bound = 0.0
+	finished = progress.totals or {}
+	for weight, metric, stat in objective.terms:
+		if metric not in waiting:
+			continue
+		if stat == "mean":
+			bound += weight * (finished.get(metric, 0.0) + least * waiting[metric]) / progress.total
+		elif waiting[metric] > (1 - _quantiles[stat]) * progress.total:
+			bound += weight * least
+	return bound
+
+Start = Callable[[str, dict[str,str], Sequence[str], Callable[[Progress], None] | None], SimulatorRun]
+
+class _Search:
+	def __init__(self, objective:Objective, start:Start, parameters:dict[str,str], margin:float) -> None:
+		self.objective = objective
+		self.start = start
+		self.parameters = parameters
+		self.margin = margin
+		self.latest_start = _latest_start(parameters)
+		self.best = float("inf")
+		self.lock = threading.Lock()
+
+	def evaluate(self, candidate:Candidate) -> Evaluation:
+		parameters = {**self.parameters, **candidate.parameters(), "PERCENTILES": "True"}
+		run = None
+		stopped_at = [0.0]
+
+		def on_progress(progress:Progress):
+			bound = lower_bound(self.objective, progress, self.latest_start)
+			if run is not None and bound > self.best * (1 + self.margin):
+				stopped_at[0] = bound
+				run.cancel()
+
+		run = self.start("ostep/mlfq.py", parameters, (), on_progress)
+		try:
+			output = run.wait()
+		except SimulationCancelled:
+			return Evaluation(candidate, stopped_at[0], {}, True)
+		except RuntimeError as error:
+			return Evaluation(candidate, float("inf"), {}, False, str(error))
+		metrics = parse_percentiles(output)
+		if any(metric not in metrics for metric in METRICS):
+			lines = output.strip().splitlines()
+			return Evaluation(candidate, float("inf"), {}, False,
+							  "no statistics in its output" + (f": {lines[-1].strip()}" if lines else ""))
+		score = self.objective.value(metrics)
+		with self.lock:
+			self.best = min(self.best, score)
+		return Evaluation(candidate, score, metrics, False)
+
+def pareto_curve(evaluations:list[Evaluation], axes:tuple[tuple[str, str], tuple[str, str]]) -> list[Evaluation]:
+	"""The evaluations no other one beats on both axes, ordered along the first"""
+	(m1, s1), (m2, s2) = axes
+	points = sorted((e for e in evaluations if not e.stopped and not e.error), key=lambda e: (e.metrics[m1][s1], e.metrics[m2][s2]))
+	curve = []
+	for evaluation in points:
+		if not curve or evaluation.metrics[m2][s2] < curve[-1].metrics[m2][s2]:
+			curve.append(evaluation)
+	return curve
+
+def _axes(objective:Objective) -> tuple[tuple[str, str], tuple[str, str]]:
+	# the objective's two heaviest terms; with one term, that statistic of response against turnaround
+	terms = sorted(objective.terms, key=lambda term: -term[0])
+	if len(terms) >= 2:
+		return (terms[0][1], terms[0][2]), (terms[1][1], terms[1][2])
+	_, metric, stat = terms[0]
+	other = "Turnaround" if metric != "Turnaround" else "Response"
+	return (metric, stat), (other, stat)
+
+def tune(parameters:dict[str,str], objective:Objective, count:int = 64, seed:int = 0, margin:float = 0.1,
+		 start:Start = SimulatorRun, workers:int | None = None) -> Tuning:
+	"""Runs count candidates for the workload in parameters, several at once, and returns the best and the trade-off curve
+
+	Raises ValueError when every candidate failed.
+	"""
+	workload = {k: v for k, v in parameters.items()
+				if k not in ("NUMQUEUES", "QUANTUM", "ALLOTMENT", "QUANTUMLIST", "ALLOTMENTLIST", "BOOST",
+							 "STAY", "IOBUMP", "TAIL", "SAMPLE")}
+	search = _Search(objective, start, workload, margin)
+	# the current setting runs first, alone, so the others have a score to be stopped against from the start
+	first, *rest = candidates(count, seed, current_candidate(parameters))
+	evaluations = [search.evaluate(first)]
+	with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as executor:
+		evaluations.extend(executor.map(search.evaluate, rest))
+
+	failed = [e for e in evaluations if e.error]
+	if len(failed) == len(evaluations):
+		raise ValueError(f"every candidate failed, e.g. {failed[0].candidate}: {failed[0].error}")
+	finished = [e for e in evaluations if not e.stopped and not e.error]
+	best = min(finished, key=lambda e: e.score) if finished else None
+	axes = _axes(objective)
+	return Tuning(objective, best, evaluations, axes, pareto_curve(evaluations, axes))
+
+def format_tuning(tuning:Tuning) -> str:
+	"""Plain-text report: the best setting, the starting one, and the trade-off curve"""
+	if tuning.best is None:
+		return "No candidate finished"
+	stopped = sum(1 for e in tuning.evaluations if e.stopped)
+	failed = sum(1 for e in tuning.evaluations if e.error)
+	lines = [f"Objective: {tuning.objective}",
+			 f"Best: {tuning.best.candidate}",
+			 f"  score {tuning.best.score:.2f}",
+			 f"Started from: {tuning.evaluations[0].candidate}",
+			 f"  score {tuning.evaluations[0].score:.2f}" + (" (stopped early)" if tuning.evaluations[0].stopped else "")
+			 + (f" (failed: {tuning.evaluations[0].error})" if tuning.evaluations[0].error else ""),
+			 f"{len(tuning.evaluations)} candidates, {stopped} stopped early, {failed} failed",
+			 ""]
+	(m1, s1), (m2, s2) = tuning.axes
+	lines.append(f"Trade-off curve, {s1} {m1.lower()} against {s2} {m2.lower()}:")
+	for evaluation in tuning.curve:
+		lines.append("  %10.2f %10.2f   %s" % (evaluation.metrics[m1][s1], evaluation.metrics[m2][s2], evaluation.candidate))
+	return "\n".join(lines)